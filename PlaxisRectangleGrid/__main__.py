@@ -0,0 +1,260 @@
+#!/usr/bin/env python
+from typing import Dict, List, Sequence, Union
+
+import argparse
+import glob
+import os
+import sys
+
+from PlaxisRectangleGrid import processing, settings, utils
+
+"""
+Запуск расчета из командной строки, без выбора файлов в окне tkinter:
+
+    python -m PlaxisRectangleGrid data/*.xls -o out --workers 4
+
+Значения параметров по умолчанию берутся из PlaxisRectangleGrid/settings.py.
+Код возврата: 0 - все файлы рассчитаны, 1 - в части файлов ошибки,
+2 - ошибка параметров или не найдено ни одного входного файла.
+"""
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+
+
+def step_z_item(value: str) -> tuple:
+    """
+    Разбирает значение параметра --step-z вида "глубина:шаг",
+    (например, "-10:-0.5").
+    """
+    try:
+        depth, step = value.split(':')
+        return float(depth), float(step)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f'expected DEPTH:STEP (for example -10:-0.5), got {value!r}')
+
+
+def parse_args(argv: Sequence[str] = None) -> argparse.Namespace:
+    """
+    Разбирает параметры командной строки.
+    """
+    parser = argparse.ArgumentParser(
+        prog='python -m PlaxisRectangleGrid',
+        description='Преобразование перемещений из треугольной сетки '
+                    'Plaxis3D в прямоугольную.')
+    parser.add_argument('inputs', nargs='+', metavar='FILE',
+                        help='входные файлы или шаблоны (например, '
+                             '"data/*.xls", "data/**/*.xls")')
+    parser.add_argument('-o', '--output-dir', default=None,
+                        help='папка для выходных файлов (по умолчанию - '
+                             'папка входного файла)')
+    parser.add_argument('-p', '--postfix',
+                        default=settings.OUTPUT_FILENAME_POSTFIX,
+                        help='постфикс для файла вывода (по умолчанию '
+                             '%(default)r)')
+    parser.add_argument('--log-dir', default=None,
+                        help='папка для файла лога txt (по умолчанию - '
+                             'папка выходных файлов или текущая папка)')
+    parser.add_argument('--step-z', type=step_z_item, action='append',
+                        default=[], metavar='DEPTH:STEP',
+                        help='шаг сетки по Z для глубины, дополняет и '
+                             'переопределяет STEP_Z (можно указать '
+                             'несколько раз, например, --step-z=-10:-0.5)')
+    parser.add_argument('--engine', choices=('quadrant', 'delaunay'),
+                        default=settings.ENGINE,
+                        help='метод расчета перемещений в узлах: по '
+                             'ближайшим точкам в четвертях или по '
+                             'триангуляции Делоне (по умолчанию '
+                             '%(default)s)')
+    parser.add_argument('--eps-x', type=float, default=settings.EPS_X,
+                        help='окрестность поиска по X (по умолчанию - шаг '
+                             'сетки по X)')
+    parser.add_argument('--eps-z', type=float, default=settings.EPS_Z,
+                        help='окрестность поиска по Z (по умолчанию - шаг '
+                             'сетки по Z)')
+    parser.add_argument('--eps-fallback', type=float,
+                        default=settings.EPS_FALLBACK, metavar='FACTOR',
+                        help='наибольший множитель окрестности поиска для '
+                             'повторного расчета узлов без перемещения '
+                             '(по умолчанию %(default)s - без повторного '
+                             'расчета)')
+    parser.add_argument('--dedup-tolerance', type=float,
+                        default=settings.DEDUP_TOLERANCE, metavar='TOL',
+                        help='размер ячейки объединения близких точек при '
+                             'удалении дубликатов, 0 - только совпадающие '
+                             'точки (по умолчанию %(default)s)')
+    parser.add_argument('--dedup-policy', choices=('mean', 'first', 'max'),
+                        default=settings.DEDUP_POLICY,
+                        help='перемещение объединенной точки (по умолчанию '
+                             '%(default)s)')
+    parser.add_argument('--info-sheets', dest='info_sheets',
+                        action='store_true', default=settings.INFO_SHEETS,
+                        help='создавать листы журнала операций')
+    parser.add_argument('--no-info-sheets', dest='info_sheets',
+                        action='store_false',
+                        help='не создавать листы журнала операций')
+    parser.add_argument('--log-level', choices=('off', 'counts', 'full'),
+                        default=settings.LOG_LEVEL,
+                        help='журнал операций узлов (по умолчанию - full, '
+                             'если создаются листы или файл журнала, иначе '
+                             'counts)')
+    parser.add_argument('--profile', action='store_true',
+                        default=settings.PROFILE,
+                        help='записывать в лог txt время этапов и счетчики '
+                             'ветвей расчета узлов (также переменная '
+                             'окружения PLAXIS_PROFILE=1)')
+    parser.add_argument('--run-log', action='store_true',
+                        default=settings.RUN_LOG,
+                        help='создавать лог JSON Lines (.jsonl рядом с '
+                             'логом txt)')
+    parser.add_argument('-j', '--workers', type=int,
+                        default=settings.WORKERS,
+                        help='количество процессов (по умолчанию '
+                             '%(default)s)')
+    parser.add_argument('--tiles', type=int, nargs=2, default=settings.TILES,
+                        metavar=('ROWS', 'COLS'),
+                        help='разбиение сетки листа на блоки для '
+                             'параллельного расчета одного листа')
+    parser.add_argument('--phases', default=None, metavar='NPZ',
+                        help='пакетный расчет фаз одной модели (входные '
+                             'файлы - фазы по порядку): вместо excel файлов '
+                             'один файл npz с массивами (фаза, z, x) по '
+                             'компонентам')
+    parser.add_argument('--write-only', action='store_true',
+                        default=settings.WRITE_ONLY,
+                        help='потоковая запись выходных файлов')
+    parser.add_argument('--journal', choices=('npz', 'csv'),
+                        default=settings.JOURNAL,
+                        help='компактный файл журнала операций')
+    parser.add_argument('--cache-dir', default=settings.CACHE_DIR,
+                        help='папка кэша предобработанных входных данных '
+                             'и весов интерполяции')
+    parser.add_argument('--weights-cache-size', type=float, metavar='MB',
+                        default=(None if settings.WEIGHTS_CACHE_SIZE is None
+                                 else settings.WEIGHTS_CACHE_SIZE / 2 ** 20),
+                        help='наибольший размер кэша весов интерполяции, МБ '
+                             '(по умолчанию %(default)s)')
+
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error('--workers must be >= 1')
+    if args.tiles is not None and min(args.tiles) < 1:
+        parser.error('--tiles must be >= 1')
+    if args.phases is not None and args.tiles is not None:
+        parser.error('--tiles is not supported with --phases: interpolation '
+                     'weights are computed once for whole sheets')
+    if args.eps_fallback < 1:
+        parser.error('--eps-fallback must be >= 1')
+    if not args.dedup_tolerance >= 0:
+        parser.error('--dedup-tolerance must be >= 0')
+    return args
+
+
+def expand_inputs(patterns: Sequence[str], postfix: str) -> List[str]:
+    """
+    Раскрывает шаблоны входных файлов. Файлы, найденные по шаблону, с
+    постфиксом файла вывода в названии (результаты прошлых расчетов)
+    пропускаются, явно указанные файлы берутся всегда.
+
+    :param patterns: пути до файлов или шаблоны glob
+    :param postfix: постфикс для файла вывода, (например, "_CALC_")
+    :return: список путей без повторов в порядке указания
+    """
+    filenames = {}
+    for pattern in patterns:
+        if os.path.isfile(pattern):
+            filenames[pattern] = None
+            continue
+
+        for filepath in sorted(glob.glob(pattern, recursive=True)):
+            stem = os.path.splitext(os.path.basename(filepath))[0]
+            if os.path.isfile(filepath) and not stem.endswith(postfix):
+                filenames[filepath] = None
+    return list(filenames)
+
+
+def main(argv: Sequence[str] = None) -> int:
+    """
+    Расчет входных файлов по параметрам командной строки.
+
+    :param argv: параметры командной строки (None - sys.argv[1:])
+    :return: код возврата
+    """
+    args = parse_args(argv)
+
+    filenames = expand_inputs(args.inputs, args.postfix)
+    if not filenames:
+        print('Error: no input files found', file=sys.stderr)
+        return EXIT_USAGE
+
+    step_z: Dict[float, Union[int, float]] = dict(settings.STEP_Z)
+    step_z.update(args.step_z)
+
+    if args.output_dir is not None:
+        os.makedirs(args.output_dir, exist_ok=True)
+    log_dir = args.log_dir or args.output_dir or '.'
+    os.makedirs(log_dir, exist_ok=True)
+
+    cache_size = (None if args.weights_cache_size is None
+                  else int(args.weights_cache_size * 2 ** 20))
+
+    # генерируем имя текстового файла для логов
+    file_txt = utils.filepath_txt(log_dir)
+    run_log = (os.path.splitext(file_txt)[0] + '.jsonl' if args.run_log
+               else None)
+
+    if args.phases is not None:
+        try:
+            processing.process_phases(filenames,
+                                      file_txt,
+                                      settings.COLUMNS_COORD,
+                                      step_z,
+                                      args.phases,
+                                      cache_dir=args.cache_dir,
+                                      eps_x=args.eps_x,
+                                      eps_z=args.eps_z,
+                                      cache_size=cache_size,
+                                      engine=args.engine,
+                                      eps_fallback=args.eps_fallback,
+                                      dedup_tolerance=args.dedup_tolerance,
+                                      dedup_policy=args.dedup_policy)
+        except Exception as exc:
+            print(f'Error: {exc}', file=sys.stderr)
+            return EXIT_FAILED
+        return EXIT_OK
+
+    failed = processing.process_files(filenames,
+                                      file_txt,
+                                      settings.COLUMNS_COORD,
+                                      step_z,
+                                      args.postfix,
+                                      info_sheets=args.info_sheets,
+                                      workers=args.workers,
+                                      tiles=args.tiles,
+                                      write_only=args.write_only,
+                                      journal=args.journal,
+                                      cache_dir=args.cache_dir,
+                                      eps_x=args.eps_x,
+                                      eps_z=args.eps_z,
+                                      out_dir=args.output_dir,
+                                      cache_size=cache_size,
+                                      log_level=args.log_level,
+                                      profile=args.profile,
+                                      run_log=run_log,
+                                      engine=args.engine,
+                                      eps_fallback=args.eps_fallback,
+                                      dedup_tolerance=args.dedup_tolerance,
+                                      dedup_policy=args.dedup_policy)
+    if failed:
+        print(f'Failed {len(failed)} of {len(filenames)} files:',
+              file=sys.stderr)
+        for filepath in failed:
+            print(f'  {filepath}', file=sys.stderr)
+        return EXIT_FAILED
+    return EXIT_OK
+
+
+if __name__ == '__main__':
+    sys.exit(main())
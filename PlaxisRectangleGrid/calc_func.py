@@ -1,4 +1,5 @@
 #!/usr/bin/env python
+from typing import Tuple
 import numpy as np
 
 
@@ -19,67 +20,246 @@ def distance_euc(point: np.ndarray, points: np.ndarray) -> np.ndarray:
     return np.sqrt(np.einsum("ij,ij->j", vector_coords, vector_coords))
 
 
+def intersect_many(nodes: np.ndarray, triangles: np.ndarray) -> np.ndarray:
+    """
+    Векторизованный вариант функции intersect для массива пар
+    (узел, треугольник). Для каждой пары вычисляет точку пересечения
+    плоскости, образованной 3 точками треугольника, и прямой, проходящей
+    через узел перпендикулярно плоскости (XoY).
+
+    :param nodes: точки на плоскости XoY ([[x1, y1], [x2, y2], ...]),
+    допускаются лишние столбцы ([[x1, y1, z1], ...])
+    :param triangles: тройки точек пространства размером (N, 3, 3)
+    ([[[x1, y1, z1], [x2, y2, z2], [x3, y3, z3]], ...])
+    :return: координаты пересечения прямых и плоскостей ([nz1, nz2, ...])
+    """
+    nodes = np.asarray(nodes, dtype=float)
+    triangles = np.asarray(triangles, dtype=float)
+
+    p1 = triangles[:, 0]
+    vec_1 = triangles[:, 1] - p1
+    vec_2 = triangles[:, 2] - p1
+
+    a = vec_1[:, 1] * vec_2[:, 2] - vec_1[:, 2] * vec_2[:, 1]  # минор 1.1
+    b = vec_1[:, 2] * vec_2[:, 0] - vec_1[:, 0] * vec_2[:, 2]  # минор 1.2
+    c = vec_1[:, 0] * vec_2[:, 1] - vec_1[:, 1] * vec_2[:, 0]  # минор 1.3
+
+    ax = a * (nodes[:, 0] - p1[:, 0])
+    by = b * (nodes[:, 1] - p1[:, 1])
+    cz = c * p1[:, 2]
+
+    return (-1) * (ax + by - cz) / c
+
+
+def intersect_weights(nodes: np.ndarray,
+                      triangles: np.ndarray) -> np.ndarray:
+    """
+    Веса пересечения intersect_many (барицентрические координаты узла в
+    треугольнике на плоскости XoY): 3я координата точки пересечения равна
+    w1 * z1 + w2 * z2 + w3 * z3. Веса зависят только от координат на
+    плоскости XoY.
+
+    :param nodes: точки на плоскости XoY ([[x1, y1], [x2, y2], ...]),
+    допускаются лишние столбцы ([[x1, y1, z1], ...])
+    :param triangles: тройки точек размером (N, 3, 2), допускаются лишние
+    столбцы ([[[x1, y1], [x2, y2], [x3, y3]], ...])
+    :return: веса вершин треугольников размером (N, 3) ([[w1, w2, w3], ...])
+    """
+    nodes = np.asarray(nodes, dtype=float)
+    triangles = np.asarray(triangles, dtype=float)
+
+    p1 = triangles[:, 0, :2]
+    vec_1 = triangles[:, 1, :2] - p1
+    vec_2 = triangles[:, 2, :2] - p1
+    vec_node = nodes[:, :2] - p1
+
+    c = vec_1[:, 0] * vec_2[:, 1] - vec_1[:, 1] * vec_2[:, 0]  # минор 1.3
+    w2 = (vec_node[:, 0] * vec_2[:, 1] - vec_node[:, 1] * vec_2[:, 0]) / c
+    w3 = (vec_1[:, 0] * vec_node[:, 1] - vec_1[:, 1] * vec_node[:, 0]) / c
+    return np.column_stack([1 - w2 - w3, w2, w3])
+
+
 def intersect(point: np.ndarray, points: np.ndarray) -> float:
     """
     Функция вычисляет точку пересечения плоскости образованной
     3 точками(points) и прямой проходящей через точку point перпендикулярной
     плоскости (XoY). В основе лежит преобразованный метод из аналитической
-    геометрии.
+    геометрии. Обертка над intersect_many для одной точки.
 
     :param point: точка на плоскости XoY ([x, y])
     :param points: точки пространства ([[x1, y1, z1], [x2, y2, z2],
     [x3, y3, z3]])
     :return: координата пересечения прямой и плоскости
     """
-    p1 = points[0]
-    p2 = points[1]
-    p3 = points[2]
+    nodes = np.asarray(point, dtype=float)[np.newaxis]
+    triangles = np.asarray(points, dtype=float)[np.newaxis]
+    return intersect_many(nodes, triangles)[0]
+
+
+def interpolate_many(nodes: np.ndarray, segments: np.ndarray) -> np.ndarray:
+    """
+    Векторизованный вариант функции interpolate для массива пар
+    (узел, отрезок). Для каждой пары вычисляет значение в узле методом
+    линейной интерполяции между 2 точками отрезка: веса interpolate_weights,
+    примененные к 3им координатам точек. Узел должен принадлежать
+    проекции линии, проходящей через точки отрезка, на плоскость XoY.
+
+    :param nodes: точки на плоскости XoY ([[x1, y1], [x2, y2], ...]),
+    допускаются лишние столбцы ([[x1, y1, z1], ...])
+    :param segments: пары точек пространства размером (N, 2, 3)
+    ([[[x1, y1, z1], [x2, y2, z2]], ...])
+    :return: перемещения для узлов по 3ей координате ([u_y1, u_y2, ...])
+    """
+    segments = np.asarray(segments, dtype=float)
+    weights = interpolate_weights(nodes, segments)
+    return np.einsum("ij,ij->i", weights, segments[:, :, 2])
+
+
+def interpolate_weights(nodes: np.ndarray,
+                        segments: np.ndarray) -> np.ndarray:
+    """
+    Веса линейной интерполяции interpolate_many: значение в узле равно
+    w1 * y1 + w2 * y2, где y1, y2 - 3и координаты точек отрезка. Веса
+    зависят только от координат на плоскости XoY, поэтому одни и те же веса
+    применяются к любым значениям в точках отрезка.
+
+    :param nodes: точки на плоскости XoY ([[x1, y1], [x2, y2], ...]),
+    допускаются лишние столбцы ([[x1, y1, z1], ...])
+    :param segments: пары точек размером (N, 2, 2), допускаются лишние
+    столбцы ([[[x1, y1], [x2, y2]], ...])
+    :return: веса точек отрезков размером (N, 2) ([[w1, w2], ...])
+    """
+    nodes = np.asarray(nodes, dtype=float)
+    segments = np.asarray(segments, dtype=float)
+
+    p1, p2 = segments[:, 0], segments[:, 1]
 
-    p1x, p1y, p1z = p1
-    nx, ny = point[0], point[1]
+    vertical = p1[:, 0] == p2[:, 0]
+    horizontal = ~vertical & (p1[:, 1] == p2[:, 1])
 
-    vec_1 = p2 - p1
-    vec_2 = p3 - p1
+    # в общем случае интерполируем по расстоянию вдоль линии от 1ой точки
+    vec_line = p2[:, :2] - p1[:, :2]
+    vec_node = nodes[:, :2] - p1[:, :2]
+    x1 = np.zeros(len(segments))
+    x2 = np.sqrt(np.einsum("ij,ij->i", vec_line, vec_line))
+    x = np.sqrt(np.einsum("ij,ij->i", vec_node, vec_node))
 
-    a = np.cross(vec_1[1:], vec_2[1:])  # минор 1.1
-    b = (-1) * np.cross(vec_1[[0, 2]], vec_2[[0, 2]])  # минор 1.2
-    c = np.cross(vec_1[:2], vec_2[:2])  # минор 1.3
+    # для вертикальной линии интерполируем по 2ой координате
+    x1 = np.where(vertical, p1[:, 1], x1)
+    x2 = np.where(vertical, p2[:, 1], x2)
+    x = np.where(vertical, nodes[:, 1], x)
 
-    ax = a * (nx - p1x)
-    by = b * (ny - p1y)
-    cz = c * p1z
+    # для горизонтальной линии интерполируем по 1ой координате
+    x1 = np.where(horizontal, p1[:, 0], x1)
+    x2 = np.where(horizontal, p2[:, 0], x2)
+    x = np.where(horizontal, nodes[:, 0], x)
 
-    nz = (-1) * (ax + by - cz) / c
-    return nz
+    weight = (x - x2) / (x1 - x2)
+    return np.column_stack([weight, 1 - weight])
 
 
 def interpolate(point: np.ndarray, points: np.ndarray) -> float:
     """
     Функция вычисляет значение в точке методом линейной интерполяции.
     Точка point должна принадлежать проекции линии проходящей через
-    2 точки points на плоскость XoY.
+    2 точки points на плоскость XoY. Обертка над interpolate_many для одной
+    точки.
 
     :param point: точка на плоскости XoY ([x, y])
     :param points: точки пространства ([[x1, y1, z1], [x2, y2, z2]])
     :return: перемещение для точки point по 3ей координате
     """
-    p1x, p1z, p1_uy = points[0]
-    p2x, p2z, p2_uy = points[1]
-    y1, y2 = p1_uy, p2_uy
-    nx, nz = point[:-1]
+    nodes = np.asarray(point, dtype=float)[np.newaxis]
+    segments = np.asarray(points, dtype=float)[np.newaxis]
+    return interpolate_many(nodes, segments)[0]
+
+
+# коды положения точки относительно треугольника для point4triangle2d_many
+DEGENERATE = -1  # вырожденный треугольник: точка на 2 сторонах из 1 вершины
+OUTSIDE = 0
+LINE = 1
+INSIDE = 2
+
+COMMANDS = {OUTSIDE: 'outside', LINE: 'line', INSIDE: 'inside'}
+
+
+def point4vectors2d_many(nodes: np.ndarray,
+                         starts: np.ndarray,
+                         ends: np.ndarray) -> np.ndarray:
+    """
+    Векторизованный вариант Point.point4vectors2d. Определяет положение
+    каждой точки nodes относительно вектора (starts -> ends) на плоскости
+    по знаку векторного произведения.
+    0 - принадлежит вектору,
+    1 - лежит правее,
+    -1 - лежит левее.
+
+    :param nodes: точки на плоскости ([[x1, z1], [x2, z2], ...]),
+    допускаются лишние столбцы
+    :param starts: начала векторов ([[x1, z1], ...]), допускаются лишние
+    столбцы
+    :param ends: концы векторов ([[x1, z1], ...]), допускаются лишние столбцы
+    :return: знаки векторных произведений ([1, 0, -1, ...])
+    """
+    vec_1 = nodes[..., :2] - starts[..., :2]  # векторы до данных точек
+    vec_2 = ends[..., :2] - starts[..., :2]  # векторы до концов
+
+    return np.sign(vec_2[..., 0] * vec_1[..., 1] -
+                   vec_2[..., 1] * vec_1[..., 0])
+
+
+def point4triangle2d_many(nodes: np.ndarray,
+                          triangles: np.ndarray
+                          ) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Векторизованный вариант GridPoint.point4triangle2d для массива пар
+    (узел, треугольник). Выполняет те же проверки знаков векторных
+    произведений из 1ой вершины, а затем из 3ей вершины (набор точек,
+    смещенный на 1 шаг), но сразу для всех пар.
+
+    Коды результата: LINE - узел лежит на прямой, проходящей через сторону
+    треугольника; INSIDE - внутри; OUTSIDE - снаружи; DEGENERATE - узел
+    лежит на прямых обеих сторон из одной вершины (вырожденный треугольник,
+    скалярная версия в этом случае завершается исключением).
+
+    :param nodes: точки на плоскости ([[x1, z1], [x2, z2], ...]),
+    допускаются лишние столбцы
+    :param triangles: тройки точек размером (N, 3, 3)
+    ([[[x1, z1, u_y1], [x2, z2, u_y2], [x3, z3, u_y3]], ...])
+    :return: массив кодов (N,) и массив сторон (N, 2) для кодов LINE -
+    номера вершин треугольника (начало, конец стороны), для остальных кодов
+    заполнен -1
+    """
+    nodes = np.asarray(nodes, dtype=float)
+    triangles = np.asarray(triangles, dtype=float)
+
+    codes = np.full(len(triangles), INSIDE)
+    edges = np.full((len(triangles), 2), -1)
+    undefined = np.ones(len(triangles), dtype=bool)
+
+    # 2 набора точек: исходный и со смещением элементов вправо на 1 шаг
+    # (номера вершин набора в треугольнике)
+    for vertices in ((0, 1, 2), (2, 0, 1)):
+        set_ = triangles[:, vertices]
+        start = set_[:, 0]
+        sign = point4vectors2d_many(nodes[:, np.newaxis],
+                                    start[:, np.newaxis],
+                                    set_[:, 1:])
+        zero = sign == 0
 
-    if p1x == p2x:
-        x1, x2 = p1z, p2z
-        x = nz
+        # узел на прямой стороны: берем сторону с нулевым произведением
+        line = undefined & (np.sum(zero, axis=1) == 1)
+        codes[line] = LINE
+        edges[line, 0] = vertices[0]
+        edges[line, 1] = np.where(zero[line, 0], vertices[1], vertices[2])
 
-    elif p1z == p2z:
-        x1, x2 = p1x, p2x
-        x = nx
+        degenerate = undefined & np.all(zero, axis=1)
+        codes[degenerate] = DEGENERATE
 
-    else:
-        x1, x2 = 0, distance_euc(points[0][:-1], points[1][:-1])
-        x = distance_euc(points[0][:-1], point[:-1])
+        outside = (undefined & ~np.any(zero, axis=1) &
+                   (sign[:, 0] == sign[:, 1]))
+        codes[outside] = OUTSIDE
 
-    u_y = (y1 - y2) * (x - x2) / (x1 - x2) + y2
+        undefined &= ~(line | degenerate | outside)
 
-    return u_y
+    return codes, edges
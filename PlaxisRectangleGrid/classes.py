@@ -1,12 +1,16 @@
 #!/usr/bin/env python
-from typing import Tuple, Dict, Union, NoReturn
+from typing import Callable, Tuple, Dict, Iterable, List, Union, NoReturn
+import copy
+import itertools
 import numpy as np
 
-from PlaxisRectangleGrid import utils
+from PlaxisRectangleGrid import utils, profiling, delaunay, calc_func as calc
 from PlaxisRectangleGrid.calc_func import distance_euc
 
 
 class Point(object):
+    __slots__ = ('_coords',)
+
     def __init__(self, pt):
         self._coords = pt
 
@@ -49,7 +53,8 @@ class Point(object):
     def nearby_points(self,
                       points: np.ndarray,
                       eps_x=1,
-                      eps_z=1
+                      eps_z=1,
+                      index: 'PointsIndex' = None
                       ) -> Tuple[np.ndarray, list]:
         """
         Функция поиска ближайщих точек массива для данной точки. Ищет в
@@ -64,6 +69,9 @@ class Point(object):
         (имеет смысл задавать как шаг сетки)
         :param eps_z: окрестность поиска по вертикальной оси
         (имеет смысл задавать как шаг сетки)
+        :param index: пространственный индекс PointsIndex, построенный по
+        массиву points. Если задан, границы окрестности проверяются только у
+        точек из ячеек индекса, попадающих в окрестность.
         :return: возвращает массив ближайщих точек(максимум 4) и
         массив расстояний от этих точек до данной точки
         """
@@ -73,6 +81,11 @@ class Point(object):
         upper_limit = self.z + eps_z  # верхняя граница поиска
         lower_limit = self.z - eps_z  # нижняя граница поиска
 
+        # отбираем кандидатов по индексу(порядок точек сохраняется)
+        if index is not None:
+            points = points[index.query(left_limit, right_limit,
+                                        lower_limit, upper_limit)]
+
         # Ищем точки в заданной окрестности (eps_x, eps_z)
         eps_area = points[np.where(
             (points[:, 0] <= right_limit) &
@@ -153,6 +166,160 @@ class Point(object):
         return f"x: {x}, z: {z} u_z: {u_z}"
 
 
+class PointsIndex(object):
+    """
+    Пространственный индекс точек - равномерная сетка ячеек(корзин) на
+    плоскости XoZ. Строится один раз для массива точек листа, после чего
+    поиск точек в окрестности узла ограничивается ячейками, попадающими в
+    эту окрестность, вместо просмотра всего массива.
+    """
+
+    def __init__(self,
+                 points: np.ndarray,
+                 cell_x: Union[int, float],
+                 cell_z: Union[int, float]):
+        """
+        :param points: массив точек [[x1, z1, u_y1], [x2, z2, u_y2] ...]
+        :param cell_x: размер ячейки по X (имеет смысл задавать как шаг сетки)
+        :param cell_z: размер ячейки по Z (имеет смысл задавать как шаг сетки)
+        """
+        self.points = points
+        self.cell_x = abs(float(cell_x))
+        self.cell_z = abs(float(cell_z))
+
+        self._x0 = points[:, 0].min() if len(points) else 0.
+        self._z0 = points[:, 1].min() if len(points) else 0.
+
+        cells_x = self._cells(points[:, 0], self._x0, self.cell_x)
+        cells_z = self._cells(points[:, 1], self._z0, self.cell_z)
+        self._nx = int(cells_x.max()) + 1 if len(points) else 1
+        self._nz = int(cells_z.max()) + 1 if len(points) else 1
+
+        # сортируем точки по номеру ячейки (построчно), сохраняя исходный
+        # порядок точек внутри ячейки
+        keys = cells_z * self._nx + cells_x
+        self._order = np.argsort(keys, kind='stable')
+        self._keys = keys[self._order]
+
+    @staticmethod
+    def _cells(coords: np.ndarray, origin: float, size: float) -> np.ndarray:
+        """
+        Номера ячеек для координат. Вычисление монотонно по координате,
+        поэтому точка, лежащая на границе окрестности, всегда попадает в
+        ячейку этой границы.
+        """
+        return np.floor((coords - origin) / size).astype(np.int64)
+
+    def query(self,
+              left: float,
+              right: float,
+              lower: float,
+              upper: float) -> np.ndarray:
+        """
+        Возвращает индексы точек из ячеек, пересекающих прямоугольник
+        [left, right] x [lower, upper]. Индексы отсортированы по возрастанию,
+        т.е. порядок точек совпадает с порядком в исходном массиве.
+        Результат является надмножеством точек прямоугольника - точную
+        проверку границ выполняет вызывающий код.
+
+        :return: массив индексов точек [idx1, idx2, ...]
+        """
+        x_lo, x_hi = self._cells(np.array([left, right]),
+                                 self._x0, self.cell_x)
+        z_lo, z_hi = self._cells(np.array([lower, upper]),
+                                 self._z0, self.cell_z)
+        x_lo, z_lo = max(x_lo, 0), max(z_lo, 0)
+        x_hi, z_hi = min(x_hi, self._nx - 1), min(z_hi, self._nz - 1)
+
+        if x_lo > x_hi or z_lo > z_hi:
+            return np.empty(0, dtype=np.int64)
+
+        # в каждой строке ячеек искомые ячейки идут подряд
+        rows = np.arange(z_lo, z_hi + 1) * self._nx
+        starts = np.searchsorted(self._keys, rows + x_lo, side='left')
+        ends = np.searchsorted(self._keys, rows + x_hi, side='right')
+
+        idx = np.concatenate([self._order[start:end]
+                              for start, end in zip(starts, ends)])
+        return np.sort(idx)
+
+    def pairs(self,
+              x: np.ndarray,
+              z: np.ndarray,
+              eps_x: float,
+              eps_z: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Пакетный аналог query для набора центров (узлов сетки, точек
+        запроса): пары (точка, центр), точки которых лежат в окрестности
+        [x - eps_x, x + eps_x] x [z - eps_z, z + eps_z] центра. Границы
+        окрестности проверяются теми же сравнениями, что и в
+        Point.nearby_points, без цикла по центрам.
+
+        :param x: координаты X центров
+        :param z: координаты Z центров
+        :param eps_x: окрестность поиска по горизонтальной оси
+        :param eps_z: окрестность поиска по вертикальной оси
+        :return: (индексы точек, номера центров) пар
+        """
+        x = np.asarray(x, dtype=float)
+        z = np.asarray(z, dtype=float)
+        x_lo = np.maximum(self._cells(x - eps_x, self._x0, self.cell_x), 0)
+        x_hi = np.minimum(self._cells(x + eps_x, self._x0, self.cell_x),
+                          self._nx - 1)
+        z_lo = np.maximum(self._cells(z - eps_z, self._z0, self.cell_z), 0)
+        z_hi = np.minimum(self._cells(z + eps_z, self._z0, self.cell_z),
+                          self._nz - 1)
+        n_rows = np.where(x_lo <= x_hi, np.clip(z_hi - z_lo + 1, 0, None), 0)
+
+        # строки ячеек каждого центра: в строке искомые ячейки идут подряд
+        center = np.repeat(np.arange(len(x)), n_rows)
+        rows = z_lo[center] + (np.arange(len(center)) -
+                               np.repeat(np.cumsum(n_rows) - n_rows, n_rows))
+        starts = np.searchsorted(self._keys, rows * self._nx + x_lo[center],
+                                 side='left')
+        ends = np.searchsorted(self._keys, rows * self._nx + x_hi[center],
+                               side='right')
+
+        # разворачиваем диапазоны точек строк в пары
+        lengths = ends - starts
+        pos = (np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) +
+               np.arange(lengths.sum()))
+        pt_idx = self._order[pos]
+        center = np.repeat(center, lengths)
+
+        px, pz = self.points[pt_idx, 0], self.points[pt_idx, 1]
+        cx, cz = x[center], z[center]
+        inside = ((px <= cx + eps_x) & (px >= cx - eps_x) &
+                  (pz <= cz + eps_z) & (pz >= cz - eps_z))
+        return pt_idx[inside], center[inside]
+
+
+# команды журнала операций узла GridPoint.logs, код команды - индекс в кортеже
+JOURNAL_COMMANDS = ('point', 'no_point', 'line', 'outside', 'inside',
+                    'fallback')
+
+# уровни журнала операций узлов сетки RectangleGrid
+LOG_OFF = 'off'  # журнал не ведется
+LOG_COUNTS = 'counts'  # только количество операций каждой команды
+LOG_FULL = 'full'  # все операции: коды команд и индексы точек
+LOG_LEVELS = (LOG_OFF, LOG_COUNTS, LOG_FULL)
+
+# ветви расчета узлов (RectangleGrid.branch_counts): совпадение с точкой,
+# 2 ближайшие точки (линия), 3-4 точки (треугольники), перемещение не
+# найдено, вырожденный треугольник (одна строка 'Warning' на лист),
+# перемещение найдено повторным расчетом с увеличенной окрестностью поиска
+BRANCHES = ('point', 'line', 'triangle', 'errors', 'warnings', 'fallback')
+
+# во сколько раз увеличиваются окрестности поиска на каждом шаге повторного
+# расчета узлов (см. RectangleGrid.fallback_weights)
+FALLBACK_GROWTH = 2
+
+# методы расчета весов интерполяции RectangleGrid
+ENGINE_QUADRANT = 'quadrant'  # ближайшие точки в 4 четвертях от узла
+ENGINE_DELAUNAY = 'delaunay'  # треугольник триангуляции Делоне точек
+ENGINES = (ENGINE_QUADRANT, ENGINE_DELAUNAY)
+
+
 def write_log(method):
     """
     Декоратор для записи лога операции над точками
@@ -161,7 +328,9 @@ def write_log(method):
     """
     def wrapper(self, *args, **kwargs):
         command, points = method(self, *args, **kwargs)
-        self.logs.append([command, points])
+        logs = self.logs
+        logs.append([command, points])
+        self.logs = logs  # для GridPointView журнал узла сохраняется в сетке
         return command, points
     return wrapper
 
@@ -170,6 +339,8 @@ class GridPoint(Point):
     """
     Класс узла сетки.
     """
+    __slots__ = ('logs',)
+
     def __init__(self, pt):
         super().__init__(pt)
         self.logs = []
@@ -253,9 +424,180 @@ class GridPoint(Point):
         return 'inside', np.array(points)
 
 
+# состояние узла сетки RectangleGrid.status
+NODE_NEW = 0  # перемещение не вычислялось
+NODE_SUCCESS = 1  # перемещение найдено
+NODE_ERROR = 2  # перемещение не найдено
+
+
+class GridPointView(GridPoint):
+    """
+    Узел сетки RectangleGrid в виде GridPoint без собственных данных:
+    координаты, перемещение и журнал операций читаются из массивов сетки и
+    записываются в них. Для совместимости с кодом, работающим с узлами
+    GridPoint (SheetInfo.write_journal и т.п.).
+    """
+    __slots__ = ('_grid', '_index')
+
+    def __init__(self, grid: 'RectangleGrid', index: int):
+        self._grid = grid
+        self._index = index
+
+    @property
+    def _coords(self) -> np.ndarray:
+        return self._grid.coords[self._index]
+
+    @property
+    def u_y(self) -> Union[float, None]:
+        if self._grid.status[self._index] != NODE_SUCCESS:
+            return None
+        return self._grid.coords[self._index, 2]
+
+    @u_y.setter
+    def u_y(self, u_y: Union[int, float, None]) -> NoReturn:
+        if u_y is None:
+            self._grid.coords[self._index, 2] = np.nan
+            self._grid.status[self._index] = NODE_ERROR
+        else:
+            self._grid.coords[self._index, 2] = u_y
+            self._grid.status[self._index] = NODE_SUCCESS
+
+    @property
+    def coords(self) -> list:
+        return [self.x, self.z, self.u_y]
+
+    @property
+    def logs(self) -> list:
+        return self._grid.node_logs(self._index)
+
+    @logs.setter
+    def logs(self, logs: list) -> NoReturn:
+        self._grid.logs[self._index] = logs
+
+
+class InterpolationWeights(object):
+    """
+    Веса интерполяции перемещений из точек в узлы прямоугольной сетки -
+    разреженная матрица (узлы x точки) в формате COO: перемещение в узле
+    rows[i] получает вклад weights[i] * u_y точки cols[i]. Вместе с весами
+    хранится журнал операций узлов по индексам точек (см.
+    RectangleGrid.interpolation_weights) и геометрия и метод расчета
+    (engine, см. ENGINES), по которым они вычислены, - для повторного
+    использования на листах с теми же координатами точек.
+    """
+
+    # массивы журнала операций (см. RectangleGrid.interpolation_weights)
+    JOURNAL_FIELDS = ('op_node', 'op_command', 'op_offset', 'op_points',
+                      'degenerate', 'branches', 'fallback')
+
+    def __init__(self,
+                 grid_x: np.ndarray,
+                 grid_z: np.ndarray,
+                 xz: np.ndarray,
+                 eps: Tuple[float, float, float, float],
+                 rows: np.ndarray,
+                 cols: np.ndarray,
+                 weights: np.ndarray,
+                 journal: Dict[str, np.ndarray],
+                 engine: str = ENGINE_QUADRANT):
+        self.grid_x = np.array(grid_x, dtype=float)
+        self.grid_z = np.array(grid_z, dtype=float)
+        self.xz = np.array(xz, dtype=float)
+        self.eps = tuple(float(value) for value in eps)
+        self.rows = rows
+        self.cols = cols
+        self.weights = weights
+        self.journal = journal
+        self.engine = str(engine)
+        # узлы, в которых перемещение найдено
+        self.success = np.bincount(rows, minlength=self.n_nodes) > 0
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.grid_x) * len(self.grid_z)
+
+    def fits(self,
+             grid: 'RectangleGrid',
+             points: np.ndarray,
+             eps: Tuple[float, float, float, float],
+             engine: str = ENGINE_QUADRANT) -> bool:
+        """
+        Проверяет, что веса вычислены тем же методом для той же сетки, тех
+        же координат X, Z точек (в том же порядке) и тех же окрестностей
+        поиска.
+        """
+        return (self.engine == engine and
+                self.eps == tuple(float(value) for value in eps) and
+                np.array_equal(self.grid_x, grid.grid_x) and
+                np.array_equal(self.grid_z, grid.grid_z) and
+                np.array_equal(self.xz, points[:, :2]))
+
+    def apply(self, values: np.ndarray) -> np.ndarray:
+        """
+        Произведение матрицы весов на вектор значений в точках.
+
+        :param values: значения в точках (например, u_y) размером (n,)
+        :return: значения в узлах в порядке обхода journal_pts, np.nan если
+        перемещение в узле не найдено
+        """
+        # при пустых весах bincount возвращает целые числа
+        result = np.bincount(self.rows,
+                             weights=self.weights * values[self.cols],
+                             minlength=self.n_nodes).astype(float)
+        result[~self.success] = np.nan
+        return result
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """
+        Представляет веса в виде плоских массивов для записи в файл (npz).
+
+        :return: словарь {название_массива: массив}
+        """
+        arrays = {'grid_x': self.grid_x,
+                  'grid_z': self.grid_z,
+                  'xz': self.xz,
+                  'eps': np.array(self.eps),
+                  'rows': self.rows,
+                  'cols': self.cols,
+                  'weights': self.weights,
+                  'engine': np.array(self.engine)}
+        arrays.update(self.journal)
+        return arrays
+
+    @classmethod
+    def from_arrays(cls,
+                    arrays: Dict[str, np.ndarray]) -> 'InterpolationWeights':
+        """
+        Восстанавливает веса из массивов to_arrays (например, загруженных из
+        файла npz).
+
+        :param arrays: словарь {название_массива: массив}
+        :return: экземпляр InterpolationWeights
+        """
+        return cls(arrays['grid_x'], arrays['grid_z'], arrays['xz'],
+                   arrays['eps'], arrays['rows'], arrays['cols'],
+                   arrays['weights'],
+                   {name: arrays[name] for name in cls.JOURNAL_FIELDS},
+                   str(arrays['engine']))
+
+
 class RectangleGrid(object):
     """
     Класс создает массив точек(узлов) прямоугольной сетки.
+    Узлы хранятся в массивах (в порядке обхода по столбцам, внутри столбца -
+    по строкам): coords - координаты и перемещения [[x, z, u_y], ...],
+    status - состояние узла (NODE_NEW, NODE_SUCCESS, NODE_ERROR), cells -
+    координаты ячеек узлов на листе excel [[row, col], ...].
+    Журнал операций (уровень LOG_FULL) хранится массивами journal: op_node -
+    номер узла операции (по возрастанию), op_command - код команды (индекс в
+    JOURNAL_COMMANDS), op_offset - границы точек операций в op_points,
+    op_points - индексы точек в массиве journal_points (массив точек листа,
+    не копируется). log_counts - количество операций каждой команды (уровни
+    LOG_COUNTS, LOG_FULL). logs - журналы в виде списков
+    {номер_узла: [[команда, точки], ...]} для узлов, журнал которых изменен
+    через GridPoint (см. GridPointView), имеют приоритет над journal.
+    branch_counts - количество узлов каждой ветви расчета (см. BRANCHES),
+    timings - время этапов расчета листа (см. profiling.StageTimer).
     """
 
     def __init__(self,
@@ -268,8 +610,20 @@ class RectangleGrid(object):
         self._step_z = self.set_step_z(step_z)
         self._grid_x = None
         self._grid_z = None
-        self.journal_pts = self.create_grid()
-        self.main_info = {'Points': len(self.journal_pts),
+        self.coords = None
+        self.status = None
+        self.cells = None
+        self.journal = None
+        self.journal_points = None
+        self._first_op = None
+        self.log_counts = {}
+        self.branch_counts = {}
+        self.timings = {}
+        self.logs = {}
+        self.create_grid()
+        self.weights = None  # веса последнего расчета calc_displacements
+        self.n_points = None  # количество точек листа (см. calc_sheet)
+        self.main_info = {'Points': len(self.coords),
                           'Success': 0,
                           'Errors': 0
                           }
@@ -310,14 +664,13 @@ class RectangleGrid(object):
     def step_z(self) -> float:
         return self._step_z
 
-    def create_grid(self) -> Dict[Tuple[int, int], GridPoint]:
+    def create_grid(self) -> NoReturn:
         """
-        Создает узлы сетки как класс GridPoint для каждого узла,
-        на длине и глубине равной self.length, self.depth и шагом
-        self._step_x, self._step_z. Узел имеет координаты [x, z, 0.].
-        Связывает эти узлы с координатами ячейки на листе в excel.
-        :return: Возвращает словарь, где ключ - координатами ячейки на
-        листе в excel; значение - объект GridPoint([x, z, 0.])
+        Создает массивы узлов сетки на длине и глубине равной self.length,
+        self.depth и шагом self._step_x, self._step_z. Узел имеет координаты
+        [x, z, nan]. Связывает эти узлы с координатами ячейки на листе в
+        excel.
+        :return: NoReturn
         """
 
         length = self.length
@@ -330,10 +683,1022 @@ class RectangleGrid(object):
         grid_z[-1] = self.depth
         self._grid_z = grid_z
 
-        journal_pts = {(row, col): GridPoint([x, z, 0.])
-                       for col, x in enumerate(self._grid_x, 2)
-                       for row, z in enumerate(self._grid_z, 2)}
-        return journal_pts
+        n_x, n_z = len(self._grid_x), len(self._grid_z)
+        self.coords = np.column_stack([np.repeat(self._grid_x, n_z),
+                                       np.tile(self._grid_z, n_x),
+                                       np.full(n_x * n_z, np.nan)])
+        self.status = np.full(n_x * n_z, NODE_NEW, dtype=np.int8)
+        self.cells = np.column_stack([np.tile(np.arange(2, n_z + 2), n_x),
+                                      np.repeat(np.arange(2, n_x + 2), n_z)
+                                      ]).astype(np.int32)
+
+    @property
+    def journal_pts(self) -> Dict[Tuple[int, int], GridPointView]:
+        """
+        Узлы сетки в виде словаря, где ключ - координаты ячейки на листе в
+        excel; значение - узел GridPointView. Словарь создается при каждом
+        обращении, узлы читают и изменяют массивы сетки.
+        """
+        return {(row, col): GridPointView(self, i)
+                for i, (row, col) in enumerate(self.cells.tolist())}
+
+    def split(self, rows: int, cols: int) -> List['RectangleGrid']:
+        """
+        Разбивает сетку на блоки: rows блоков по строкам и cols блоков по
+        столбцам. Блок - экземпляр RectangleGrid с частью координат
+        grid_x, grid_z и копией массивов этих узлов (координаты ячеек - на
+        листе всей сетки).
+
+        :param rows: количество блоков по строкам
+        :param cols: количество блоков по столбцам
+        :return: список блоков
+        """
+        tiles = []
+        for cols_ in np.array_split(np.arange(len(self._grid_x)), cols):
+            for rows_ in np.array_split(np.arange(len(self._grid_z)), rows):
+                if not len(cols_) or not len(rows_):
+                    continue
+
+                # номера узлов блока в порядке обхода сетки
+                nodes = (cols_[:, np.newaxis] * len(self._grid_z) +
+                         rows_).ravel()
+
+                tile = copy.copy(self)
+                tile._grid_x = self._grid_x[cols_]
+                tile._grid_z = self._grid_z[rows_]
+                tile.coords = self.coords[nodes]
+                tile.status = self.status[nodes]
+                tile.cells = self.cells[nodes]
+                tile.journal = None
+                tile.journal_points = None
+                tile._first_op = None
+                tile.log_counts = {}
+                tile.branch_counts = {}
+                tile.timings = {}
+                tile.logs = {}
+                tile.weights = None
+                tile.main_info = {'Points': len(nodes),
+                                  'Success': 0,
+                                  'Errors': 0
+                                  }
+                tiles.append(tile)
+        return tiles
+
+    def merge(self, tile: 'RectangleGrid') -> NoReturn:
+        """
+        Переносит перемещения и журналы операций узлов рассчитанного блока
+        (см. split) в узлы сетки, обновляет main_info.
+
+        :param tile: рассчитанный блок сетки
+        :return: NoReturn
+        """
+        # номера узлов блока в сетке по координатам ячеек
+        nodes = ((tile.cells[:, 1] - 2) * len(self._grid_z) +
+                 tile.cells[:, 0] - 2)
+        self.coords[nodes, 2] = tile.coords[:, 2]
+        self.status[nodes] = tile.status
+        for i, logs in tile.logs.items():
+            self.logs[nodes[i]] = logs
+        for command, count in tile.log_counts.items():
+            self.log_counts[command] = self.log_counts.get(command, 0) + count
+        for branch, count in tile.branch_counts.items():
+            self.branch_counts[branch] = (self.branch_counts.get(branch, 0) +
+                                          count)
+
+        if tile.journal is not None:
+            # точки блока добавляются в конец массива точек журнала
+            journal = tile.journal
+            n_points, n_ops_points = 0, 0
+            if self.journal is not None:
+                n_points = len(self.journal_points)
+                n_ops_points = self.journal['op_offset'][-1]
+            arrays = {'op_node': nodes[journal['op_node']],
+                      'op_command': journal['op_command'],
+                      'op_offset': journal['op_offset'] + n_ops_points,
+                      'op_points': journal['op_points'] + n_points}
+            points = tile.journal_points
+
+            if self.journal is not None:
+                arrays = {name: np.concatenate([self.journal[name],
+                                                array[1:] if name ==
+                                                'op_offset' else array])
+                          for name, array in arrays.items()}
+                points = np.concatenate([self.journal_points, points])
+            self.set_journal(take_operations(
+                arrays, np.argsort(arrays['op_node'], kind='stable')), points)
+
+        self.main_info['Success'] += tile.main_info['Success']
+        self.main_info['Errors'] += tile.main_info['Errors']
+
+    def set_journal(self,
+                    journal: Dict[str, np.ndarray],
+                    points: np.ndarray) -> NoReturn:
+        """
+        Устанавливает журнал операций сетки в виде массивов.
+
+        :param journal: массивы op_node (по возрастанию), op_command,
+        op_offset, op_points
+        :param points: массив точек, на который ссылаются индексы op_points
+        :return: NoReturn
+        """
+        self.journal = journal
+        self.journal_points = points
+        # границы операций каждого узла в массивах журнала
+        self._first_op = np.searchsorted(journal['op_node'],
+                                         np.arange(len(self.coords) + 1))
+
+    def node_logs(self, index: int) -> list:
+        """
+        Журнал операций узла в виде списка [[команда, точки], ...], как в
+        GridPoint.logs. Для журнала в виде массивов список создается при
+        каждом обращении.
+
+        :param index: номер узла
+        :return: список операций узла
+        """
+        if index in self.logs:
+            return self.logs[index]
+        if self.journal is None:
+            return []
+
+        journal = self.journal
+        offset = journal['op_offset']
+        return [[JOURNAL_COMMANDS[journal['op_command'][op]],
+                 self.journal_points[
+                     journal['op_points'][offset[op]:offset[op + 1]]]]
+                for op in range(self._first_op[index],
+                                self._first_op[index + 1])]
+
+    def journal_arrays(self) -> Dict[str, np.ndarray]:
+        """
+        Представляет журнал операций узлов сетки в виде плоских массивов
+        для компактной записи в файл (npz, csv):
+        nodes - координаты узлов [[x, z, u_y], ...] (u_y = nan, если
+        перемещение не найдено), success - найдено ли перемещение,
+        cells - координаты ячеек узлов на листе [[row, col], ...],
+        op_node - номер узла операции, op_command - код команды операции
+        (индекс в JOURNAL_COMMANDS), op_offset - границы точек операций в
+        массиве points (точки операции i: points[op_offset[i]:
+        op_offset[i + 1]]), points - точки операций [[x, z, u_y], ...],
+        info_fields, info_values - поля и значения main_info.
+
+        :return: словарь {название_массива: массив}
+        """
+        success = self.status == NODE_SUCCESS
+        op_node, op_command, op_offset, points = [], [], [0], []
+
+        if not self.logs and self.journal is not None:
+            # журнал только в виде массивов - без обхода узлов
+            journal = self.journal
+            op_node = journal['op_node']
+            op_command = journal['op_command']
+            op_offset = journal['op_offset']
+            points = [self.journal_points[journal['op_points']]]
+
+        else:
+            for i in range(len(self.coords)):
+                for command, pts in self.node_logs(i):
+                    pts = np.asarray(pts, dtype=float).reshape(-1, 3)
+                    op_node.append(i)
+                    op_command.append(JOURNAL_COMMANDS.index(command))
+                    op_offset.append(op_offset[-1] + len(pts))
+                    points.append(pts)
+
+        return {
+            'nodes': self.coords.copy(),
+            'success': success,
+            'cells': self.cells.copy(),
+            'op_node': np.array(op_node, dtype=np.int32),
+            'op_command': np.array(op_command, dtype=np.int8),
+            'op_offset': np.array(op_offset, dtype=np.int64),
+            'points': (np.concatenate(points) if points
+                       else np.empty((0, 3))),
+            'info_fields': np.array(list(self.main_info), dtype=str),
+            'info_values': np.array(list(self.main_info.values()),
+                                    dtype=np.int64)
+        }
+
+    @property
+    def nodes(self) -> np.ndarray:
+        """
+        Координаты узлов сетки [[x1, z1], [x2, z2], ...] в порядке обхода
+        словаря journal_pts (по столбцам, внутри столбца - по строкам).
+        """
+        return self.coords[:, :2]
+
+    def nearby_idx(self,
+                   points: np.ndarray,
+                   eps_x=1,
+                   eps_z=1
+                   ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Пакетный поиск ближайших точек в четвертях для всех узлов сетки сразу.
+        Повторяет логику Point.nearby_points (включая уточнение условий для
+        точек на вертикальной и горизонтальной линиях, проходящих через узел,
+        и выбор первой из равноудаленных точек), но без цикла по узлам.
+
+        Пары (точка, узел) строятся поиском по отсортированным координатам
+        сетки: для каждой точки находятся диапазоны столбцов и строк, в
+        окрестность узлов которых она попадает. Дальнейшие операции
+        выполняются над массивом пар.
+
+        Порядок четвертей как в Point.nearby_points: 0 - левее(или на
+        вертикали) и выше, 1 - левее и ниже, 2 - правее и выше, 3 - правее
+        и ниже.
+
+        :param points: массив точек [[x1, z1, u_y1], [x2, z2, u_y2] ...]
+        :param eps_x: окрестность поиска по горизонтальной оси
+        :param eps_z: окрестность поиска по вертикальной оси
+        :return: массив индексов ближайших точек в points размером
+        (кол-во узлов, 4), -1 если точки в четверти нет; массив расстояний
+        до них того же размера, np.inf если точки нет
+        """
+        grid_x = self._grid_x
+        n_z = len(self._grid_z)
+        n_nodes = len(grid_x) * n_z
+
+        # строки сетки по возрастанию Z для поиска по отсортированному массиву
+        order_z = np.argsort(self._grid_z, kind='stable')
+        grid_z = self._grid_z[order_z]
+
+        px, pz = points[:, 0], points[:, 1]
+
+        # диапазоны столбцов [col_lo, col_hi) и строк [row_lo, row_hi),
+        # в окрестность узлов которых попадает точка. Используются те же
+        # сравнения, что и в Point.nearby_points
+        col_lo = np.searchsorted(grid_x + eps_x, px, side='left')
+        col_hi = np.searchsorted(grid_x - eps_x, px, side='right')
+        row_lo = np.searchsorted(grid_z + eps_z, pz, side='left')
+        row_hi = np.searchsorted(grid_z - eps_z, pz, side='right')
+
+        n_cols = np.clip(col_hi - col_lo, 0, None)
+        n_rows = np.clip(row_hi - row_lo, 0, None)
+        counts = n_cols * n_rows
+
+        # разворачиваем диапазоны в пары (точка, узел)
+        pt_idx = np.repeat(np.arange(len(points)), counts)
+        offset = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) -
+                                                     counts, counts)
+        rows_pt = n_rows[pt_idx]
+        col = col_lo[pt_idx] + offset // rows_pt
+        row = order_z[row_lo[pt_idx] + offset % rows_pt]
+        node = col * n_z + row
+
+        return self._nearest_quarters(points, pt_idx, node, n_nodes,
+                                      self.coords)
+
+    def nearby_idx_nodes(self,
+                         points: np.ndarray,
+                         nodes_idx: np.ndarray,
+                         eps_x=1,
+                         eps_z=1,
+                         index: 'PointsIndex' = None
+                         ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Поиск ближайших точек в четвертях, как в nearby_idx, только для
+        части узлов сетки (например, узлов, в которых перемещение не найдено).
+        Кандидаты для узлов отбираются по пространственному индексу
+        PointsIndex (см. PointsIndex.pairs), весь массив точек не
+        просматривается.
+
+        :param points: массив точек [[x1, z1, u_y1], [x2, z2, u_y2] ...]
+        :param nodes_idx: номера узлов сетки
+        :param eps_x: окрестность поиска по горизонтальной оси
+        :param eps_z: окрестность поиска по вертикальной оси
+        :param index: пространственный индекс PointsIndex, построенный по
+        массиву points, None - строится по окрестности поиска
+        :return: массивы индексов и расстояний размером (len(nodes_idx), 4),
+        как в nearby_idx
+        """
+        if index is None:
+            index = PointsIndex(points, eps_x, eps_z)
+        coords = self.coords[nodes_idx, :2]
+        pt_idx, node = index.pairs(coords[:, 0], coords[:, 1], eps_x, eps_z)
+        return self._nearest_quarters(points, pt_idx, node, len(nodes_idx),
+                                      coords)
+
+    @staticmethod
+    def _nearest_quarters(points: np.ndarray,
+                          pt_idx: np.ndarray,
+                          node: np.ndarray,
+                          n_nodes: int,
+                          coords: np.ndarray
+                          ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Выбор ближайших точек в четвертях по парам (точка, узел), точки
+        которых попадают в окрестность узла (см. nearby_idx).
+
+        :param points: массив точек [[x1, z1, u_y1], [x2, z2, u_y2] ...]
+        :param pt_idx: индексы точек пар
+        :param node: номера узлов пар (в coords)
+        :param n_nodes: количество узлов
+        :param coords: координаты узлов [[x1, z1], ...]
+        :return: массивы индексов и расстояний размером (n_nodes, 4)
+        """
+        dx = points[pt_idx, 0] - coords[node, 0]
+        dz = points[pt_idx, 1] - coords[node, 1]
+
+        def count(mask):
+            return np.bincount(node[mask], minlength=n_nodes)
+
+        # разделение на левые(и на вертикальной линии) и правые точки.
+        # Если все точки окрестности левее - используем строгое условие
+        left_eq = dx <= 0
+        strict_x = count(left_eq) == np.bincount(node, minlength=n_nodes)
+        left = np.where(strict_x[node], dx < 0, left_eq)
+
+        # разделение на верхние(и на горизонтальной линии) и нижние точки
+        # отдельно для левых и правых. Если все точки выше - используем
+        # строгое условие
+        upper_eq = dz >= 0
+        strict_left = count(left & upper_eq) == count(left)
+        strict_right = count(~left & upper_eq) == count(~left)
+        strict_z = np.where(left, strict_left[node], strict_right[node])
+        upper = np.where(strict_z, dz > 0, upper_eq)
+
+        quarter = node * 4 + 2 * (~left) + (~upper)
+        dist = np.sqrt(np.einsum("ij,ij->j", np.array([dx, dz]),
+                                 np.array([dx, dz])))
+
+        # в каждой четверти выбираем точку с наименьшим расстоянием, среди
+        # равноудаленных - первую по порядку в points
+        order = np.lexsort((pt_idx, dist, quarter))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = quarter[order][1:] != quarter[order][:-1]
+        order = order[first]
+
+        nearby_idx = np.full(n_nodes * 4, -1, dtype=np.int64)
+        nearby_dist = np.full(n_nodes * 4, np.inf)
+        nearby_idx[quarter[order]] = pt_idx[order]
+        nearby_dist[quarter[order]] = dist[order]
+        return nearby_idx.reshape(-1, 4), nearby_dist.reshape(-1, 4)
+
+    def nearby_all(self,
+                   points: np.ndarray,
+                   eps_x=1,
+                   eps_z=1
+                   ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Пакетный аналог Point.nearby_points для всех узлов сетки (см.
+        nearby_idx). Узлы идут в порядке обхода словаря journal_pts.
+        Для узла i результат Point.nearby_points равен
+        (nearby[i][mask[i]], dist[i][mask[i]]).
+
+        :param points: массив точек [[x1, z1, u_y1], [x2, z2, u_y2] ...]
+        :param eps_x: окрестность поиска по горизонтальной оси
+        :param eps_z: окрестность поиска по вертикальной оси
+        :return: массив ближайших точек (кол-во узлов, 4, 3), np.nan если
+        точки нет; массив расстояний (кол-во узлов, 4), np.inf если точки
+        нет; маска найденных точек (кол-во узлов, 4)
+        """
+        nearby_idx, nearby_dist = self.nearby_idx(points, eps_x, eps_z)
+        mask = nearby_idx >= 0
+
+        nearby = np.full(nearby_idx.shape + (3,), np.nan)
+        nearby[mask] = points[nearby_idx[mask]]
+        return nearby, nearby_dist, mask
+
+    def interpolation_weights(self,
+                              points: np.ndarray,
+                              eps_x=1,
+                              eps_z=1,
+                              eps_match=0,
+                              eps_fallback=1) -> 'InterpolationWeights':
+        """
+        Геометрический этап расчета перемещений: для всех узлов сетки сразу
+        находит ближайшие точки и положение узла относительно них. Каждый
+        этап выполняется векторизованными функциями из calc_func.
+
+        Если ближайшая точка совпадает с узлом - берем ее перемещение.
+        Если ближайщих точек 2 и узел лежит на проекции линии через них -
+        перемещение вычисляем интерполяцией.
+        Если ближайщих точек 3-4 - создаем наборы по 3 точки из всех точек и
+        проверяем как расположен узел относительно треугольника
+        образованного набором. Если узел лежит на ребре треугольника -
+        перемещение вычисляем интерполяцией и прекращаем перебор; если
+        внутри - методом пересечения прямой, проходящей через узел
+        перпендикулярно плоскости (XoZ), и плоскости треугольника; если
+        снаружи - переходим к следующему набору.
+        Конечное значение - среднее найденных перемещений.
+
+        Все эти операции линейны по перемещениям точек, поэтому результат
+        записывается как веса точек для каждого узла (см.
+        InterpolationWeights) и журнал операций по индексам точек. Зависит
+        только от координат X, Z точек.
+
+        Узлы, в которых перемещение не найдено, при eps_fallback > 1
+        рассчитываются повторно с увеличенной окрестностью (см.
+        fallback_weights).
+
+        :param points: массив точек [[x1, z1, u_y1], [x2, z2, u_y2] ...]
+        :param eps_x: окрестность поиска по горизонтальной оси
+        :param eps_z: окрестность поиска по вертикальной оси
+        :param eps_match: окрестность в которой точки можно считать совпадающим
+        :param eps_fallback: наибольший множитель окрестностей поиска для
+        повторного расчета узлов, 1 - без повторного расчета
+        :return: экземпляр InterpolationWeights
+        """
+        nearby_idx, nearby_dist = self.nearby_idx(points, eps_x, eps_z)
+        rows, cols, weights, journal = self._quadrant_weights(
+            self.nodes, points, nearby_idx, nearby_dist, eps_match)
+        journal['fallback'] = np.zeros(len(self.coords))
+
+        weights = InterpolationWeights(self._grid_x, self._grid_z,
+                                       points[:, :2],
+                                       (eps_x, eps_z, eps_match, 1),
+                                       rows, cols, weights, journal)
+        if eps_fallback > 1:
+            weights = self.fallback_weights(weights, points, eps_fallback)
+        return weights
+
+    @staticmethod
+    def _quadrant_weights(nodes: np.ndarray,
+                          points: np.ndarray,
+                          nearby_idx: np.ndarray,
+                          nearby_dist: np.ndarray,
+                          eps_match=0
+                          ) -> Tuple[np.ndarray, np.ndarray, np.ndarray,
+                                     Dict[str, np.ndarray]]:
+        """
+        Положение узлов относительно найденных ближайших точек, веса точек и
+        журнал операций (см. interpolation_weights).
+
+        :param nodes: координаты узлов [[x1, z1], ...]
+        :param points: массив точек [[x1, z1, u_y1], [x2, z2, u_y2] ...]
+        :param nearby_idx: индексы ближайших точек (см. nearby_idx)
+        :param nearby_dist: расстояния до ближайших точек
+        :param eps_match: окрестность в которой точки можно считать совпадающим
+        :return: (rows, cols, weights, journal) - номера узлов (в nodes) и
+        индексы точек весов, веса, массивы журнала операций
+        """
+        n_nodes = len(nodes)
+        nodes_idx = np.arange(n_nodes)
+
+        # ближайшие точки: найденные сдвигаем в начало строки, сохраняя
+        # порядок четвертей
+        order = np.argsort(nearby_idx < 0, axis=1, kind='stable')
+        nearby_idx = np.take_along_axis(nearby_idx, order, axis=1)
+        nearby_dist = np.take_along_axis(nearby_dist, order, axis=1)
+        counts = np.sum(nearby_idx >= 0, axis=1)
+
+        # взаимное положение узла и ближайшей точки
+        nearest = nearby_idx[nodes_idx, np.argmin(nearby_dist, axis=1)]
+        match = (counts > 0) & (np.min(nearby_dist, axis=1) <= eps_match)
+        match_nodes = np.flatnonzero(match)
+
+        # взаимное положение узла и прямой, заданной двумя точками
+        line_nodes = np.flatnonzero(~match & (counts == 2))
+        line_idx = nearby_idx[line_nodes, :2]
+        on_line = calc.point4vectors2d_many(nodes[line_nodes],
+                                            points[line_idx[:, 0]],
+                                            points[line_idx[:, 1]]) == 0
+
+        # взаимное положение узла и треугольников из 3-4 точек. Наборы точек
+        # перебираются в порядке itertools.combinations, для 3 точек
+        # существует только первый набор
+        combs = list(itertools.combinations(range(4), 3))
+        tri_nodes = np.flatnonzero(~match & (counts > 2))
+        tri_valid = np.ones((len(tri_nodes), len(combs)), dtype=bool)
+        tri_valid[:, 1:] = counts[tri_nodes, np.newaxis] == 4
+
+        tri_idx = nearby_idx[tri_nodes][:, combs]
+        tri_codes = np.full(tri_valid.shape, calc.OUTSIDE)
+        tri_edges = np.full(tri_valid.shape + (2,), -1)
+        codes, edges = calc.point4triangle2d_many(
+            np.repeat(nodes[tri_nodes], tri_valid.sum(axis=1), axis=0),
+            points[tri_idx[tri_valid]]
+        )
+        tri_codes[tri_valid], tri_edges[tri_valid] = codes, edges
+        # индексы точек сторон треугольников, на прямой которых лежит узел
+        edge_idx = np.take_along_axis(tri_idx, np.clip(tri_edges, 0, None),
+                                      axis=2)
+
+        # перебор наборов прекращается на первом узле лежащем на линии
+        # (или на вырожденном треугольнике)
+        stop = tri_valid & np.isin(tri_codes, (calc.LINE, calc.DEGENERATE))
+        stop_pos = np.where(np.any(stop, axis=1), np.argmax(stop, axis=1),
+                            len(combs))[:, np.newaxis]
+        pos = np.arange(len(combs))
+        tri_inside = (tri_valid & (tri_codes == calc.INSIDE) &
+                      (pos < stop_pos))
+        tri_line = tri_valid & (tri_codes == calc.LINE) & (pos == stop_pos)
+        tri_logged = (tri_valid & (pos <= stop_pos) &
+                      (tri_codes != calc.DEGENERATE))
+        degenerate = np.zeros(n_nodes, dtype=bool)
+        degenerate[tri_nodes] = np.any(
+            tri_valid & (tri_codes == calc.DEGENERATE), axis=1)
+
+        # веса точек для каждой операции, вычисляющей перемещение
+        inside_nodes = np.repeat(tri_nodes, tri_inside.sum(axis=1))
+        edge_nodes = np.repeat(tri_nodes, tri_line.sum(axis=1))
+        value_nodes = np.concatenate([match_nodes,
+                                      line_nodes[on_line],
+                                      inside_nodes,
+                                      edge_nodes])
+        rows = np.concatenate([match_nodes,
+                               np.repeat(line_nodes[on_line], 2),
+                               np.repeat(inside_nodes, 3),
+                               np.repeat(edge_nodes, 2)])
+        cols = np.concatenate([nearest[match],
+                               line_idx[on_line].ravel(),
+                               tri_idx[tri_inside].ravel(),
+                               edge_idx[tri_line].ravel()])
+        weights = np.concatenate([
+            np.ones(len(match_nodes)),
+            calc.interpolate_weights(nodes[line_nodes[on_line]],
+                                     points[line_idx[on_line]]).ravel(),
+            calc.intersect_weights(nodes[inside_nodes],
+                                   points[tri_idx[tri_inside]]).ravel(),
+            calc.interpolate_weights(nodes[edge_nodes],
+                                     points[edge_idx[tri_line]]).ravel()
+        ])
+
+        # среднее перемещение в узле
+        n_values = np.bincount(value_nodes, minlength=n_nodes)
+        weights = weights / n_values[rows]
+
+        # журнал операций: (узел, этап, номер набора) задают порядок
+        # операций узла; точки операции - индексы в points, -1 - пусто
+        point_nodes = np.flatnonzero(counts)
+        tri_j, tri_k = np.nonzero(tri_logged)
+        tri_line_ops = tri_codes[tri_j, tri_k] == calc.LINE
+        tri_points = tri_idx[tri_j, tri_k]
+        tri_points[tri_line_ops, :2] = edge_idx[tri_j, tri_k][tri_line_ops]
+        tri_points[tri_line_ops, 2] = -1
+        # коды calc.OUTSIDE, calc.LINE, calc.INSIDE -> коды журнала
+        tri_commands = np.array([JOURNAL_COMMANDS.index(calc.COMMANDS[code])
+                                 for code in sorted(calc.COMMANDS)])
+
+        op_node = np.concatenate([point_nodes, line_nodes, tri_nodes[tri_j]])
+        op_stage = np.concatenate([np.zeros(len(point_nodes), dtype=int),
+                                   np.ones(len(line_nodes) + len(tri_j),
+                                           dtype=int)])
+        op_set = np.concatenate([np.zeros(len(point_nodes) + len(line_nodes),
+                                          dtype=int), tri_k])
+        op_command = np.concatenate([
+            np.where(match[point_nodes], JOURNAL_COMMANDS.index('point'),
+                     JOURNAL_COMMANDS.index('no_point')),
+            np.where(on_line, JOURNAL_COMMANDS.index('line'),
+                     JOURNAL_COMMANDS.index('outside')),
+            tri_commands[tri_codes[tri_j, tri_k]]
+        ])
+        op_points = np.full((len(op_node), 3), -1)
+        op_points[:len(point_nodes), 0] = nearest[point_nodes]
+        op_points[len(point_nodes):len(point_nodes) + len(line_nodes),
+                  :2] = line_idx
+        op_points[len(point_nodes) + len(line_nodes):] = tri_points
+
+        order = np.lexsort((op_set, op_stage, op_node))
+        op_points = op_points[order]
+        op_offset = np.concatenate([[0], np.cumsum(np.sum(op_points >= 0,
+                                                          axis=1))])
+        # количество узлов ветвей расчета 'point', 'line', 'triangle'
+        branches = np.array([len(match_nodes), len(line_nodes),
+                             len(tri_nodes)])
+        journal = {'op_node': op_node[order],
+                   'op_command': op_command[order].astype(np.int8),
+                   'op_offset': op_offset,
+                   'op_points': op_points[op_points >= 0],
+                   'degenerate': degenerate,
+                   'branches': branches}
+        return rows, cols, weights, journal
+
+    def fallback_weights(self,
+                         weights: 'InterpolationWeights',
+                         points: np.ndarray,
+                         eps_fallback=1) -> 'InterpolationWeights':
+        """
+        Повторный расчет узлов, в которых перемещение не найдено: для этих
+        узлов окрестности поиска увеличиваются в FALLBACK_GROWTH раз (до
+        eps_fallback раз), пока перемещение не будет найдено. Кандидаты
+        отбираются по пространственному индексу точек (см.
+        nearby_idx_nodes), найденные узлы и веса остальных узлов не
+        меняются.
+
+        В журнале операций узла перед операциями повторного расчета
+        записывается операция 'fallback' без точек, множитель окрестностей
+        узлов - в массиве журнала fallback (0 - узел найден без повторного
+        расчета).
+
+        :param weights: веса interpolation_weights
+        :param points: массив точек [[x1, z1, u_y1], [x2, z2, u_y2] ...]
+        :param eps_fallback: наибольший множитель окрестностей поиска
+        :return: экземпляр InterpolationWeights
+        """
+        eps_x, eps_z, eps_match = weights.eps[:3]
+        fallback = np.zeros(len(self.coords))
+        degenerate = weights.journal['degenerate'].copy()
+        fields = ('op_node', 'op_command', 'op_offset', 'op_points')
+        journals = [{name: weights.journal[name] for name in fields}]
+        rows, cols, values = [weights.rows], [weights.cols], [weights.weights]
+
+        failed = np.flatnonzero(~weights.success)
+        index = PointsIndex(points, eps_x, eps_z) if len(failed) else None
+        factor = 1
+        while len(failed) and factor < eps_fallback:
+            factor = min(factor * FALLBACK_GROWTH, eps_fallback)
+            nearby_idx, nearby_dist = self.nearby_idx_nodes(
+                points, failed, eps_x * factor, eps_z * factor, index)
+            part_rows, part_cols, part_values, part = self._quadrant_weights(
+                self.coords[failed, :2], points, nearby_idx, nearby_dist,
+                eps_match)
+            resolved = np.bincount(part_rows, minlength=len(failed)) > 0
+
+            # в журнал попадают только операции найденных узлов
+            part_ops = take_operations(
+                part, np.flatnonzero(resolved[part['op_node']]))
+            part_ops['op_node'] = failed[part_ops['op_node']]
+            journals.append(part_ops)
+            rows.append(failed[part_rows])
+            cols.append(part_cols)
+            values.append(part_values)
+            degenerate[failed[resolved]] = part['degenerate'][resolved]
+            fallback[failed[resolved]] = factor
+            failed = failed[~resolved]
+
+        # операции 'fallback' без точек
+        fallback_nodes = np.flatnonzero(fallback)
+        journals.insert(1, {
+            'op_node': fallback_nodes,
+            'op_command': np.full(len(fallback_nodes),
+                                  JOURNAL_COMMANDS.index('fallback'),
+                                  dtype=np.int8),
+            'op_offset': np.zeros(len(fallback_nodes) + 1, dtype=int),
+            'op_points': np.empty(0, dtype=int)})
+
+        # объединяем операции: у каждого узла сначала операции основного
+        # расчета, затем 'fallback' и операции повторного расчета
+        stage = np.concatenate([np.full(len(journal['op_node']), i)
+                                for i, journal in enumerate(journals)])
+        lengths = np.concatenate([np.diff(journal['op_offset'])
+                                  for journal in journals])
+        arrays = {name: np.concatenate([journal[name]
+                                        for journal in journals])
+                  for name in ('op_node', 'op_command', 'op_points')}
+        arrays['op_offset'] = np.concatenate([[0], np.cumsum(lengths)])
+        order = np.lexsort((np.arange(len(stage)), stage, arrays['op_node']))
+        journal = take_operations(arrays, order)
+        journal['op_command'] = journal['op_command'].astype(np.int8)
+        journal.update({'degenerate': degenerate,
+                        'branches': weights.journal['branches'],
+                        'fallback': fallback})
+
+        return InterpolationWeights(weights.grid_x, weights.grid_z,
+                                    weights.xz,
+                                    weights.eps[:3] + (eps_fallback,),
+                                    np.concatenate(rows),
+                                    np.concatenate(cols),
+                                    np.concatenate(values), journal,
+                                    weights.engine)
+
+    def delaunay_weights(self,
+                         points: np.ndarray,
+                         eps_match=0) -> 'InterpolationWeights':
+        """
+        Геометрический этап расчета методом ENGINE_DELAUNAY: строится
+        триангуляция Делоне точек (точки с одинаковыми X, Z - одна вершина,
+        перемещение в ней - среднее их перемещений), для каждого узла сетки
+        находится содержащий его треугольник (см. delaunay).
+
+        Если узел совпадает с вершиной треугольника - берем ее перемещение.
+        Если узел лежит на стороне - перемещение вычисляем интерполяцией по
+        стороне, если внутри - методом пересечения прямой, проходящей через
+        узел перпендикулярно плоскости (XoZ), и плоскости треугольника.
+        Узлы вне триангуляции (вне выпуклой оболочки точек) - ошибки.
+
+        Результат, как и у interpolation_weights, - веса точек для каждого
+        узла и журнал операций по индексам точек (по одной операции на узел,
+        точка вершины - первая из точек с ее координатами).
+
+        :param points: массив точек [[x1, z1, u_y1], [x2, z2, u_y2] ...]
+        :param eps_match: окрестность в которой точки можно считать совпадающим
+        :return: экземпляр InterpolationWeights
+        """
+        nodes = self.nodes
+        n_nodes = len(nodes)
+
+        # вершины триангуляции и точки с их координатами
+        xz, vertex = np.unique(points[:, :2], axis=0, return_inverse=True)
+        vertex = vertex.ravel()
+        n_vertex_points = np.bincount(vertex, minlength=len(xz))
+        vertex_points = np.argsort(vertex, kind='stable')
+        first_point = np.concatenate([[0], np.cumsum(n_vertex_points)[:-1]])
+
+        triangles, _ = delaunay.triangulate(xz)
+        found = delaunay.locate(xz, triangles, nodes)
+        tri_nodes = np.flatnonzero(found >= 0)
+        tri_idx = triangles[found[tri_nodes]]
+        bary = calc.intersect_weights(nodes[tri_nodes], xz[tri_idx])
+
+        # взаимное положение узла и треугольника
+        dist = np.linalg.norm(xz[tri_idx] - nodes[tri_nodes, np.newaxis],
+                              axis=2)
+        match = np.min(dist, axis=1) <= eps_match
+        zero = np.argmin(np.abs(bary), axis=1)
+        on_edge = ~match & (np.abs(bary[np.arange(len(bary)), zero]) <=
+                            delaunay.TOLERANCE)
+        inside = ~match & ~on_edge
+
+        # вершины и веса операций узлов, -1 - пусто
+        op_vertices = np.full((len(tri_nodes), 3), -1)
+        op_weights = np.zeros((len(tri_nodes), 3))
+        op_vertices[match, 0] = tri_idx[match, np.argmin(dist[match],
+                                                         axis=1)]
+        op_weights[match, 0] = 1.
+        pair = np.take_along_axis(
+            tri_idx[on_edge],
+            (zero[on_edge, np.newaxis] + np.array([1, 2])) % 3, axis=1)
+        op_vertices[on_edge, :2] = pair
+        op_weights[on_edge, :2] = calc.interpolate_weights(
+            nodes[tri_nodes[on_edge]], xz[pair])
+        op_vertices[inside] = tri_idx[inside]
+        op_weights[inside] = bary[inside]
+
+        # веса вершин делятся поровну между точками с их координатами
+        valid = op_vertices >= 0
+        op_vertex = op_vertices[valid]
+        repeats = n_vertex_points[op_vertex]
+        # номер точки внутри точек вершины
+        within = (np.arange(repeats.sum()) -
+                  np.repeat(np.cumsum(repeats) - repeats, repeats))
+        rows = np.repeat(np.broadcast_to(tri_nodes[:, np.newaxis],
+                                         valid.shape)[valid], repeats)
+        cols = vertex_points[np.repeat(first_point[op_vertex], repeats) +
+                             within]
+        weights = np.repeat(op_weights[valid] / repeats, repeats)
+
+        commands = np.select([match, on_edge],
+                             [JOURNAL_COMMANDS.index('point'),
+                              JOURNAL_COMMANDS.index('line')],
+                             JOURNAL_COMMANDS.index('inside'))
+        journal = {'op_node': tri_nodes,
+                   'op_command': commands.astype(np.int8),
+                   'op_offset': np.concatenate([[0], np.cumsum(
+                       np.sum(valid, axis=1))]),
+                   'op_points': vertex_points[first_point[op_vertex]],
+                   'degenerate': np.zeros(n_nodes, dtype=bool),
+                   'branches': np.array([np.sum(match), np.sum(on_edge),
+                                         np.sum(inside)]),
+                   'fallback': np.zeros(n_nodes)}
+
+        return InterpolationWeights(self._grid_x, self._grid_z, points[:, :2],
+                                    (0, 0, eps_match, 1), rows, cols, weights,
+                                    journal, ENGINE_DELAUNAY)
+
+    def apply_weights(self,
+                      weights: 'InterpolationWeights',
+                      points: np.ndarray,
+                      log_level: str = LOG_FULL) -> NoReturn:
+        """
+        Значения этапа расчета перемещений: по весам и журналу операций
+        interpolation_weights вычисляет перемещения в узлах (одно
+        произведение разреженной матрицы на вектор перемещений точек).
+        Записывает в массивы узлов перемещения и состояния, журнал
+        операций (в зависимости от log_level), обновляет main_info и
+        branch_counts.
+        Журнал уровня LOG_FULL - массивы индексов точек из weights, общие
+        для всех листов с этими весами; точки не копируются.
+
+        :param weights: веса для точек с теми же координатами X, Z
+        :param points: массив точек [[x1, z1, u_y1], [x2, z2, u_y2] ...]
+        :param log_level: уровень журнала операций LOG_OFF, LOG_COUNTS,
+        LOG_FULL
+        :return: NoReturn
+        """
+        if log_level not in LOG_LEVELS:
+            raise ValueError(f'Unknown log level: {log_level}')
+
+        self.coords[:, 2] = weights.apply(points[:, 2])
+        self.status[:] = np.where(weights.success, NODE_SUCCESS, NODE_ERROR)
+        n_success = int(np.sum(weights.success))
+        self.main_info['Success'] += n_success
+        self.main_info['Errors'] += len(self.status) - n_success
+
+        # журнал операций узлов
+        journal = weights.journal
+        n_degenerate = int(np.sum(journal['degenerate']))
+        self.branch_counts = dict(zip(BRANCHES,
+                                      journal['branches'].tolist() +
+                                      [len(self.status) - n_success,
+                                       n_degenerate,
+                                       int(np.sum(journal['fallback'] > 0))]))
+        if log_level in (LOG_COUNTS, LOG_FULL):
+            counts = np.bincount(journal['op_command'],
+                                 minlength=len(JOURNAL_COMMANDS))
+            self.log_counts = dict(zip(JOURNAL_COMMANDS, counts.tolist()))
+        if log_level == LOG_FULL:
+            self.set_journal({name: journal[name] for name in
+                              ('op_node', 'op_command', 'op_offset',
+                               'op_points')}, points)
+
+        if n_degenerate:
+            print(f'Warning: {n_degenerate} nodes in degenerate triangles')
+
+    def calc_displacements(self,
+                           points: np.ndarray,
+                           eps_x=1,
+                           eps_z=1,
+                           eps_match=0,
+                           weights: Iterable['InterpolationWeights'] = (),
+                           log_level: str = LOG_FULL,
+                           timer: Callable = None,
+                           engine: str = ENGINE_QUADRANT,
+                           eps_fallback=1) -> NoReturn:
+        """
+        Вычисляет перемещения во всех узлах сетки по ближайшим точкам
+        (метод ENGINE_QUADRANT, см. interpolation_weights) или по
+        триангуляции Делоне точек (ENGINE_DELAUNAY, см. delaunay_weights),
+        затем - apply_weights.
+        Веса зависят только от координат точек, поэтому для листов с
+        одинаковой геометрией (другая компонента перемещений той же сетки
+        Plaxis) их можно передать в weights: используются первые подходящие
+        веса, геометрический этап не выполняется. Использованные веса
+        сохраняются в self.weights.
+
+        :param points: массив точек [[x1, z1, u_y1], [x2, z2, u_y2] ...]
+        :param eps_x: окрестность поиска по горизонтальной оси
+        :param eps_z: окрестность поиска по вертикальной оси
+        :param eps_match: окрестность в которой точки можно считать совпадающим
+        :param weights: ранее вычисленные веса (например, других листов)
+        :param log_level: уровень журнала операций LOG_OFF, LOG_COUNTS,
+        LOG_FULL
+        :param timer: таймер этапов interpolation_weights, apply_weights
+        (см. profiling.StageTimer), None - без замеров
+        :param engine: метод расчета весов (см. ENGINES)
+        :param eps_fallback: наибольший множитель окрестностей поиска для
+        повторного расчета узлов, в которых перемещение не найдено (только
+        ENGINE_QUADRANT, см. fallback_weights), 1 - без повторного расчета
+        :return: NoReturn
+        """
+        if engine not in ENGINES:
+            raise ValueError(f'Unknown engine: {engine}')
+        timer = profiling.StageTimer(False) if timer is None else timer
+        # окрестности поиска метод ENGINE_DELAUNAY не использует
+        eps = ((eps_x, eps_z, eps_match, eps_fallback)
+               if engine == ENGINE_QUADRANT else (0, 0, eps_match, 1))
+        self.weights = next((item for item in weights
+                             if item.fits(self, points, eps, engine)), None)
+        if self.weights is None:
+            with timer('interpolation_weights'):
+                if engine == ENGINE_QUADRANT:
+                    self.weights = self.interpolation_weights(
+                        points, eps_x, eps_z, eps_match, eps_fallback)
+                else:
+                    self.weights = self.delaunay_weights(points, eps_match)
+        with timer('apply_weights'):
+            self.apply_weights(self.weights, points, log_level)
+
+
+class PointsInterpolator(object):
+    """
+    Перемещения в произвольных точках плоскости XoZ (вдоль свай, по
+    профилям и т.п.) без прямоугольной сетки и листов excel. Расчет тот
+    же, что и для узлов RectangleGrid (см. interpolation_weights):
+    ближайшие точки в четвертях, совпадение с точкой // интерполяция по
+    линии из 2 точек // пересечение с плоскостью треугольников из 3-4
+    точек. Пространственный индекс точек строится один раз при создании.
+
+        data = utils.preprocessing_data('data/60x100x5.xlsx', COLUMNS_COORD)
+        interpolator = PointsInterpolator(data['x'], eps_x=1, eps_z=1)
+        u_y = interpolator(np.array([[0., -1.], [2.5, -3.]]))
+    """
+
+    def __init__(self,
+                 points: np.ndarray,
+                 eps_x=1,
+                 eps_z=1,
+                 eps_match=0,
+                 eps_fallback=1):
+        """
+        :param points: массив точек [[x1, z1, u_y1], [x2, z2, u_y2] ...]
+        (например, лист utils.preprocessing_data)
+        :param eps_x: окрестность поиска по горизонтальной оси
+        :param eps_z: окрестность поиска по вертикальной оси
+        :param eps_match: окрестность в которой точки можно считать совпадающим
+        :param eps_fallback: наибольший множитель окрестностей поиска для
+        повторного расчета точек запроса, в которых перемещение не найдено
+        (см. RectangleGrid.fallback_weights), 1 - без повторного расчета
+        """
+        self.points = np.asarray(points, dtype=float)
+        if self.points.ndim != 2 or self.points.shape[1] != 3:
+            raise ValueError(f'points must have shape (n, 3), got '
+                             f'{self.points.shape}')
+        self.eps_x = eps_x
+        self.eps_z = eps_z
+        self.eps_match = eps_match
+        self.eps_fallback = eps_fallback
+        self.index = PointsIndex(self.points, eps_x, eps_z)
+
+    def weights(self,
+                xz: np.ndarray
+                ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Веса точек для точек запроса - разреженная матрица (запросы x
+        точки) в формате COO, как в InterpolationWeights. Зависят только от
+        координат, поэтому подходят для любых значений в точках (например,
+        других компонент перемещений той же сетки).
+
+        :param xz: координаты точек запроса [[x1, z1], [x2, z2], ...]
+        :return: (rows, cols, weights) - номера точек запроса, индексы
+        точек и веса
+        """
+        xz = np.asarray(xz, dtype=float)
+        if xz.ndim != 2 or xz.shape[1] != 2:
+            raise ValueError(f'xz must have shape (n, 2), got {xz.shape}')
+
+        rows, cols, weights = [], [], []
+        pending = np.arange(len(xz))  # запросы без перемещения
+        factor = 1
+        while True:
+            eps_x, eps_z = self.eps_x * factor, self.eps_z * factor
+            pt_idx, query = self.index.pairs(xz[pending, 0], xz[pending, 1],
+                                             eps_x, eps_z)
+            nearby_idx, nearby_dist = RectangleGrid._nearest_quarters(
+                self.points, pt_idx, query, len(pending), xz[pending])
+            part_rows, part_cols, part_weights, _ = (
+                RectangleGrid._quadrant_weights(
+                    xz[pending], self.points, nearby_idx, nearby_dist,
+                    self.eps_match))
+            rows.append(pending[part_rows])
+            cols.append(part_cols)
+            weights.append(part_weights)
+
+            pending = pending[np.bincount(part_rows,
+                                          minlength=len(pending)) == 0]
+            if not len(pending) or factor >= self.eps_fallback:
+                break
+            factor = min(factor * FALLBACK_GROWTH, self.eps_fallback)
+        return (np.concatenate(rows), np.concatenate(cols),
+                np.concatenate(weights))
+
+    def __call__(self,
+                 xz: np.ndarray,
+                 values: np.ndarray = None) -> np.ndarray:
+        """
+        Значения в точках запроса.
+
+        :param xz: координаты точек запроса [[x1, z1], [x2, z2], ...]
+        :param values: значения в точках размером (n,), None - перемещения
+        u_y точек (points[:, 2])
+        :return: значения размером (len(xz),), np.nan - перемещение не
+        найдено
+        """
+        rows, cols, weights = self.weights(xz)
+        values = self.points[:, 2] if values is None else values
+        n_queries = len(xz)
+        result = np.bincount(rows, weights=weights * values[cols],
+                             minlength=n_queries).astype(float)
+        result[np.bincount(rows, minlength=n_queries) == 0] = np.nan
+        return result
+
+
+def take_operations(journal: Dict[str, np.ndarray],
+                    order: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Переставляет операции журнала в виде массивов (op_node, op_command,
+    op_offset, op_points) в порядке order вместе с индексами их точек.
+
+    :param journal: массивы журнала операций
+    :param order: новый порядок операций
+    :return: массивы журнала операций в новом порядке
+    """
+    offset = journal['op_offset']
+    lengths = np.diff(offset)[order]
+    starts = offset[:-1][order]
+    new_offset = np.concatenate([[0], np.cumsum(lengths)])
+
+    # индексы точек операций в старом массиве op_points
+    idx = (np.repeat(starts - new_offset[:-1], lengths) +
+           np.arange(new_offset[-1]))
+    return {'op_node': journal['op_node'][order],
+            'op_command': journal['op_command'][order],
+            'op_offset': new_offset,
+            'op_points': journal['op_points'][idx]}
+
+
+def journal_from_arrays(arrays: Dict[str, np.ndarray]
+                        ) -> Tuple[dict, List[GridPoint]]:
+    """
+    Восстанавливает main_info и узлы GridPoint с журналами операций из
+    плоских массивов RectangleGrid.journal_arrays (например, загруженных из
+    файла npz) - для записи листа журнала операций SheetInfo по требованию.
+
+    :param arrays: словарь {название_массива: массив}
+    :return: (main_info, список узлов GridPoint)
+    """
+    main_info = {str(field): int(value) for field, value in
+                 zip(arrays['info_fields'], arrays['info_values'])}
+
+    points = []
+    for (x, z, u_y), success in zip(arrays['nodes'], arrays['success']):
+        points.append(GridPoint([x, z, u_y if success else None]))
+
+    offset = arrays['op_offset']
+    for i, (node, command) in enumerate(zip(arrays['op_node'],
+                                            arrays['op_command'])):
+        pts = arrays['points'][offset[i]:offset[i + 1]]
+        points[node].logs.append([JOURNAL_COMMANDS[command], pts])
+    return main_info, points
 
 
 class SheetInfo:
@@ -370,9 +1735,45 @@ class SheetInfo:
         self.row = 1  # используем как указатель для строки
         self.col = 1
         self.styles = utils.SheetInfoStyles()  # стили оформления
+        self.__columns()
         self.__main_info(main_info)
         self.__header()
 
+    def _cell(self,
+              row: int,
+              column: int,
+              value,
+              style,
+              number_format: str = None,
+              font=None) -> NoReturn:
+        """
+        Записывает значение в ячейку листа и оформляет ее.
+
+        :param row: номер строки
+        :param column: номер столбца
+        :param value: записываемое значение
+        :param style: стиль оформления ячейки openpyxl.styles.NamedStyle
+        :param number_format: формат числа (None - формат стиля)
+        :param font: шрифт (None - шрифт стиля)
+        :return: NoReturn
+        """
+        cell = self.sheet.cell(row=row, column=column, value=value)
+        cell.style = style
+        if font is not None:
+            cell.font = font
+        if number_format is not None:
+            cell.number_format = number_format
+
+    def __columns(self) -> NoReturn:
+        """
+        Устанавливает ширину столбцов таблицы операций.
+        :return: NoReturn
+        """
+        from openpyxl.utils import get_column_letter
+        for col in self.TITLE_HEADER.values():
+            col_letter = get_column_letter(col)  # получаем букву столбца
+            self.sheet.column_dimensions[col_letter].width = 13
+
     def __main_info(self, main_info: dict) -> NoReturn:
         """
         Создает строки с основной информацией по узлам сетки.
@@ -387,14 +1788,10 @@ class SheetInfo:
             self.sheet.row_dimensions[row].height = 20
 
             # Записываем название поля и оформляем ячейку
-            cell = self.sheet.cell(row=row, column=field_col, value=field)
-            cell.style = self.styles.main_cell
-            cell.number_format = '@'
+            self._cell(row, field_col, field, self.styles.main_cell, '@')
 
             # Записываем значение поля и оформляем ячейку
-            cell = self.sheet.cell(row=row, column=value_col, value=value)
-            cell.style = self.styles.main_cell
-            cell.number_format = '0'
+            self._cell(row, value_col, value, self.styles.main_cell, '0')
 
             self.row += 1  # перемещаем на следующую строку
         self.row += 2  # пустые строки до таблицы
@@ -410,13 +1807,7 @@ class SheetInfo:
 
         # заполняем шапку таблицы
         for field, col in self.TITLE_HEADER.items():
-            cell = self.sheet.cell(row=self.row, column=col, value=field)
-            cell.style = self.styles.header
-            cell.number_format = '@'
-
-            # устанавливаем ширину столбца
-            col_letter = cell.column_letter  # получаем букву столбца
-            self.sheet.column_dimensions[col_letter].width = 13
+            self._cell(self.row, col, field, self.styles.header, '@')
         self.row += 1  # перемещаем указатель на новую строку
 
     def write_journal(self, point: GridPoint) -> NoReturn:
@@ -443,16 +1834,14 @@ class SheetInfo:
 
         # записываем координаты узла
         for col, value in enumerate(point.coords, column):
-            cell = self.sheet.cell(row=self.row, column=col, value=value)
-            cell.style = style
-            cell.font = self.styles.grid_pt_font
-
             # это условие требуется тк. для координаты u_y требуется повышенное
             # отображение десятичных знаков
             if col == 3:
-                cell.number_format = '0.000000'
+                number_format = '0.000000'
             else:
-                cell.number_format = '0.00'
+                number_format = '0.00'
+            self._cell(self.row, col, value, style, number_format,
+                       font=self.styles.grid_pt_font)
             column += 1
 
         # записываем произведенные операции над ближайшими точками узла
@@ -461,20 +1850,74 @@ class SheetInfo:
             command, points = logs
 
             # записываем команду
-            cell = self.sheet.cell(row=self.row, column=column, value=command)
-            cell.style = style
+            self._cell(self.row, column, command, style)
 
             # в цикле записываем все точки над которыми производилась операция
             for point in points:
                 # покоординатно записываем все координаты точки в свой столбец
                 for col, value in enumerate(point, column + 1):
-
-                    cell = self.sheet.cell(row=self.row,
-                                           column=col,
-                                           value=value)
-                    cell.style = style
-                    cell.number_format = '0.000000'
+                    self._cell(self.row, col, value, style, '0.000000')
                 self.row += 1  # перемещаем указатель на новую строку
             # перемещаем указатель на новую строку
             # (для визуального разделения операций и узлов)
             self.row += 1
+
+
+class SheetInfoStream(SheetInfo):
+    """
+    Класс журнала операций SheetInfo для листа excel файла, открытого в
+    режиме write_only (Workbook(write_only=True)). В этом режиме строки
+    записываются в лист только по порядку, поэтому ячейки текущей строки
+    копятся в буфере и строка записывается целиком, когда указатель
+    переходит на следующие строки. После записи всех узлов требуется вызвать
+    close().
+    """
+
+    def __init__(self, sheet, main_info: dict) -> None:
+        """
+        :param sheet: лист в excel файле в режиме write_only
+        :param main_info: {'Points': 12345,'Success': 12340, 'Errors': 5}
+        """
+        from openpyxl.cell import WriteOnlyCell
+        self._cell_type = WriteOnlyCell  # openpyxl загружается только здесь
+        self._buffer_row = 1  # номер строки в буфере
+        self._buffer = {}  # ячейки строки в буфере {номер_столбца: ячейка}
+        super().__init__(sheet, main_info)
+
+    def _cell(self,
+              row: int,
+              column: int,
+              value,
+              style,
+              number_format: str = None,
+              font=None) -> NoReturn:
+        self._flush(row)
+
+        cell = self._cell_type(self.sheet, value=value)
+        cell.style = style
+        if font is not None:
+            cell.font = font
+        if number_format is not None:
+            cell.number_format = number_format
+        self._buffer[column] = cell
+
+    def _flush(self, row: int) -> NoReturn:
+        """
+        Записывает в лист строки до строки row (не включая).
+        :param row: номер строки
+        :return: NoReturn
+        """
+        while self._buffer_row < row:
+            last_col = max(self._buffer, default=0)
+            self.sheet.append([self._buffer.get(col)
+                               for col in range(1, last_col + 1)])
+            self._buffer = {}
+            self._buffer_row += 1
+
+    def close(self) -> NoReturn:
+        """
+        Записывает в лист последнюю строку из буфера.
+        :return: NoReturn
+        """
+        if self._buffer:
+            self._flush(self._buffer_row + 1)
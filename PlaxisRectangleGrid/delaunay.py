@@ -0,0 +1,375 @@
+#!/usr/bin/env python
+from typing import List, Tuple
+
+import numpy as np
+
+"""
+Триангуляция Делоне точек на плоскости XoZ (инкрементальный алгоритм
+Боуэра-Ватсона) и поиск треугольников, содержащих узлы прямоугольной сетки
+(пакетно, по ячейкам равномерной сетки). Используется методом расчета
+'delaunay' (см. classes.RectangleGrid.delaunay_weights).
+
+Триангуляция строится на чистом Python по одной точке и на больших листах
+(10^4 - 10^5 точек) занимает секунды - метод 'delaunay' покрывает всю
+выпуклую оболочку точек, но медленнее метода 'quadrant'.
+
+Треугольники хранятся массивами: triangles - номера вершин (против часовой
+стрелки), neighbors - номер соседнего треугольника через сторону напротив
+вершины с тем же номером, -1 - сторона на границе триангуляции.
+"""
+
+# допуск ориентации и проверки окружности в нормированных координатах
+# (точки приводятся к квадрату [0, 1] x [0, 1])
+TOLERANCE = 1e-12
+
+# размер вспомогательного треугольника, содержащего все точки, в единицах
+# размера квадрата точек
+SUPER_SIZE = 100.
+
+LOCATE_CHUNK = 65536  # количество узлов, проверяемых за раз (см. locate)
+
+
+def _orient(ax: float, az: float, bx: float, bz: float,
+            cx: float, cz: float) -> float:
+    """
+    Удвоенная ориентированная площадь треугольника abc: > 0 - вершины
+    против часовой стрелки, 0 - на одной прямой.
+    """
+    return (bx - ax) * (cz - az) - (bz - az) * (cx - ax)
+
+
+def _in_circle(ax: float, az: float, bx: float, bz: float,
+               cx: float, cz: float, px: float, pz: float) -> float:
+    """
+    Положение точки p относительно описанной окружности треугольника abc
+    (против часовой стрелки): > 0 - внутри, 0 - на окружности.
+    """
+    adx, adz = ax - px, az - pz
+    bdx, bdz = bx - px, bz - pz
+    cdx, cdz = cx - px, cz - pz
+    return ((adx * adx + adz * adz) * (bdx * cdz - cdx * bdz) -
+            (bdx * bdx + bdz * bdz) * (adx * cdz - cdx * adz) +
+            (cdx * cdx + cdz * cdz) * (adx * bdz - bdx * adz))
+
+
+def _insertion_order(xy: np.ndarray) -> np.ndarray:
+    """
+    Порядок вставки точек: по полосам по X, внутри полосы змейкой по Z -
+    соседние вставляемые точки близки, поиск треугольника короткий.
+    """
+    n_bins = max(int(np.sqrt(len(xy) / 4)), 1)
+    bins = np.minimum((xy[:, 0] * n_bins).astype(int), n_bins - 1)
+    z = np.where(bins % 2, -xy[:, 1], xy[:, 1])
+    return np.lexsort((z, bins))
+
+
+def _walk(vertices: List[list],
+          neighbors: List[list],
+          xs: List[float],
+          zs: List[float],
+          start: int,
+          px: float,
+          pz: float) -> int:
+    """
+    Поиск треугольника, содержащего точку p, обходом от треугольника start
+    через стороны, за которыми лежит точка. Если обход зациклился (на
+    вырожденных треугольниках), треугольник ищется перебором.
+
+    :return: номер треугольника, -1 - точка вне триангуляции
+    """
+    t = start
+    for _ in range(len(vertices) + 3):
+        a, b, c = vertices[t]
+        if _orient(xs[b], zs[b], xs[c], zs[c], px, pz) < -TOLERANCE:
+            t = neighbors[t][0]
+        elif _orient(xs[c], zs[c], xs[a], zs[a], px, pz) < -TOLERANCE:
+            t = neighbors[t][1]
+        elif _orient(xs[a], zs[a], xs[b], zs[b], px, pz) < -TOLERANCE:
+            t = neighbors[t][2]
+        else:
+            return t
+        if t < 0:
+            return -1
+    return -1
+
+
+def _fill_hull(xy: np.ndarray,
+               triangles: np.ndarray,
+               neighbors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Достраивает триангуляцию до выпуклой оболочки точек. Вспомогательный
+    треугольник конечного размера может быть ближе к точкам, чем
+    окружности тонких треугольников у границы, - такие треугольники
+    соединяются с его вершинами и удаляются вместе с ними, а узлы у границы
+    внутри оболочки остаются без треугольника. Граница обходится против
+    часовой стрелки, в каждой вогнутой вершине b (стороны a-b, b-c)
+    добавляется треугольник (a, c, b), пока граница не станет выпуклой.
+
+    :param xy: нормированные координаты точек
+    :param triangles: вершины треугольников (см. triangulate)
+    :param neighbors: соседние треугольники (см. triangulate)
+    :return: (triangles, neighbors) с добавленными треугольниками
+    """
+    vertices, links = triangles.tolist(), neighbors.tolist()
+    xs, zs = xy[:, 0].tolist(), xy[:, 1].tolist()
+
+    # стороны границы: {начало: (конец, треугольник, номер стороны)} и
+    # {конец: начало}
+    boundary, previous = {}, {}
+    for t, (vertex, link) in enumerate(zip(vertices, links)):
+        for i in range(3):
+            if link[i] < 0:
+                a, b = vertex[(i + 1) % 3], vertex[(i + 2) % 3]
+                boundary[a] = (b, t, i)
+                previous[b] = a
+
+    stack = list(boundary)
+    while stack:
+        a = stack.pop()
+        if a not in boundary:
+            continue
+        b, t_ab, i_ab = boundary[a]
+        if b not in boundary:
+            continue
+        c, t_bc, i_bc = boundary[b]
+        if c == a or _orient(xs[a], zs[a], xs[b], zs[b],
+                             xs[c], zs[c]) >= -TOLERANCE:
+            continue
+        # треугольник не должен накрывать другие точки (вершины границы)
+        orient = [_orient(xs[u], zs[u], xs[v], zs[v], xy[:, 0], xy[:, 1])
+                  for u, v in ((a, c), (c, b), (b, a))]
+        if np.any(np.all(np.array(orient) > TOLERANCE, axis=0)):
+            continue
+
+        new = len(vertices)
+        vertices.append([a, c, b])
+        links.append([t_bc, t_ab, -1])
+        links[t_ab][i_ab] = new
+        links[t_bc][i_bc] = new
+        del boundary[b], previous[b]
+        boundary[a] = (c, new, 2)
+        previous[c] = a
+        # вершины a и предыдущая перед ней могли стать вогнутыми
+        stack.append(a)
+        if a in previous:
+            stack.append(previous[a])
+
+    return (np.array(vertices, dtype=int).reshape(-1, 3),
+            np.array(links, dtype=int).reshape(-1, 3))
+
+
+def triangulate(xz: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Триангуляция Делоне точек без повторов. Точки вставляются по одной:
+    треугольники, в описанную окружность которых попадает точка, удаляются,
+    образовавшаяся полость соединяется с точкой. Все точки изначально
+    лежат во вспомогательном треугольнике, его треугольники удаляются в
+    конце, триангуляция достраивается до выпуклой оболочки (см.
+    _fill_hull).
+
+    :param xz: координаты точек без повторов [[x1, z1], [x2, z2], ...]
+    :return: (triangles, neighbors) - массивы размером (M, 3), см. описание
+    модуля
+    """
+    xz = np.asarray(xz, dtype=float)
+    n = len(xz)
+    if n < 3:
+        return np.empty((0, 3), dtype=int), np.empty((0, 3), dtype=int)
+
+    # нормируем координаты к квадрату [0, 1] x [0, 1]
+    low = xz.min(axis=0)
+    scale = max(float(np.max(xz.max(axis=0) - low)), np.finfo(float).tiny)
+    xy = (xz - low) / scale
+
+    # вспомогательный треугольник - вершины n, n + 1, n + 2
+    size = SUPER_SIZE
+    xs = xy[:, 0].tolist() + [0.5 - 3 * size, 0.5 + 3 * size, 0.5]
+    zs = xy[:, 1].tolist() + [-size, -size, 3 * size]
+    vertices = [[n, n + 1, n + 2]]
+    neighbors = [[-1, -1, -1]]
+    alive = [True]
+
+    last = 0
+    for p in _insertion_order(xy).tolist():
+        px, pz = xs[p], zs[p]
+        t = _walk(vertices, neighbors, xs, zs, last, px, pz)
+        if t < 0:
+            continue  # не бывает для точек внутри вспомогательного
+
+        # полость: треугольники, в описанную окружность которых попадает
+        # точка; если точка лежит на стороне - и соседний через нее
+        cavity = {t}
+        stack = [t]
+        a, b, c = vertices[t]
+        for i, (u, v) in enumerate(((b, c), (c, a), (a, b))):
+            if (abs(_orient(xs[u], zs[u], xs[v], zs[v], px, pz)) <=
+                    TOLERANCE and neighbors[t][i] >= 0):
+                cavity.add(neighbors[t][i])
+                stack.append(neighbors[t][i])
+        forced = set(cavity)
+        while stack:
+            u = stack.pop()
+            for w in neighbors[u]:
+                if w < 0 or w in cavity:
+                    continue
+                a, b, c = vertices[w]
+                if _in_circle(xs[a], zs[a], xs[b], zs[b], xs[c], zs[c],
+                              px, pz) > 0:
+                    cavity.add(w)
+                    stack.append(w)
+
+        # точка должна видеть все стороны границы полости; треугольники,
+        # нарушающие это (погрешность проверки окружности), исключаются
+        while True:
+            boundary = [(u, i) for u in cavity for i in range(3)
+                        if neighbors[u][i] not in cavity]
+            invalid = {u for u, i in boundary if u not in forced and _orient(
+                xs[vertices[u][(i + 1) % 3]], zs[vertices[u][(i + 1) % 3]],
+                xs[vertices[u][(i + 2) % 3]], zs[vertices[u][(i + 2) % 3]],
+                px, pz) <= TOLERANCE}
+            if not invalid:
+                break
+            cavity -= invalid
+
+        if any(_orient(xs[vertices[u][(i + 1) % 3]],
+                       zs[vertices[u][(i + 1) % 3]],
+                       xs[vertices[u][(i + 2) % 3]],
+                       zs[vertices[u][(i + 2) % 3]],
+                       px, pz) <= TOLERANCE for u, i in boundary):
+            continue  # точка совпадает с вершиной - пропускаем
+
+        # соединяем стороны границы полости с точкой
+        start, end = {}, {}
+        for u, i in boundary:
+            a = vertices[u][(i + 1) % 3]
+            b = vertices[u][(i + 2) % 3]
+            outer = neighbors[u][i]
+            new = len(vertices)
+            vertices.append([a, b, p])
+            neighbors.append([-1, -1, outer])
+            alive.append(True)
+            if outer >= 0:
+                neighbors[outer][neighbors[outer].index(u)] = new
+            start[a] = new
+            end[b] = new
+        for new in start.values():
+            a, b, _ = vertices[new]
+            neighbors[new][0] = start[b]
+            neighbors[new][1] = end[a]
+        for u in cavity:
+            alive[u] = False
+        last = new
+
+    # удаляем треугольники вспомогательного треугольника
+    vertices = np.array(vertices, dtype=int)
+    neighbors = np.array(neighbors, dtype=int)
+    keep = np.array(alive) & np.all(vertices < n, axis=1)
+    index = np.full(len(vertices) + 1, -1)  # index[-1] = -1 для -1
+    index[np.flatnonzero(keep)] = np.arange(np.sum(keep))
+    return _fill_hull(xy, vertices[keep], index[neighbors[keep]])
+
+
+def _edge_lines(corners: np.ndarray) -> np.ndarray:
+    """
+    Коэффициенты сторон треугольников: ориентация точки p относительно
+    стороны j (см. _orient) равна lines[:, j, 0] * px + lines[:, j, 1] * pz
+    + lines[:, j, 2].
+
+    :param corners: вершины треугольников размером (M, 3, 2)
+    :return: массив размером (M, 3, 3)
+    """
+    a = corners
+    b = np.roll(corners, -1, axis=1)
+    dx, dz = b[..., 0] - a[..., 0], b[..., 1] - a[..., 1]
+    return np.stack([-dz, dx, dz * a[..., 0] - dx * a[..., 1]], axis=2)
+
+
+def _first_inside(lines: np.ndarray,
+                  tri: np.ndarray,
+                  nodes: np.ndarray,
+                  node: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Пакетная проверка пар (треугольник, узел): узел внутри или на стороне
+    треугольника, если он не справа ни от одной стороны. Для каждого узла
+    остается треугольник с меньшим номером.
+
+    :param lines: коэффициенты сторон треугольников (см. _edge_lines)
+    :param tri: номера треугольников пар
+    :param nodes: координаты узлов
+    :param node: номера узлов пар
+    :return: (номера узлов, номера треугольников)
+    """
+    coef = lines[tri]  # (K, 3, 3)
+    orient = (coef[..., 0] * nodes[node, 0, np.newaxis] +
+              coef[..., 1] * nodes[node, 1, np.newaxis] + coef[..., 2])
+    inside = np.all(orient >= -TOLERANCE, axis=1)
+    tri, node = tri[inside], node[inside]
+    order = np.lexsort((tri, node))
+    node, tri = node[order], tri[order]
+    first = np.r_[True, node[1:] != node[:-1]][:len(node)]
+    return node[first], tri[first]
+
+
+def locate(xz: np.ndarray,
+           triangles: np.ndarray,
+           nodes: np.ndarray) -> np.ndarray:
+    """
+    Находит для каждого узла треугольник, внутри или на стороне которого
+    он лежит (из нескольких - с меньшим номером). Плоскость делится на
+    ячейки размером с медианный треугольник, каждый треугольник
+    записывается во все ячейки, которые пересекает прямоугольник его
+    границ; узел проверяется только с треугольниками своей ячейки, пакетно,
+    блоками по LOCATE_CHUNK узлов.
+
+    :param xz: координаты точек триангуляции [[x1, z1], [x2, z2], ...]
+    :param triangles: вершины треугольников (см. triangulate)
+    :param nodes: координаты узлов [[x1, z1], ...], допускаются лишние
+    столбцы
+    :return: номера треугольников размером (N,), -1 - узел вне
+    триангуляции
+    """
+    xz = np.asarray(xz, dtype=float)
+    nodes = np.asarray(nodes, dtype=float)[:, :2]
+    result = np.full(len(nodes), -1)
+    if not len(triangles) or not len(nodes):
+        return result
+
+    low = xz.min(axis=0)
+    scale = max(float(np.max(xz.max(axis=0) - low)), np.finfo(float).tiny)
+    corners = (xz[triangles] - low) / scale  # (M, 3, 2)
+    nodes = (nodes - low) / scale
+    lines = _edge_lines(corners)
+
+    # ячейки прямоугольников границ треугольников
+    size = np.maximum(np.median(np.ptp(corners, axis=1), axis=0), TOLERANCE)
+    cell_lo = np.floor(corners.min(axis=1) / size).astype(np.int64)
+    cell_hi = np.floor(corners.max(axis=1) / size).astype(np.int64)
+    n_x = int(cell_hi[:, 0].max()) + 1
+    span = cell_hi - cell_lo + 1
+    count = span[:, 0] * span[:, 1]
+
+    # пары (ячейка, треугольник), отсортированные по ячейке
+    tri = np.repeat(np.arange(len(corners)), count)
+    within = np.arange(len(tri)) - np.repeat(np.cumsum(count) - count, count)
+    cells = ((cell_lo[tri, 1] + within // span[tri, 0]) * n_x +
+             cell_lo[tri, 0] + within % span[tri, 0])
+    order = np.argsort(cells, kind='stable')
+    cells, tri = cells[order], tri[order]
+
+    for begin in range(0, len(nodes), LOCATE_CHUNK):
+        chunk = np.arange(begin, min(begin + LOCATE_CHUNK, len(nodes)))
+        node_cell = np.floor(nodes[chunk] / size).astype(np.int64)
+        key = node_cell[:, 1] * n_x + node_cell[:, 0]
+        valid = np.all(node_cell >= 0, axis=1) & (node_cell[:, 0] < n_x)
+        starts = np.searchsorted(cells, key, side='left')
+        ends = np.where(valid, np.searchsorted(cells, key, side='right'),
+                        starts)
+
+        # разворачиваем диапазоны треугольников ячеек в пары
+        lengths = ends - starts
+        pos = (np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) +
+               np.arange(lengths.sum()))
+        node, found = _first_inside(lines, tri[pos], nodes,
+                                    np.repeat(chunk, lengths))
+        result[node] = found
+    return result
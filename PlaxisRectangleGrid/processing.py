@@ -0,0 +1,902 @@
+#!/usr/bin/env python
+from typing import (TYPE_CHECKING, Dict, Iterable, List, NoReturn, Sequence,
+                    Tuple, Union)
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+from multiprocessing import shared_memory
+import csv
+import sys
+import traceback
+
+import numpy as np
+
+from PlaxisRectangleGrid import classes, profiling, settings, utils
+
+if TYPE_CHECKING:
+    from openpyxl import Workbook
+
+"""
+Модуль содержит функции расчета листов входных файлов и записи результатов
+в excel файлы, в том числе параллельного расчета в пуле процессов.
+openpyxl импортируется только функциями записи excel файлов.
+"""
+
+
+# массив точек листа в разделяемой памяти (в процессах пула блоков)
+_SHARED = {}
+
+
+def _attach_points(name: str, shape: tuple, dtype: str) -> NoReturn:
+    """
+    Инициализатор процесса пула блоков: подключает массив точек листа из
+    разделяемой памяти без копирования.
+    """
+    shm = shared_memory.SharedMemory(name=name)
+    _SHARED['shm'] = shm
+    _SHARED['points'] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def calc_tile(tile: classes.RectangleGrid,
+              bounds: Tuple[float, float, float, float],
+              eps_x: float,
+              eps_z: float,
+              log_level: str = classes.LOG_FULL,
+              eps_fallback: float = 1) -> classes.RectangleGrid:
+    """
+    Расчет блока сетки в процессе пула. Из массива точек в разделяемой
+    памяти отбираются точки, попадающие в границы блока, расширенные на
+    окрестность поиска (с учетом повторного расчета eps_fallback), - этого
+    достаточно для поиска ближайших точек всех узлов блока.
+
+    :param tile: блок сетки (см. RectangleGrid.split)
+    :param bounds: расширенные границы блока (left, right, lower, upper)
+    :param eps_x: окрестность поиска по горизонтальной оси
+    :param eps_z: окрестность поиска по вертикальной оси
+    :param log_level: уровень журнала операций
+    :param eps_fallback: наибольший множитель окрестностей поиска для
+    повторного расчета узлов (см. RectangleGrid.fallback_weights)
+    :return: блок с вычисленными перемещениями
+    """
+    left, right, lower, upper = bounds
+    points = _SHARED['points']
+    mask = ((points[:, 0] <= right) & (points[:, 0] >= left) &
+            (points[:, 1] <= upper) & (points[:, 1] >= lower))
+
+    tile.calc_displacements(points[mask], eps_x=eps_x, eps_z=eps_z,
+                            log_level=log_level, eps_fallback=eps_fallback)
+    tile.weights = None  # веса блока не нужны в основном процессе
+    return tile
+
+
+def calc_tiles(grid: classes.RectangleGrid,
+               points: np.ndarray,
+               eps_x: float,
+               eps_z: float,
+               tiles: Tuple[int, int],
+               workers: int,
+               log_level: str = classes.LOG_FULL,
+               eps_fallback: float = 1) -> NoReturn:
+    """
+    Параллельный расчет одного листа: сетка разбивается на блоки, блоки
+    рассчитываются в пуле процессов, результаты переносятся в узлы сетки.
+    Массив точек передается процессам через разделяемую память, а не
+    копируется в каждую задачу.
+
+    :param grid: сетка листа
+    :param points: массив точек вида [[X, Z, u_Y], ... ...]
+    :param eps_x: окрестность поиска по горизонтальной оси
+    :param eps_z: окрестность поиска по вертикальной оси
+    :param tiles: количество блоков (по строкам, по столбцам)
+    :param workers: количество процессов
+    :param log_level: уровень журнала операций
+    :param eps_fallback: наибольший множитель окрестностей поиска для
+    повторного расчета узлов
+    :return: NoReturn
+    """
+    points = np.ascontiguousarray(points, dtype=float)
+    shm = shared_memory.SharedMemory(create=True, size=max(points.nbytes, 1))
+    try:
+        np.ndarray(points.shape, dtype=points.dtype,
+                   buffer=shm.buf)[:] = points
+
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=_attach_points,
+                                 initargs=(shm.name, points.shape,
+                                           points.dtype.str)) as executor:
+            jobs = []
+            # точки блока нужны и для наибольшей окрестности поиска
+            margin_x = eps_x * max(eps_fallback, 1)
+            margin_z = eps_z * max(eps_fallback, 1)
+            for tile in grid.split(*tiles):
+                bounds = (tile.grid_x.min() - margin_x,
+                          tile.grid_x.max() + margin_x,
+                          tile.grid_z.min() - margin_z,
+                          tile.grid_z.max() + margin_z)
+                jobs.append(executor.submit(calc_tile, tile, bounds,
+                                            eps_x, eps_z, log_level,
+                                            eps_fallback))
+
+            for job in jobs:
+                grid.merge(job.result())
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def create_grid(points: np.ndarray,
+                step_z: Dict[int, Union[int, float]]
+                ) -> classes.RectangleGrid:
+    """
+    Создает прямоугольную сетку по границам массива точек листа.
+
+    :param points: массив точек вида [[X, Z, u_Y], ... ...]
+    :param step_z: шаг сетки в зависимости от глубины Z
+    :return: экземпляр RectangleGrid
+    """
+    # Определяем границы для построения прямоугольной сетки
+    length = np.abs(points[:, 0].max()) + np.abs(points[:, 0].min())
+    depth = points[:, 1].min()  # тут верхняя всегда равна 0
+
+    # генерируем узлы прямоугольной сетки
+    return classes.RectangleGrid(length, depth, step_z)
+
+
+def calc_sheet(points: np.ndarray,
+               step_z: Dict[int, Union[int, float]],
+               tiles: Tuple[int, int] = None,
+               workers: int = 1,
+               eps_x: float = None,
+               eps_z: float = None,
+               weights: Iterable[classes.InterpolationWeights] = (),
+               cache_dir: str = None,
+               cache_size: int = None,
+               log_level: str = classes.LOG_FULL,
+               profile: bool = False,
+               engine: str = classes.ENGINE_QUADRANT,
+               eps_fallback: float = 1
+               ) -> classes.RectangleGrid:
+    """
+    Создает прямоугольную сетку по границам массива точек листа и вычисляет
+    перемещения в ее узлах.
+
+    :param points: массив точек вида [[X, Z, u_Y], ... ...]
+    :param step_z: шаг сетки в зависимости от глубины Z
+    :param tiles: количество блоков (по строкам, по столбцам) для
+    параллельного расчета листа, None - лист рассчитывается целиком (для
+    метода ENGINE_DELAUNAY - всегда: триангуляция строится по всем точкам)
+    :param workers: количество процессов для расчета блоков
+    :param eps_x: окрестность поиска по горизонтальной оси, None - шаг
+    сетки по X
+    :param eps_z: окрестность поиска по вертикальной оси, None - шаг
+    сетки по Z
+    :param weights: веса интерполяции других листов той же геометрии (см.
+    RectangleGrid.calc_displacements), не используются при расчете блоками
+    :param cache_dir: путь до папки кэша, веса интерполяции сохраняются в
+    ней и загружаются при совпадении геометрии (кроме расчета блоками),
+    None - без кэша
+    :param cache_size: наибольший размер кэша весов в байтах, None - без
+    ограничения
+    :param log_level: уровень журнала операций (см. classes.LOG_LEVELS)
+    :param profile: замерять время этапов расчета (в grid.timings)
+    :param engine: метод расчета весов интерполяции (см. classes.ENGINES)
+    :param eps_fallback: наибольший множитель окрестностей поиска для
+    повторного расчета узлов, в которых перемещение не найдено (см.
+    RectangleGrid.fallback_weights), 1 - без повторного расчета
+    :return: экземпляр RectangleGrid с вычисленными перемещениями
+    """
+    timer = profiling.StageTimer(profile)
+    with timer('create_grid'):
+        grid = create_grid(points, step_z)
+    eps_x = grid.step_x if eps_x is None else eps_x
+    eps_z = -grid.step_z if eps_z is None else eps_z
+
+    # вычисляем перемещения во всех узлах сетки по ближайщим
+    # существующим точкам
+    if (tiles is not None and workers > 1 and
+            engine == classes.ENGINE_QUADRANT):
+        with timer('calc_tiles'):
+            calc_tiles(grid, points, eps_x, eps_z, tiles, workers,
+                       log_level, eps_fallback)
+    else:
+        weights = list(weights)
+        # eps_match = 0, как в calc_displacements по умолчанию
+        eps = ((eps_x, eps_z, 0, eps_fallback)
+               if engine == classes.ENGINE_QUADRANT else (0, 0, 0, 1))
+        # кэш весов на диске читается, только если подходящих весов в
+        # памяти нет; вычисленные веса сохраняются по ключу save_key
+        save_key = None
+        if cache_dir is not None and not any(
+                item.fits(grid, points, eps, engine) for item in weights):
+            key = utils.weights_key(points, grid.length, grid.depth,
+                                    grid.step_x, grid.step_z, eps, engine)
+            arrays = utils.load_weights(cache_dir, key)
+            if arrays is not None:
+                weights.append(
+                    classes.InterpolationWeights.from_arrays(arrays))
+            else:
+                save_key = key
+
+        grid.calc_displacements(points, eps_x=eps_x, eps_z=eps_z,
+                                weights=weights, log_level=log_level,
+                                timer=timer, engine=engine,
+                                eps_fallback=eps_fallback)
+
+        if save_key is not None:
+            utils.save_weights(cache_dir, save_key, grid.weights.to_arrays(),
+                               cache_size)
+    grid.timings = timer.timings
+    grid.n_points = len(points)
+    return grid
+
+
+def calc_sheets(data: Dict[str, np.ndarray],
+                step_z: Dict[int, Union[int, float]],
+                tiles: Tuple[int, int] = None,
+                workers: int = 1,
+                eps_x: float = None,
+                eps_z: float = None,
+                cache_dir: str = None,
+                cache_size: int = None,
+                log_level: str = classes.LOG_FULL,
+                profile: bool = False,
+                engine: str = classes.ENGINE_QUADRANT,
+                eps_fallback: float = 1
+                ) -> Dict[str, classes.RectangleGrid]:
+    """
+    Расчет листов одного файла (см. calc_sheet). Листы с одинаковыми
+    координатами X, Z точек (компоненты перемещений одной сетки Plaxis)
+    используют веса интерполяции, вычисленные для первого из них.
+
+    :param data: словарь вида {название_листа: массив точек}
+    :param step_z: шаг сетки в зависимости от глубины Z
+    :param tiles: количество блоков (по строкам, по столбцам)
+    :param workers: количество процессов для расчета блоков
+    :param eps_x: окрестность поиска по X, None - шаг сетки по X
+    :param eps_z: окрестность поиска по Z, None - шаг сетки по Z
+    :param cache_dir: путь до папки кэша весов интерполяции, None - без кэша
+    :param cache_size: наибольший размер кэша весов в байтах
+    :param log_level: уровень журнала операций
+    :param profile: замерять время этапов расчета
+    :param engine: метод расчета весов интерполяции
+    :param eps_fallback: наибольший множитель окрестностей поиска для
+    повторного расчета узлов
+    :return: словарь вида {название_листа: RectangleGrid}
+    """
+    grids = {}
+    for key, points in data.items():
+        weights = [grid.weights for grid in grids.values()
+                   if grid.weights is not None]
+        grids[key] = calc_sheet(points, step_z, tiles, workers, eps_x, eps_z,
+                                weights, cache_dir, cache_size, log_level,
+                                profile, engine, eps_fallback)
+    return grids
+
+
+def group_sheets(data: Dict[str, np.ndarray]) -> List[Dict[str, np.ndarray]]:
+    """
+    Группирует листы файла с одинаковыми координатами X, Z точек - группа
+    рассчитывается одной задачей calc_sheets с общими весами интерполяции.
+
+    :param data: словарь вида {название_листа: массив точек}
+    :return: список словарей вида {название_листа: массив точек}
+    """
+    groups = []
+    for key, points in data.items():
+        for group in groups:
+            first = next(iter(group.values()))
+            if np.array_equal(first[:, :2], points[:, :2]):
+                group[key] = points
+                break
+        else:
+            groups.append({key: points})
+    return groups
+
+
+def write_info_sheet(xls: 'Workbook',
+                     key: str,
+                     grid: classes.RectangleGrid,
+                     write_only: bool = False) -> NoReturn:
+    """
+    Создает лист журнала операций 'info_' + key.
+
+    :param xls: excel файл
+    :param key: название листа
+    :param grid: экземпляр RectangleGrid с вычисленными перемещениями
+    :param write_only: excel файл в режиме write_only
+    :return: NoReturn
+    """
+    sheet_info = xls.create_sheet('info_' + key)
+    if write_only:
+        sht_info = classes.SheetInfoStream(sheet_info, grid.main_info)
+    else:
+        sht_info = classes.SheetInfo(sheet_info, grid.main_info)
+
+    for point in grid.journal_pts.values():
+        sht_info.write_journal(point)  # записываем лог операций
+    if write_only:
+        sht_info.close()
+
+
+def stream_sheet(xls: 'Workbook',
+                 key: str,
+                 grid: classes.RectangleGrid,
+                 info_sheets: bool = True) -> NoReturn:
+    """
+    Аналог write_sheet для excel файла в режиме write_only: строки листов
+    записываются по порядку, без хранения оформленных ячеек в памяти.
+
+    :param xls: excel файл в режиме write_only
+    :param key: название листа
+    :param grid: экземпляр RectangleGrid с вычисленными перемещениями
+    :param info_sheets: создавать лист журнала операций 'info_' + key
+    :return: NoReturn
+    """
+    # строки таблицы перемещений: узлы по строкам листа, None - перемещение
+    # не найдено
+    shape = (len(grid.grid_x), len(grid.grid_z))
+    u_y = grid.coords[:, 2].reshape(shape).T
+    success = (grid.status == classes.NODE_SUCCESS).reshape(shape).T
+    values = ([value if ok else None for value, ok in zip(*row)]
+              for row in zip(u_y, success))
+
+    sheet = xls.create_sheet(key)
+    utils.stream_excel(sheet, grid.grid_x, grid.grid_z, values)
+
+    if info_sheets:
+        write_info_sheet(xls, key, grid, write_only=True)
+
+
+def write_sheet(xls: 'Workbook',
+                key: str,
+                grid: classes.RectangleGrid,
+                info_sheets: bool = True) -> NoReturn:
+    """
+    Создает лист с перемещениями в узлах сетки и, при необходимости, лист
+    журнала операций.
+
+    :param xls: excel файл
+    :param key: название листа
+    :param grid: экземпляр RectangleGrid с вычисленными перемещениями
+    :param info_sheets: создавать лист журнала операций 'info_' + key
+    :return: NoReturn
+    """
+    # создаем лист для записи перемещений и оформляем его
+    sheet = xls.create_sheet(key)
+    utils.markup_excel(sheet, grid.grid_x, grid.grid_z)
+
+    # записываем результаты в ячейки excel файла
+    from PlaxisRectangleGrid.styles import STYLE_CELL, STYLE_ERROR
+    success = grid.status == classes.NODE_SUCCESS
+    for (row, col), u_y, ok in zip(grid.cells.tolist(), grid.coords[:, 2],
+                                   success):
+        if ok:
+            utils.write_excel(sheet, row, col, u_y, style=STYLE_CELL)
+        else:
+            utils.write_excel(sheet, row, col, 'NULL', style=STYLE_ERROR)
+
+    if info_sheets:
+        # создаем лист для записи операций
+        write_info_sheet(xls, key, grid)
+
+
+def write_journal(filepath: str,
+                  grids: Dict[str, classes.RectangleGrid],
+                  postfix: str,
+                  journal: str = 'npz',
+                  out_dir: str = None) -> str:
+    """
+    Записывает журналы операций узлов всех листов в компактный файл рядом
+    с выходным excel файлом, вместо (или вместе с) листов журнала
+    операций 'info_'.
+    npz - плоские массивы RectangleGrid.journal_arrays с префиксом
+    'название_листа/' и массив команд 'commands'; по нему листы журнала
+    можно создать позже функцией journal_to_excel.
+    csv - по строке на каждую точку операции (на операцию без точек -
+    строка без координат точки): лист, номер узла, ячейка узла, координаты
+    узла, номер операции узла, команда, координаты точки.
+
+    :param filepath: путь до входного файла, (например, "data/100x60x30.xls")
+    :param grids: словарь вида {название_листа: RectangleGrid}
+    :param postfix: постфикс для файла вывода, (например, "_CALC_")
+    :param journal: формат файла 'npz' или 'csv'
+    :param out_dir: папка для файла журнала, None - папка входного файла
+    :return: путь до файла журнала
+    """
+    out_file = utils.output_filepath(filepath, postfix, journal, out_dir)
+    journals = {key: grid.journal_arrays() for key, grid in grids.items()}
+
+    if journal == 'npz':
+        arrays = {f'{key}/{name}': array
+                  for key, arrays_ in journals.items()
+                  for name, array in arrays_.items()}
+        arrays['commands'] = np.array(classes.JOURNAL_COMMANDS)
+        np.savez_compressed(out_file, **arrays)
+
+    elif journal == 'csv':
+        with open(out_file, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['sheet', 'node', 'row', 'col', 'grid_X',
+                             'grid_Z', 'grid_u_Y', 'operation', 'command',
+                             'X', 'Z', 'u_Y'])
+            for key, arrays in journals.items():
+                nodes, cells = arrays['nodes'], arrays['cells']
+                offset = arrays['op_offset']
+                # номер операции внутри узла
+                first_op = np.searchsorted(arrays['op_node'],
+                                           np.arange(len(nodes)))
+
+                for i, (node, command) in enumerate(zip(arrays['op_node'],
+                                                        arrays['op_command'])):
+                    head = [key, node, *cells[node], *nodes[node],
+                            i - first_op[node],
+                            classes.JOURNAL_COMMANDS[command]]
+                    for point in arrays['points'][offset[i]:offset[i + 1]]:
+                        writer.writerow(head + list(point))
+                    if offset[i] == offset[i + 1]:
+                        # операция без точек ('fallback')
+                        writer.writerow(head + ['', '', ''])
+    else:
+        raise ValueError(f'Unknown journal format: {journal}')
+    return out_file
+
+
+def journal_to_excel(journal_file: str,
+                     out_file: str,
+                     write_only: bool = False) -> NoReturn:
+    """
+    Создает excel файл с листами журнала операций 'info_' + название_листа
+    по файлу журнала npz (см. write_journal). Позволяет не создавать листы
+    журнала при расчете, а получить их позже и только при необходимости.
+
+    :param journal_file: путь до файла журнала npz
+    :param out_file: путь до создаваемого excel файла
+    :param write_only: потоковая запись файла в режиме write_only
+    :return: NoReturn
+    """
+    from openpyxl import Workbook
+
+    data = np.load(journal_file)
+    keys = dict.fromkeys(name.split('/')[0] for name in data.files
+                         if '/' in name)
+
+    xls = Workbook(write_only=write_only)
+    for key in keys:
+        arrays = {name.split('/', 1)[1]: data[name] for name in data.files
+                  if name.startswith(key + '/')}
+        main_info, points = classes.journal_from_arrays(arrays)
+
+        sheet_info = xls.create_sheet('info_' + key)
+        if write_only:
+            sht_info = classes.SheetInfoStream(sheet_info, main_info)
+        else:
+            sht_info = classes.SheetInfo(sheet_info, main_info)
+        for point in points:
+            sht_info.write_journal(point)  # записываем лог операций
+        if write_only:
+            sht_info.close()
+
+    if not write_only:
+        xls.remove(xls['Sheet'])
+    xls.save(out_file)
+
+
+def write_workbook(filepath: str,
+                   grids: Dict[str, classes.RectangleGrid],
+                   postfix: str,
+                   info_sheets: bool = True,
+                   write_only: bool = False,
+                   journal: str = None,
+                   out_dir: str = None,
+                   profile: bool = False,
+                   timings: Dict[str, float] = None,
+                   run_log: bool = False) -> Tuple[str, List[dict]]:
+    """
+    Записывает рассчитанные листы входного файла в выходной excel файл.
+    При замерах (profile) в строки лога листов добавляются счетчики ветвей
+    расчета узлов и время этапов листа, в конце - строка 'Total' с
+    суммарным временем этапов по файлу.
+    Для лога JSON Lines (run_log) создаются записи по листам (см.
+    run_record), время этапов замеряется и без profile.
+
+    :param filepath: путь до входного файла, (например, "data/100x60x30.xls")
+    :param grids: словарь вида {название_листа: RectangleGrid} в порядке
+    листов входного файла
+    :param postfix: постфикс для файла вывода, (например, "_CALC_")
+    :param info_sheets: создавать листы журнала операций
+    :param write_only: потоковая запись файла в режиме write_only
+    :param journal: формат файла журнала операций 'npz'/'csv' (см.
+    write_journal), None - файл не создается
+    :param out_dir: папка для выходных файлов, None - папка входного файла
+    :param profile: замерять время этапов записи
+    :param timings: время этапов файла до записи, (например,
+    {'preprocessing_data': 0.5})
+    :param run_log: создавать записи лога JSON Lines
+    :return: (строки лога по всем листам файла для записи в файл txt,
+    записи лога JSON Lines по листам)
+    """
+    from openpyxl import Workbook
+
+    # Создает название для выходного файла
+    out_file = utils.output_filepath(filepath, postfix, out_dir=out_dir)
+
+    # создаем файл xls
+    xls = Workbook(write_only=write_only)
+    sheet_writer = stream_sheet if write_only else write_sheet
+    file_timer = profiling.StageTimer(profile or run_log,
+                                      dict(timings or {}))
+
+    for key, grid in grids.items():
+        timer = profiling.StageTimer(profile or run_log, grid.timings)
+        with timer('write_sheet'):
+            sheet_writer(xls, key, grid, info_sheets=False)
+        if info_sheets:
+            with timer('write_info_sheet'):
+                write_info_sheet(xls, key, grid, write_only)
+
+    with file_timer('save'):
+        if not write_only:
+            xls.remove(xls['Sheet'])
+        xls.save(out_file)
+
+    if journal is not None:
+        with file_timer('write_journal'):
+            write_journal(filepath, grids, postfix, journal, out_dir)
+
+    records = [run_record(filepath, key, grid, file_timer.timings)
+               for key, grid in grids.items()] if run_log else []
+
+    log_string = ''
+    for key, grid in grids.items():
+        fields = grid.main_info
+        if profile:
+            fields = {**fields, **grid.branch_counts,
+                      **profiling.log_fields(grid.timings)}
+            for stage, seconds in grid.timings.items():
+                file_timer.timings[stage] = (
+                    file_timer.timings.get(stage, 0.) + seconds)
+        log_string += utils.log_to_string(filepath, key, fields)
+    if profile:
+        log_string += utils.log_to_string(
+            filepath, 'Total', profiling.log_fields(file_timer.timings))
+    return log_string, records
+
+
+def run_record(filepath: str,
+               key: str,
+               grid: classes.RectangleGrid,
+               file_timings: Dict[str, float]) -> dict:
+    """
+    Создает запись лога JSON Lines для рассчитанного листа.
+
+    :param filepath: путь до входного файла, (например, "data/100x60x30.xls")
+    :param key: название листа
+    :param grid: экземпляр RectangleGrid с вычисленными перемещениями
+    :param file_timings: время этапов файла (предобработка, сохранение)
+    :return: словарь с полями записи
+    """
+    return {'file': filepath,
+            'sheet': key,
+            'time': datetime.today().isoformat(timespec='seconds'),
+            'main_info': dict(grid.main_info),
+            'points': grid.n_points,
+            'grid': {'cols': len(grid.grid_x),
+                     'rows': len(grid.grid_z),
+                     'length': float(grid.length),
+                     'depth': float(grid.depth),
+                     'step_x': grid.step_x,
+                     'step_z': grid.step_z},
+            'branches': dict(grid.branch_counts),
+            'log_counts': dict(grid.log_counts),
+            'timings': dict(grid.timings),
+            'file_timings': dict(file_timings)}
+
+
+def _print_error(filepath: str, exc: Exception) -> NoReturn:
+    """
+    Выводит в stderr ошибку обработки файла вместе с трассировкой (для
+    задач пула - с трассировкой из процесса пула).
+    """
+    print(f'Error: {filepath}', file=sys.stderr)
+    traceback.print_exception(type(exc), exc, exc.__traceback__)
+
+
+def _check_sheets(filepath: str, data: Dict[str, np.ndarray]) -> NoReturn:
+    """
+    Проверяет, что в файле есть непустые листы для расчета: выходной файл
+    без листов не может быть записан.
+    """
+    if not data:
+        raise ValueError(f'{filepath}: no sheets with data')
+
+
+def process_files(filenames: Iterable[str],
+                  file_txt: str,
+                  columns: Dict[str, tuple],
+                  step_z: Dict[int, Union[int, float]],
+                  postfix: str,
+                  info_sheets: bool = True,
+                  workers: int = 1,
+                  tiles: Tuple[int, int] = None,
+                  write_only: bool = False,
+                  journal: str = None,
+                  cache_dir: str = None,
+                  eps_x: float = None,
+                  eps_z: float = None,
+                  out_dir: str = None,
+                  cache_size: int = None,
+                  log_level: str = None,
+                  profile: bool = None,
+                  run_log: str = None,
+                  engine: str = classes.ENGINE_QUADRANT,
+                  eps_fallback: float = 1,
+                  dedup_tolerance: float = settings.DEDUP_TOLERANCE,
+                  dedup_policy: str = settings.DEDUP_POLICY
+                  ) -> Dict[str, Exception]:
+    """
+    Расчет входных файлов. При workers > 1 чтение файлов, расчет каждого
+    листа (файл, лист; листы с общей геометрией - одной задачей, см.
+    group_sheets) и запись выходных файлов выполняются в отдельных
+    процессах пула. Лог в файл txt пишет только основной процесс, целым
+    блоком по каждому записанному файлу, поэтому строки разных файлов не
+    перемешиваются.
+    Если задано разбиение tiles, файлы и листы обрабатываются
+    последовательно, а в пуле процессов рассчитываются блоки каждого листа.
+    Ошибка в одном файле не прерывает расчет остальных: файл пропускается,
+    ошибка выводится в stderr. Файл без непустых листов - ошибка (см.
+    _check_sheets).
+    При замерах (profile) в лог txt записываются счетчики ветвей расчета
+    узлов и время этапов (см. write_workbook).
+    Лог JSON Lines (run_log) - по записи на лист (см. run_record) с
+    параметрами расчета. Как и лог txt, пишется только основным процессом,
+    одной записью в файл по каждому записанному файлу.
+
+    :param filenames: пути до входных файлов
+    :param file_txt: путь до файла txt для логов
+    :param columns: словарь с номера столбцов, вида {название_листа:
+    номера_стлб}
+    :param step_z: шаг сетки в зависимости от глубины Z
+    :param postfix: постфикс для файла вывода, (например, "_CALC_")
+    :param info_sheets: создавать листы журнала операций
+    :param workers: количество процессов (1 - последовательный расчет)
+    :param tiles: количество блоков листа (по строкам, по столбцам)
+    :param write_only: потоковая запись выходных файлов
+    :param journal: формат файла журнала операций 'npz'/'csv', None - файл
+    не создается
+    :param cache_dir: путь до папки кэша предобработанных данных и весов
+    интерполяции, None - без кэша
+    :param eps_x: окрестность поиска по X, None - шаг сетки по X
+    :param eps_z: окрестность поиска по Z, None - шаг сетки по Z
+    :param out_dir: папка для выходных файлов, None - папка входного файла
+    :param cache_size: наибольший размер кэша весов интерполяции в байтах,
+    None - без ограничения
+    :param log_level: уровень журнала операций узлов 'off', 'counts',
+    'full', None - 'full', если создаются листы или файл журнала, иначе
+    'counts'
+    :param profile: замерять время этапов, None - по переменной окружения
+    PLAXIS_PROFILE (см. profiling.enabled)
+    :param run_log: путь до файла лога JSON Lines, None - не создается
+    :param engine: метод расчета весов интерполяции 'quadrant' - ближайшие
+    точки в четвертях от узла, 'delaunay' - треугольники триангуляции
+    Делоне точек (см. classes.ENGINES)
+    :param eps_fallback: наибольший множитель окрестностей поиска для
+    повторного расчета узлов, в которых перемещение не найдено (только
+    'quadrant'), 1 - без повторного расчета
+    :param dedup_tolerance: размер ячейки объединения близких точек при
+    удалении дубликатов, 0 - только совпадающие точки (см.
+    utils.dedup_points)
+    :param dedup_policy: правило выбора перемещения объединяемых точек
+    'mean', 'first', 'max'
+    :return: словарь вида {путь_до_файла: ошибка} необработанных файлов
+    """
+    if log_level is None:
+        log_level = (classes.LOG_FULL if info_sheets or journal is not None
+                     else classes.LOG_COUNTS)
+    profile = profiling.enabled(profile)
+    # время этапов нужно и для лога JSON Lines
+    timers = profile or run_log is not None
+    failed = {}
+    # параметры расчета для лога JSON Lines
+    run_settings = {'columns': columns, 'step_z': step_z, 'postfix': postfix,
+                    'eps_x': eps_x, 'eps_z': eps_z, 'log_level': log_level,
+                    'info_sheets': info_sheets, 'write_only': write_only,
+                    'journal': journal, 'workers': workers, 'tiles': tiles,
+                    'cache_dir': cache_dir, 'engine': engine,
+                    'eps_fallback': eps_fallback,
+                    'dedup_tolerance': dedup_tolerance,
+                    'dedup_policy': dedup_policy}
+
+    if workers <= 1 or tiles is not None:
+        for filepath in filenames:
+            try:
+                # предобработка данных
+                data, seconds = profiling.timed(utils.preprocessing_data,
+                                                filepath, columns, cache_dir,
+                                                dedup_tolerance, dedup_policy)
+                print(filepath)
+                _check_sheets(filepath, data)
+
+                grids = calc_sheets(data, step_z, tiles, workers, eps_x,
+                                    eps_z, cache_dir, cache_size, log_level,
+                                    timers, engine, eps_fallback)
+                log_string, records = write_workbook(
+                    filepath, grids, postfix, info_sheets, write_only,
+                    journal, out_dir, profile,
+                    {'preprocessing_data': seconds}, run_log is not None)
+            except Exception as exc:
+                failed[filepath] = exc
+                _print_error(filepath, exc)
+                continue
+
+            # записываем лог в файл
+            with open(file_txt, "a") as logs:
+                logs.write(log_string)
+            if run_log is not None:
+                utils.write_run_log(run_log, records, run_settings)
+        return failed
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # задачи пула: {задача: (этап, путь_до_файла)}
+        jobs = {executor.submit(profiling.timed, utils.preprocessing_data,
+                                filepath, columns, cache_dir,
+                                dedup_tolerance, dedup_policy):
+                ('read', filepath)
+                for filepath in filenames}
+        grids = {}  # {путь_до_файла: {название_листа: RectangleGrid}}
+        timings = {}  # {путь_до_файла: время предобработки}
+
+        while jobs:
+            done, _ = wait(jobs, return_when=FIRST_COMPLETED)
+            for job in done:
+                stage, filepath = jobs.pop(job)
+                if filepath in failed:
+                    continue  # остальные листы файла с ошибкой не нужны
+
+                try:
+                    result = job.result()
+                    if stage == 'read':
+                        _check_sheets(filepath, result[0])
+                except Exception as exc:
+                    failed[filepath] = exc
+                    grids.pop(filepath, None)
+                    timings.pop(filepath, None)
+                    _print_error(filepath, exc)
+                    continue
+
+                if stage == 'read':
+                    # файл прочитан - расчет каждой группы листов с общей
+                    # геометрией отдельной задачей
+                    print(filepath)
+                    data, timings[filepath] = result
+                    grids[filepath] = dict.fromkeys(data)
+                    for group in group_sheets(data):
+                        job_ = executor.submit(calc_sheets, group, step_z,
+                                               eps_x=eps_x, eps_z=eps_z,
+                                               cache_dir=cache_dir,
+                                               cache_size=cache_size,
+                                               log_level=log_level,
+                                               profile=timers,
+                                               engine=engine,
+                                               eps_fallback=eps_fallback)
+                        jobs[job_] = ('calc', filepath)
+
+                elif stage == 'calc':
+                    # все листы файла рассчитаны - записываем файл
+                    grids[filepath].update(result)
+                    if all(grids[filepath].values()):
+                        job_ = executor.submit(
+                            write_workbook, filepath, grids.pop(filepath),
+                            postfix, info_sheets, write_only, journal,
+                            out_dir, profile,
+                            {'preprocessing_data': timings.pop(filepath)},
+                            run_log is not None)
+                        jobs[job_] = ('write', filepath)
+
+                else:
+                    # записываем лог в файл
+                    log_string, records = result
+                    with open(file_txt, "a") as logs:
+                        logs.write(log_string)
+                    if run_log is not None:
+                        utils.write_run_log(run_log, records, run_settings)
+    return failed
+
+
+def process_phases(filenames: Sequence[str],
+                   file_txt: str,
+                   columns: Dict[str, tuple],
+                   step_z: Dict[int, Union[int, float]],
+                   out_file: str,
+                   cache_dir: str = None,
+                   eps_x: float = None,
+                   eps_z: float = None,
+                   cache_size: int = None,
+                   engine: str = classes.ENGINE_QUADRANT,
+                   eps_fallback: float = 1,
+                   dedup_tolerance: float = settings.DEDUP_TOLERANCE,
+                   dedup_policy: str = settings.DEDUP_POLICY) -> str:
+    """
+    Пакетный расчет фаз одной модели: входные файлы - выгрузки фаз с общей
+    геометрией (одинаковые координаты X, Z точек листов). Веса
+    интерполяции вычисляются один раз (для первой фазы) и используются для
+    листов остальных фаз, excel файлы и журналы операций не создаются.
+    Результат - файл npz: для каждого листа (компоненты перемещений)
+    массив размером (фаза, len(grid_z), len(grid_x)) с названием листа
+    (np.nan - перемещение в узле не найдено), оси сетки листа
+    'лист/grid_x', 'лист/grid_z' (у листов одной выгрузки сетки разные),
+    пути до файлов фаз 'phases' и названия листов 'sheets'.
+    В лог txt записывается main_info каждого листа каждой фазы.
+    Листы рассчитываются целиком, без разбиения на блоки (tiles): при
+    расчете блоками веса не сохраняются и вычислялись бы для каждой фазы.
+
+    :param filenames: пути до входных файлов фаз в порядке фаз
+    :param file_txt: путь до файла txt для логов
+    :param columns: словарь с номера столбцов, вида {название_листа:
+    номера_стлб}
+    :param step_z: шаг сетки в зависимости от глубины Z
+    :param out_file: путь до файла npz, (например, "data/phases.npz")
+    :param cache_dir: путь до папки кэша предобработанных данных и весов
+    интерполяции, None - без кэша
+    :param eps_x: окрестность поиска по X, None - шаг сетки по X
+    :param eps_z: окрестность поиска по Z, None - шаг сетки по Z
+    :param cache_size: наибольший размер кэша весов интерполяции в байтах
+    :param engine: метод расчета весов интерполяции (см. classes.ENGINES)
+    :param eps_fallback: наибольший множитель окрестностей поиска для
+    повторного расчета узлов
+    :param dedup_tolerance: размер ячейки объединения близких точек при
+    удалении дубликатов (см. utils.dedup_points)
+    :param dedup_policy: правило выбора перемещения объединяемых точек
+    :return: out_file
+    """
+    if not filenames:
+        raise ValueError('no phase files')
+    reserved = {'phases', 'sheets'}  # массивы файла
+
+    cubes = {}  # {название_листа: [перемещения фазы (z, x), ...]}
+    weights = []  # веса интерполяции разной геометрии
+    axes = {}  # {название_листа: (grid_x, grid_z) первой фазы}
+    for phase, filepath in enumerate(filenames):
+        data = utils.preprocessing_data(filepath, columns, cache_dir,
+                                        dedup_tolerance, dedup_policy)
+        print(filepath)
+        if reserved & set(data) or any('/' in key for key in data):
+            raise ValueError(f'{filepath}: sheet names {sorted(reserved)} '
+                             f'and names with "/" are reserved in the '
+                             f'phases file')
+        if phase and set(data) != set(cubes):
+            raise ValueError(f'{filepath}: sheets {sorted(data)} differ from '
+                             f'the first phase {sorted(cubes)}')
+
+        log_string = ''
+        for key, points in data.items():
+            grid = calc_sheet(points, step_z, None, 1, eps_x, eps_z,
+                              weights, cache_dir, cache_size,
+                              classes.LOG_OFF, engine=engine,
+                              eps_fallback=eps_fallback)
+            if grid.weights is not None and not any(
+                    item is grid.weights for item in weights):
+                weights.append(grid.weights)
+
+            if key not in axes:
+                axes[key] = (grid.grid_x, grid.grid_z)
+            elif not (np.array_equal(axes[key][0], grid.grid_x) and
+                      np.array_equal(axes[key][1], grid.grid_z)):
+                raise ValueError(f'{filepath}: grid of sheet {key!r} differs '
+                                 f'from the first phase')
+
+            # узлы идут по столбцам, внутри столбца - по строкам
+            cubes.setdefault(key, []).append(
+                grid.coords[:, 2].reshape(len(grid.grid_x),
+                                          len(grid.grid_z)).T)
+            log_string += utils.log_to_string(filepath, key, grid.main_info)
+
+        with open(file_txt, "a") as logs:
+            logs.write(log_string)
+
+    arrays = {}
+    for key, values in cubes.items():
+        arrays[key] = np.stack(values)
+        arrays[f'{key}/grid_x'], arrays[f'{key}/grid_z'] = axes[key]
+    np.savez_compressed(out_file, **arrays,
+                        phases=np.array(filenames, dtype=str),
+                        sheets=np.array(list(cubes), dtype=str))
+    return out_file
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+from typing import Callable, Dict, Tuple, Union
+
+import contextlib
+import os
+import time
+
+"""
+Замеры времени этапов расчета. Включаются параметром profile функций
+processing (значение settings.PROFILE, параметр --profile командной строки)
+или переменной окружения PLAXIS_PROFILE=1. Время этапов листов и счетчики
+ветвей расчета узлов (см. classes.BRANCHES) дописываются в лог txt.
+"""
+
+PROFILE_ENV = 'PLAXIS_PROFILE'  # переменная окружения для включения замеров
+
+
+def enabled(profile: bool = None) -> bool:
+    """
+    Определяет, включены ли замеры.
+
+    :param profile: True/False, None - по переменной окружения PLAXIS_PROFILE
+    :return: True, если замеры включены
+    """
+    if profile is None:
+        value = os.environ.get(PROFILE_ENV, '')
+        return value.strip().lower() not in ('', '0', 'false', 'no', 'off')
+    return bool(profile)
+
+
+class StageTimer(object):
+    """
+    Суммирует время этапов расчета. Вызов timer(stage) возвращает контекст,
+    время которого добавляется к этапу stage (за вычетом времени контекста
+    subtract). Выключенный таймер ничего не замеряет.
+    """
+
+    def __init__(self,
+                 enabled: bool = True,
+                 timings: Dict[str, float] = None):
+        self.enabled = enabled
+        self.timings = {} if timings is None else timings
+
+    def __call__(self,
+                 stage: str,
+                 subtract: '_Stage' = None
+                 ) -> Union['_Stage', contextlib.nullcontext]:
+        if not self.enabled:
+            return contextlib.nullcontext()
+        return _Stage(self.timings, stage, subtract)
+
+
+class _Stage(object):
+    """
+    Контекст замера времени одного этапа.
+    """
+
+    def __init__(self,
+                 timings: Dict[str, float],
+                 stage: str,
+                 subtract: '_Stage' = None):
+        self.timings = timings
+        self.stage = stage
+        self.subtract = subtract
+        self.elapsed = 0.
+
+    def __enter__(self) -> '_Stage':
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.elapsed = time.perf_counter() - self.start
+        if self.subtract is not None:
+            self.elapsed = max(self.elapsed - self.subtract.elapsed, 0.)
+        self.timings[self.stage] = (self.timings.get(self.stage, 0.) +
+                                    self.elapsed)
+
+
+def timed(func: Callable, *args, **kwargs) -> Tuple[object, float]:
+    """
+    Вызывает функцию и замеряет время вызова (например, в задаче пула
+    процессов).
+
+    :return: (результат функции, время в секундах)
+    """
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def log_fields(timings: Dict[str, float]) -> Dict[str, float]:
+    """
+    Поля времени этапов для записи в лог txt (см. utils.log_to_string).
+
+    :param timings: {этап: время в секундах}
+    :return: {'этап [s]': время, округленное до 0.1 мс}
+    """
+    return {f'{stage} [s]': round(seconds, 4)
+            for stage, seconds in timings.items()}
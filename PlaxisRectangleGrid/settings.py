@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+
+"""
+Настройки расчета по умолчанию. Используются при запуске app.py и
+значениями по умолчанию параметров командной строки
+(python -m PlaxisRectangleGrid).
+"""
+
+PATH_INPUT = './data'  # путь до папки с файлами
+OUTPUT_FILENAME_POSTFIX = '_CALC_'  # постфикс для файла вывода
+
+# папка кэша предобработанных входных данных и весов интерполяции,
+# None - без кэша
+CACHE_DIR = None
+
+# наибольший размер кэша весов интерполяции в байтах (давно не
+# использованные веса удаляются), None - без ограничения
+WEIGHTS_CACHE_SIZE = 512 * 2 ** 20
+
+# названия листов и номера колонок с данными (X, Z, u_Y) входного файла
+COLUMNS_COORD = {
+    'x': (3, 5, 7),
+    'y': (4, 5, 6),
+    'default': (3, 5, 7)
+}
+
+# удаление дубликатов точек: точки, координаты X, Z которых округляются до
+# одной ячейки размером DEDUP_TOLERANCE (м), объединяются в одну, 0 - только
+# совпадающие точки; перемещение объединенной точки - 'mean' (среднее),
+# 'first' (первой в файле) или 'max' (наибольшее)
+DEDUP_TOLERANCE = 1e-9
+DEDUP_POLICY = 'mean'
+
+# шаг сетки в зависимости от глубины Z
+STEP_Z = {
+    -10: -0.5,
+    -15: -1.,
+    -22: -1.5,
+    -30: -2,
+}
+
+# метод расчета перемещений в узлах: 'quadrant' - по ближайшим точкам в
+# 4 четвертях от узла, 'delaunay' - по треугольникам триангуляции Делоне
+# точек листа
+ENGINE = 'quadrant'
+
+# размер окрестности поиска по X и по Z, None - шаг сетки по оси
+EPS_X = None
+EPS_Z = None
+
+# наибольший множитель окрестности поиска для повторного расчета узлов, в
+# которых перемещение не найдено (окрестность увеличивается вдвое на каждом
+# шаге), 1 - без повторного расчета
+EPS_FALLBACK = 1
+
+INFO_SHEETS = True  # создаем листы в excel для записи операций
+
+# журнал операций узлов: 'off' - не ведется, 'counts' - только количество
+# операций, 'full' - все операции; None - 'full', если создаются листы или
+# файл журнала, иначе 'counts'
+LOG_LEVEL = None
+
+# компактный файл журнала операций рядом с файлом вывода: 'npz', 'csv' или
+# None - не создается
+JOURNAL = None
+
+# замеры времени этапов и счетчики ветвей расчета узлов в логе txt,
+# None - по переменной окружения PLAXIS_PROFILE
+PROFILE = None
+
+# лог JSON Lines (файл .jsonl с тем же названием, что и лог txt): по записи
+# на лист с количеством точек и узлов, размерами сетки, временем этапов и
+# параметрами расчета
+RUN_LOG = False
+
+WRITE_ONLY = False  # потоковая запись файлов excel (режим write_only)
+
+WORKERS = 1  # количество процессов для расчета (1 - последовательно)
+
+# разбиение сетки листа на блоки (по строкам, по столбцам) для параллельного
+# расчета одного листа в WORKERS процессах, None - параллельно по листам
+TILES = None
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+from openpyxl.styles import (PatternFill, Font, Border,
+                             Alignment, Side, NamedStyle)
+
+"""
+Стили оформления таблиц excel файлов. Модуль импортирует openpyxl и
+загружается только при записи excel файлов (функции utils и классы
+SheetInfo); имена доступны и как атрибуты utils (utils.STYLE_ERROR и т.п.).
+"""
+
+FILL = PatternFill(start_color='e8fdfb', end_color='e8fdfb', fill_type='solid')
+FONT = Font(b=True, size=12)
+ALIGNMENT = Alignment(horizontal='center', vertical='center')
+BORDER = Border(left=Side(style='thin'), right=Side(style='thin'),
+                top=Side(style='thin'), bottom=Side(style='thin'))
+
+STYLE_HEADER = NamedStyle(name='header')
+STYLE_HEADER.font = FONT
+STYLE_HEADER.fill = FILL
+STYLE_HEADER.border = BORDER
+STYLE_HEADER.alignment = ALIGNMENT
+
+STYLE_CELL = NamedStyle(name='cell')
+STYLE_CELL.border = BORDER
+STYLE_CELL.alignment = ALIGNMENT
+
+STYLE_ERROR = NamedStyle(name='error')
+STYLE_ERROR.border = BORDER
+STYLE_ERROR.alignment = ALIGNMENT
+STYLE_ERROR.fill = PatternFill(start_color='CD5C5C',
+                               end_color='CD5C5C',
+                               fill_type='solid')
+
+STYLE_SUCCESS = NamedStyle(name='success')
+STYLE_SUCCESS.border = BORDER
+STYLE_SUCCESS.alignment = ALIGNMENT
+STYLE_SUCCESS.fill = PatternFill(start_color='90EE90',
+                                 end_color='90EE90',
+                                 fill_type='solid')
+
+
+class SheetInfoStyles(object):
+    """
+    Класс содержит стили оформления листа журнала операций для класса SheetInfo
+    """
+    main_cell = NamedStyle(name='main_cell')
+    main_cell.border = BORDER
+    main_cell.alignment = ALIGNMENT
+    main_cell.font = Font(b=True, size=14)
+
+    grid_pt_font = Font(b=True, size=11)
+
+    errors = STYLE_ERROR
+    success = STYLE_SUCCESS
+    cell = STYLE_CELL
+    header = STYLE_HEADER
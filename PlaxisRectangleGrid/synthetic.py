@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+from typing import Dict, Sequence
+
+import argparse
+import sys
+
+import numpy as np
+
+from PlaxisRectangleGrid.settings import COLUMNS_COORD
+
+"""
+Генератор синтетических входных данных, похожих на выгрузку узлов
+треугольной сетки Plaxis: точки (X, Z, u_Y) в прямоугольнике
+[-length / 2, length / 2] x [depth, 0], сгущающиеся к поверхности, с
+повторами узлов (узел выгружается для каждого элемента, в который входит).
+Используется для замеров производительности на 10^5 - 10^7 точках без
+файлов Plaxis:
+
+    python -m PlaxisRectangleGrid.synthetic 100000 data/synthetic.xlsx
+
+Глубина модели должна быть ключом STEP_Z.
+"""
+
+# заголовок листа выгрузки Plaxis
+HEADER = ('Structural element', 'Node', 'Local number', 'X [m]', 'Y [m]',
+          'Z [m]', 'u_x [m]', 'u_y [m]', 'u_z [m]', '|u| [m]')
+
+EXCEL_MAX_ROWS = 1048576  # ограничение excel на количество строк листа
+
+
+def _row_spacing(rows: int, depth: float, gradient: float) -> tuple:
+    """
+    Глубины рядов узлов и шаг сетки на каждом ряду. Шаг растет линейно с
+    глубиной: у низа модели он в gradient раз больше, чем у поверхности.
+
+    :param rows: количество рядов узлов
+    :param depth: глубина модели, (например, -15)
+    :param gradient: отношение шага у низа модели к шагу у поверхности
+    :return: (глубины рядов Z, шаг сетки на рядах)
+    """
+    t = np.linspace(0, 1, rows)
+    height = abs(depth)
+    if gradient == 1:
+        dist = height * t
+        step = np.full(rows, height / (rows - 1))
+    else:
+        c = gradient - 1
+        dist = height / c * ((1 + c) ** t - 1)
+        step = (height * np.log1p(c) / (c * (rows - 1))
+                * (1 + c * dist / height))
+    z = 0. - dist
+    z[-1] = depth  # низ модели точно на глубине depth
+    return z, step
+
+
+def _row_sizes(rows: int, length: float, depth: float,
+               gradient: float) -> np.ndarray:
+    """
+    Количество узлов на каждом ряду (на нечетных рядах узлы смещены на
+    половину шага и на краях добавлено по узлу).
+    """
+    _, step = _row_spacing(rows, depth, gradient)
+    sizes = np.maximum(np.rint(length / step).astype(np.int64), 1) + 1
+    sizes[1::2] += 1
+    return sizes
+
+
+def mesh_points(n_points: int,
+                length: float = 60.,
+                depth: float = -15.,
+                gradient: float = 3.,
+                duplicates: float = 0.4,
+                jitter: float = 0.3,
+                seed: int = None) -> np.ndarray:
+    """
+    Создает облако точек, похожее на узлы треугольной сетки Plaxis. Узлы
+    расположены рядами со смещением на половину шага (треугольная решетка),
+    шаг сетки растет с глубиной. Внутренние узлы случайно смещаются,
+    узлы на границах модели остаются на границах. Перемещения u_Y - гладкое
+    поле (мульда оседания, затухающая с глубиной).
+
+    :param n_points: примерное количество строк, включая повторы
+    :param length: длина модели по X, (например, 60)
+    :param depth: глубина модели, ключ STEP_Z, (например, -15)
+    :param gradient: отношение шага сетки у низа модели к шагу у
+    поверхности (1 - равномерная сетка)
+    :param duplicates: доля повторов узлов среди строк, [0, 1)
+    :param jitter: смещение внутренних узлов в долях шага сетки, [0, 1)
+    :param seed: начальное значение генератора случайных чисел
+    :return: массив точек вида [[X, Z, u_Y], ... ...] в случайном порядке
+    """
+    if n_points < 4:
+        raise ValueError(f'n_points must be >= 4, got {n_points}')
+    if not 0 <= duplicates < 1:
+        raise ValueError(f'duplicates must be in [0, 1), got {duplicates}')
+    if not 0 <= jitter < 1:
+        raise ValueError(f'jitter must be in [0, 1), got {jitter}')
+    if gradient < 1:
+        raise ValueError(f'gradient must be >= 1, got {gradient}')
+
+    rng = np.random.default_rng(seed)
+
+    # подбираем количество рядов под количество уникальных узлов
+    unique = max(int(n_points * (1 - duplicates)), 4)
+    low, high = 2, 2
+    while _row_sizes(high, length, depth, gradient).sum() < unique:
+        low, high = high, high * 2
+    while low < high:
+        middle = (low + high) // 2
+        if _row_sizes(middle, length, depth, gradient).sum() < unique:
+            low = middle + 1
+        else:
+            high = middle
+    rows = low
+
+    z_rows, step = _row_spacing(rows, depth, gradient)
+    sizes = _row_sizes(rows, length, depth, gradient)
+    half = length / 2
+    x, z, h = [], [], []
+    for i, size in enumerate(sizes):
+        if i % 2:
+            # смещенный ряд: середины отрезков и узлы на краях
+            row = np.linspace(-half, half, size - 1)
+            row = np.concatenate(([-half], (row[:-1] + row[1:]) / 2, [half]))
+        else:
+            row = np.linspace(-half, half, size)
+        x.append(row)
+        z.append(np.full(size, z_rows[i]))
+        h.append(np.full(size, step[i]))
+    x, z, h = np.concatenate(x), np.concatenate(z), np.concatenate(h)
+
+    # случайно смещаем внутренние узлы
+    inner = (np.abs(x) < half) & (z < 0) & (z > depth)
+    shift = rng.uniform(-0.5, 0.5, (2, inner.sum())) * jitter
+    x[inner] += shift[0] * h[inner]
+    z[inner] += shift[1] * h[inner]
+
+    # мульда оседания, затухающая с глубиной
+    u_y = (-0.01 * np.exp(-(x / (0.25 * length)) ** 2)
+           * np.exp(z / (0.5 * abs(depth))) - 0.002 * (1 + z / abs(depth)))
+    points = np.column_stack((x, z, u_y))
+
+    # повторы узлов
+    n_dup = int(round(len(points) * duplicates / (1 - duplicates)))
+    points = np.concatenate(
+        (points, points[rng.integers(0, len(points), n_dup)]))
+    return points[rng.permutation(len(points))]
+
+
+def mesh_sheets(n_points: int,
+                columns: Dict[str, tuple] = None,
+                seed: int = None,
+                **kwargs) -> Dict[str, np.ndarray]:
+    """
+    Создает точки для каждого листа входного файла (см. mesh_points).
+    Листы одной модели имеют разные узлы, как листы выгрузки Plaxis.
+
+    :param n_points: примерное количество строк листа, включая повторы
+    :param columns: словарь с номера столбцов, вида {название_листа:
+    номера_стлб}, ключ 'default' пропускается; None - COLUMNS_COORD
+    :param seed: начальное значение генератора случайных чисел
+    :param kwargs: параметры mesh_points
+    :return: словарь вида {название_листа: массив_точек}
+    """
+    columns = COLUMNS_COORD if columns is None else columns
+    rng = np.random.default_rng(seed)
+    return {key: mesh_points(n_points, seed=rng.integers(2 ** 32), **kwargs)
+            for key in columns if key != 'default'}
+
+
+def write_mesh(filepath: str,
+               sheets: Dict[str, np.ndarray],
+               columns: Dict[str, tuple] = None) -> str:
+    """
+    Записывает точки в excel файл в формате выгрузки Plaxis: X, Z, u_Y
+    каждого листа в столбцы columns[название_листа], остальные столбцы
+    заполняются нулями. Файл читается utils.preprocessing_data.
+
+    :param filepath: путь до файла, (например, "data/synthetic.xlsx")
+    :param sheets: словарь вида {название_листа: массив_точек}
+    :param columns: словарь с номера столбцов, вида {название_листа:
+    номера_стлб}; None - COLUMNS_COORD
+    :return: filepath
+    """
+    from openpyxl import Workbook
+
+    columns = COLUMNS_COORD if columns is None else columns
+    xls = Workbook(write_only=True)
+    for key, points in sheets.items():
+        if len(points) >= EXCEL_MAX_ROWS:
+            raise ValueError(f'sheet {key!r}: {len(points)} rows do not fit '
+                             f'into an excel sheet, use mesh_sheets arrays')
+        cols = columns.get(key, columns['default'])
+        width = max(len(HEADER), max(cols) + 1)
+        sheet = xls.create_sheet(key)
+        sheet.append(HEADER + ('',) * (width - len(HEADER)))
+
+        row = [0.] * width
+        for x, z, u_y in points.tolist():
+            row[cols[0]], row[cols[1]], row[cols[2]] = x, z, u_y
+            sheet.append(row)
+    xls.save(filepath)
+    return filepath
+
+
+def main(argv: Sequence[str] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m PlaxisRectangleGrid.synthetic',
+        description='Синтетический входной файл в формате выгрузки Plaxis.')
+    parser.add_argument('points', type=int,
+                        help='примерное количество строк листа')
+    parser.add_argument('output', help='путь до excel файла')
+    parser.add_argument('--length', type=float, default=60.,
+                        help='длина модели по X (по умолчанию %(default)s)')
+    parser.add_argument('--depth', type=float, default=-15.,
+                        help='глубина модели, ключ STEP_Z (по умолчанию '
+                             '%(default)s)')
+    parser.add_argument('--gradient', type=float, default=3.,
+                        help='отношение шага сетки у низа к шагу у '
+                             'поверхности (по умолчанию %(default)s)')
+    parser.add_argument('--duplicates', type=float, default=0.4,
+                        help='доля повторов узлов (по умолчанию '
+                             '%(default)s)')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='начальное значение генератора')
+    args = parser.parse_args(argv)
+
+    sheets = mesh_sheets(args.points, seed=args.seed, length=args.length,
+                         depth=args.depth, gradient=args.gradient,
+                         duplicates=args.duplicates)
+    write_mesh(args.output, sheets)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,80 +1,55 @@
 #!/usr/bin/env python
-from typing import Dict, NoReturn, Union
+from typing import Dict, Iterable, NoReturn, Union
 
 from datetime import datetime
+import hashlib
+import itertools
+import json
+import os
 import re
+import shutil
+import tempfile
 
-import pandas as pd
 import numpy as np
 
-from openpyxl.styles import (PatternFill, Font, Border,
-                             Alignment, Side, NamedStyle)
-
 """
-Пакет содержит стили для оформления таблиц, функции для предобработки данных из
-excel файла, создания таблиц и записи значений в них.
+Пакет содержит функции для предобработки данных из excel файла, создания
+таблиц и записи значений в них, кэша и логов. pandas и openpyxl
+импортируются в функциях, которые их используют: расчет без чтения и записи
+excel файлов загружает только numpy.
 """
-FILL = PatternFill(start_color='e8fdfb', end_color='e8fdfb', fill_type='solid')
-FONT = Font(b=True, size=12)
-ALIGNMENT = Alignment(horizontal='center', vertical='center')
-BORDER = Border(left=Side(style='thin'), right=Side(style='thin'),
-                top=Side(style='thin'), bottom=Side(style='thin'))
-
-STYLE_HEADER = NamedStyle(name='header')
-STYLE_HEADER.font = FONT
-STYLE_HEADER.fill = FILL
-STYLE_HEADER.border = BORDER
-STYLE_HEADER.alignment = ALIGNMENT
-
-STYLE_CELL = NamedStyle(name='cell')
-STYLE_CELL.border = BORDER
-STYLE_CELL.alignment = ALIGNMENT
+# имена стилей модуля styles, доступные как атрибуты utils
+STYLE_NAMES = ('FILL', 'FONT', 'ALIGNMENT', 'BORDER', 'STYLE_HEADER',
+               'STYLE_CELL', 'STYLE_ERROR', 'STYLE_SUCCESS', 'SheetInfoStyles')
 
-STYLE_ERROR = NamedStyle(name='error')
-STYLE_ERROR.border = BORDER
-STYLE_ERROR.alignment = ALIGNMENT
-STYLE_ERROR.fill = PatternFill(start_color='CD5C5C',
-                               end_color='CD5C5C',
-                               fill_type='solid')
 
-STYLE_SUCCESS = NamedStyle(name='success')
-STYLE_SUCCESS.border = BORDER
-STYLE_SUCCESS.alignment = ALIGNMENT
-STYLE_SUCCESS.fill = PatternFill(start_color='90EE90',
-                                 end_color='90EE90',
-                                 fill_type='solid')
-
-
-class SheetInfoStyles(object):
+def __getattr__(name: str):
     """
-    Класс содержит стили оформления листа журнала операций для класса SheetInfo
+    Стили оформления (см. styles) загружаются вместе с openpyxl при первом
+    обращении к ним, а не при импорте utils.
     """
-    main_cell = NamedStyle(name='main_cell')
-    main_cell.border = BORDER
-    main_cell.alignment = ALIGNMENT
-    main_cell.font = Font(b=True, size=14)
-
-    grid_pt_font = Font(b=True, size=11)
-
-    errors = STYLE_ERROR
-    success = STYLE_SUCCESS
-    cell = STYLE_CELL
-    header = STYLE_HEADER
+    if name in STYLE_NAMES:
+        from PlaxisRectangleGrid import styles
+        return getattr(styles, name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
 
 def markup_excel(sheet,
                  coord_x: np.ndarray,
                  coord_z: np.ndarray,
-                 style=STYLE_HEADER) -> NoReturn:
+                 style=None) -> NoReturn:
     """
     Создание и оформление таблицы в excel файле.
 
     :param sheet: лист в excel файле
     :param coord_x: названия столбцов шапки таблицы ([-10, -5, 0, 5, ....])
     :param coord_z: названия строк таблицы ([0, -5, -10, -15, ....])
-    :param style: стиль оформления ячеек openpyxl.styles.NamedStyle
+    :param style: стиль оформления ячеек openpyxl.styles.NamedStyle, None -
+    STYLE_HEADER
     :return: NoReturn
     """
+    if style is None:
+        from PlaxisRectangleGrid.styles import STYLE_HEADER as style
 
     # Оформление ячейки 1, 1
     sheet.cell(row=1, column=1, value='z|x')
@@ -102,7 +77,7 @@ def write_excel(sheet,
                 row: int,
                 column: int,
                 value: Union[float, int, str],
-                style=STYLE_CELL) -> NoReturn:
+                style=None) -> NoReturn:
     """
     Функция записи значения в ячейку excel таблицы. Запись значения
     типов int, float производится в десятичном формате '0.000000';
@@ -112,9 +87,12 @@ def write_excel(sheet,
     :param row: номер ячейки для записи
     :param column: номер столбца для записи
     :param value: записываемое значение
-    :param style: стиль оформления ячеек openpyxl.styles.NamedStyle
+    :param style: стиль оформления ячеек openpyxl.styles.NamedStyle, None -
+    STYLE_CELL
     :return: NoReturn
     """
+    if style is None:
+        from PlaxisRectangleGrid.styles import STYLE_CELL as style
 
     cell = sheet.cell(row=row, column=column)
     cell.value = value
@@ -125,32 +103,469 @@ def write_excel(sheet,
         cell.number_format = '0.000000'  # десятичный формат
 
 
+def write_only_cell(sheet,
+                    value: Union[float, int, str],
+                    style=None,
+                    number_format: str = None):
+    """
+    Создание ячейки для листа excel файла в режиме write_only. Формат числа
+    по умолчанию как в функции write_excel: для int, float - десятичный
+    '0.000000'; для str - текстовый.
+
+    :param sheet: лист в excel файле в режиме write_only
+    :param value: записываемое значение
+    :param style: стиль оформления ячеек openpyxl.styles.NamedStyle, None -
+    STYLE_CELL
+    :param number_format: формат числа (None - по типу значения)
+    :return: ячейка openpyxl.cell.WriteOnlyCell
+    """
+    from openpyxl.cell import WriteOnlyCell
+    if style is None:
+        from PlaxisRectangleGrid.styles import STYLE_CELL as style
+
+    cell = WriteOnlyCell(sheet, value=value)
+    cell.style = style
+    if number_format is None:
+        number_format = '@' if isinstance(value, str) else '0.000000'
+    cell.number_format = number_format
+    return cell
+
+
+def stream_excel(sheet,
+                 coord_x: np.ndarray,
+                 coord_z: np.ndarray,
+                 values: Iterable[Iterable[Union[float, None]]],
+                 style=None) -> NoReturn:
+    """
+    Создание, оформление и заполнение таблицы в листе excel файла в режиме
+    write_only (Workbook(write_only=True)). Строки записываются по порядку,
+    без хранения ячеек всего листа в памяти. Оформление как у функций
+    markup_excel и write_excel.
+
+    :param sheet: лист в excel файле в режиме write_only
+    :param coord_x: названия столбцов шапки таблицы ([-10, -5, 0, 5, ....])
+    :param coord_z: названия строк таблицы ([0, -5, -10, -15, ....])
+    :param values: строки значений таблицы ([[u_y11, u_y12, ...], ...]),
+    значение None записывается как 'NULL' стилем STYLE_ERROR
+    :param style: стиль оформления шапки openpyxl.styles.NamedStyle, None -
+    STYLE_HEADER
+    :return: NoReturn
+    """
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.utils import get_column_letter
+    from PlaxisRectangleGrid.styles import STYLE_CELL, STYLE_ERROR
+    if style is None:
+        from PlaxisRectangleGrid.styles import STYLE_HEADER as style
+
+    # ширина столбцов задается до записи строк
+    sheet.column_dimensions['A'].width = 10
+    for idx in range(2, len(coord_x) + 2):
+        sheet.column_dimensions[get_column_letter(idx)].width = 10
+
+    # Оформление шапки столбцов
+    header = [WriteOnlyCell(sheet, value='z|x')]
+    header += [WriteOnlyCell(sheet, value=x) for x in coord_x]
+    for cell in header:
+        cell.style = style
+    sheet.row_dimensions[1].height = 15
+    sheet.append(header)
+
+    # Оформление шапки строк и запись значений
+    for idx, (z, row_values) in enumerate(zip(coord_z, values), 2):
+        row = WriteOnlyCell(sheet, value=z)
+        row.style = style
+        sheet.row_dimensions[idx].height = 15
+
+        cells = [row]
+        for value in row_values:
+            if value is None:
+                cells.append(write_only_cell(sheet, 'NULL', STYLE_ERROR))
+            else:
+                cells.append(write_only_cell(sheet, value, STYLE_CELL))
+        sheet.append(cells)
+
+
+def cache_dirpath(filepath: str,
+                  cols: Dict[str, tuple],
+                  cache_dir: str,
+                  dedup: tuple = None) -> str:
+    """
+    Создает путь до папки кэша предобработанных данных файла. Название папки
+    состоит из хэша абсолютного пути до файла и хэша его размера, времени
+    изменения, выбранных столбцов cols и параметров удаления дубликатов
+    dedup, поэтому при изменении файла или параметров путь меняется.
+
+    :param filepath: название файла, (например, "100x60x30.xls")
+    :param cols: словарь с номера столбцов, вида {название_листа: номера_стлб}
+    :param cache_dir: путь до папки кэша, (например, "data/.cache")
+    :param dedup: параметры удаления дубликатов (tolerance, policy), см.
+    dedup_points
+    :return: f'{cache_dir}/{хэш_пути}_{хэш_версии}'
+    """
+    path = os.path.abspath(filepath)
+    stat = os.stat(path)
+    version = repr((stat.st_size, stat.st_mtime_ns, sorted(cols.items()),
+                    dedup))
+
+    path_hash = hashlib.sha1(path.encode()).hexdigest()[:16]
+    version_hash = hashlib.sha1(version.encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, f'{path_hash}_{version_hash}')
+
+
+def load_cache(cache_path: str) -> Union[Dict[str, np.ndarray], None]:
+    """
+    Загружает предобработанные данные из папки кэша. Массивы открываются
+    как отображение файлов .npy в память (только чтение). Поврежденный кэш
+    (нет или обрезан файл .npy, например, после прерванной очистки)
+    удаляется и считается отсутствующим.
+
+    :param cache_path: путь до папки кэша файла (см. cache_dirpath)
+    :return: словарь вида {название_листа: массив_данных} или None, если
+    кэша нет
+    """
+    sheets_path = os.path.join(cache_path, 'sheets.json')
+    if not os.path.isfile(sheets_path):
+        return None
+
+    try:
+        with open(sheets_path, encoding='utf-8') as file:
+            sheets = json.load(file)
+        return {key: np.load(os.path.join(cache_path, f'{idx}.npy'),
+                             mmap_mode='r')
+                for idx, key in enumerate(sheets)}
+    except (OSError, ValueError):
+        # папка освобождается для повторной записи кэша (см. save_cache)
+        shutil.rmtree(cache_path, ignore_errors=True)
+        return None
+
+
+def save_cache(cache_path: str, data: Dict[str, np.ndarray]) -> NoReturn:
+    """
+    Сохраняет предобработанные данные в папку кэша: массив каждого листа в
+    файл .npy, порядок и названия листов в sheets.json. Устаревшие папки
+    кэша этого же файла удаляются. Папка сначала записывается под временным
+    именем, поэтому одновременная запись из нескольких процессов безопасна.
+
+    :param cache_path: путь до папки кэша файла (см. cache_dirpath)
+    :param data: словарь вида {название_листа: массив_данных}
+    :return: NoReturn
+    """
+    cache_dir, name = os.path.split(cache_path)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    # удаляем кэш предыдущих версий файла
+    path_hash = name.split('_')[0]
+    for old_name in os.listdir(cache_dir):
+        if old_name.startswith(path_hash + '_') and old_name != name:
+            shutil.rmtree(os.path.join(cache_dir, old_name),
+                          ignore_errors=True)
+
+    tmp_path = tempfile.mkdtemp(prefix='.tmp_', dir=cache_dir)
+    for idx, value in enumerate(data.values()):
+        np.save(os.path.join(tmp_path, f'{idx}.npy'), value)
+    with open(os.path.join(tmp_path, 'sheets.json'), 'w',
+              encoding='utf-8') as file:
+        json.dump(list(data), file, ensure_ascii=False)
+
+    try:
+        os.rename(tmp_path, cache_path)
+    except OSError:
+        # кэш уже записан другим процессом
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+# версия формата весов в кэше: меняется при изменении состава массивов
+# InterpolationWeights.to_arrays, веса старого формата не загружаются
+WEIGHTS_FORMAT = 4
+
+
+def weights_key(points: np.ndarray,
+                length: float,
+                depth: float,
+                step_x: float,
+                step_z: float,
+                eps: Iterable[float],
+                engine: str = 'quadrant') -> str:
+    """
+    Создает ключ кэша весов интерполяции: хэш координат X, Z точек (после
+    удаления дубликатов) и параметров сетки, поиска и метода расчета, от
+    которых зависят веса.
+
+    :param points: массив точек [[x1, z1, u_y1], [x2, z2, u_y2] ...]
+    :param length: длина сетки
+    :param depth: глубина сетки
+    :param step_x: шаг сетки по X
+    :param step_z: шаг сетки по Z (значение STEP_Z для глубины)
+    :param eps: окрестности поиска (eps_x, eps_z, eps_match, eps_fallback)
+    :param engine: метод расчета весов (см. classes.ENGINES)
+    :return: хэш в виде строки
+    """
+    digest = hashlib.sha1(np.ascontiguousarray(points[:, :2],
+                                               dtype=float).tobytes())
+    params = (WEIGHTS_FORMAT, len(points), float(length), float(depth),
+              float(step_x), float(step_z),
+              tuple(float(value) for value in eps), engine)
+    digest.update(repr(params).encode())
+    return digest.hexdigest()
+
+
+def load_weights(cache_dir: str,
+                 key: str) -> Union[Dict[str, np.ndarray], None]:
+    """
+    Загружает массивы весов интерполяции из кэша весов (папка 'weights'
+    внутри cache_dir). Время изменения файла обновляется - по нему
+    определяется давность использования при очистке кэша.
+
+    :param cache_dir: путь до папки кэша, (например, "data/.cache")
+    :param key: ключ весов (см. weights_key)
+    :return: словарь {название_массива: массив} или None, если весов нет
+    """
+    path = os.path.join(cache_dir, 'weights', f'{key}.npz')
+    try:
+        with np.load(path) as file:
+            arrays = {name: file[name] for name in file.files}
+        os.utime(path)
+    except OSError:
+        return None
+    return arrays
+
+
+def save_weights(cache_dir: str,
+                 key: str,
+                 arrays: Dict[str, np.ndarray],
+                 max_size: int = None) -> NoReturn:
+    """
+    Сохраняет массивы весов интерполяции в кэш весов (папка 'weights'
+    внутри cache_dir). Если размер кэша превышает max_size, удаляются
+    давно не использованные файлы (LRU по времени изменения файла).
+    Файл сначала записывается под временным именем, поэтому одновременная
+    запись из нескольких процессов безопасна.
+
+    :param cache_dir: путь до папки кэша, (например, "data/.cache")
+    :param key: ключ весов (см. weights_key)
+    :param arrays: словарь {название_массива: массив}
+    :param max_size: наибольший размер кэша весов в байтах, None - без
+    ограничения
+    :return: NoReturn
+    """
+    weights_dir = os.path.join(cache_dir, 'weights')
+    os.makedirs(weights_dir, exist_ok=True)
+    path = os.path.join(weights_dir, f'{key}.npz')
+
+    if not os.path.isfile(path):
+        fd, tmp_path = tempfile.mkstemp(prefix='.tmp_', suffix='.npz',
+                                        dir=weights_dir)
+        with os.fdopen(fd, 'wb') as file:
+            np.savez(file, **arrays)
+        os.replace(tmp_path, path)
+    else:
+        os.utime(path)
+
+    if max_size is None:
+        return
+
+    # удаляем давно не использованные файлы, пока кэш больше max_size
+    files = []
+    for entry in os.scandir(weights_dir):
+        if entry.name.endswith('.npz') and not entry.name.startswith('.'):
+            stat = entry.stat()
+            files.append((stat.st_mtime_ns, stat.st_size, entry.path))
+    files.sort()
+
+    size = sum(file_size for _, file_size, _ in files)
+    for _, file_size, file_path in files[:-1]:
+        if size <= max_size:
+            break
+        try:
+            os.remove(file_path)
+        except OSError:
+            continue  # файл уже удален другим процессом
+        size -= file_size
+
+
+# расширения файлов, которые читаются потоково (read_columns), остальные
+# форматы (например, xls) читаются pandas
+STREAM_EXTENSIONS = ('.xlsx', '.xlsm')
+
+READ_CHUNK = 65536  # количество строк, переносимых в буфер numpy за раз
+
+
+def read_columns(filepath: str,
+                 cols: Dict[str, tuple]) -> Dict[str, np.ndarray]:
+    """
+    Потоковое чтение excel файла (openpyxl в режиме read_only): из каждого
+    листа читаются только столбцы cols[название_листа] (без строки шапки)
+    сразу в массив numpy, листы целиком в памяти не хранятся. Пустые листы
+    (без строк после шапки) пропускаются до чтения строк. Результат тот же,
+    что и у pd.read_excel с выбором столбцов.
+
+    :param filepath: название файла, (например, "100x60x30.xlsx")
+    :param cols: словарь с номера столбцов, вида {название_листа: номера_стлб}
+    :return: словарь вида {название_листа: массив [[X, Z, u_Y], ...]}
+    """
+    from openpyxl import load_workbook
+
+    xls = load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        data = {}
+        for sheet in xls.worksheets:
+            if sheet.max_row is not None and sheet.max_row < 2:
+                continue  # только шапка или пустой лист
+            key = sheet.title.lower()
+            columns = cols[key]
+            first = min(columns)
+
+            # буфер растет вдвое при заполнении, начальный размер - по
+            # размерам листа из файла
+            buffer = np.empty((max((sheet.max_row or 1) - 1, 1),
+                               len(columns)))
+            size = 0
+            rows = sheet.iter_rows(min_row=2, min_col=first + 1,
+                                   max_col=max(columns) + 1, values_only=True)
+            while True:
+                chunk = [[row[col - first] for col in columns]
+                         for row in itertools.islice(rows, READ_CHUNK)]
+                if not chunk:
+                    break
+                if size + len(chunk) > len(buffer):
+                    buffer = np.resize(buffer, (max(2 * len(buffer),
+                                                    size + len(chunk)),
+                                                len(columns)))
+                buffer[size:size + len(chunk)] = np.array(chunk, dtype=float)
+                size += len(chunk)
+
+            # пустые строки в конце листа не считаются, как в pandas
+            values = buffer[:size]
+            filled = np.flatnonzero(~np.all(np.isnan(values), axis=1))
+            values = values[:filled[-1] + 1] if len(filled) else values[:0]
+            if len(values):
+                data[key] = values
+    finally:
+        xls.close()
+    return data
+
+
+# правила выбора перемещения точек с совпадающими координатами (см.
+# dedup_points): среднее, первое по порядку в файле, наибольшее
+DEDUP_MEAN = 'mean'
+DEDUP_FIRST = 'first'
+DEDUP_MAX = 'max'
+DEDUP_POLICIES = (DEDUP_MEAN, DEDUP_FIRST, DEDUP_MAX)
+
+
+def dedup_points(points: np.ndarray,
+                 tolerance: float = 0.,
+                 policy: str = DEDUP_MEAN) -> np.ndarray:
+    """
+    Сортирует точки по X, Z и объединяет точки с совпадающими координатами.
+    Координаты округляются до ячеек размером tolerance (ключи ячеек),
+    точки сортируются по ключам (np.lexsort) и точки одной ячейки
+    объединяются в одну: координаты X, Z - первой по порядку в файле точки
+    ячейки, перемещение - по правилу policy. Точки, отличающиеся больше чем
+    на tolerance, не объединяются; близкие точки по разные стороны границы
+    ячейки остаются разными. При tolerance = 0 объединяются только точки с
+    точно совпадающими координатами.
+    Совпадающие точки дают вырожденные треугольники (c = 0 в
+    calc_func.intersect), поэтому удаляются до расчета.
+
+    :param points: массив точек [[x1, z1, u_y1], [x2, z2, u_y2] ...]
+    :param tolerance: размер ячейки округления координат, (например, 1e-9)
+    :param policy: правило выбора перемещения точек ячейки 'mean', 'first',
+    'max' (см. DEDUP_POLICIES)
+    :return: отсортированный массив точек с различными координатами X, Z
+    """
+    if policy not in DEDUP_POLICIES:
+        raise ValueError(f'policy must be one of {DEDUP_POLICIES}, '
+                         f'got {policy!r}')
+    if not tolerance >= 0:
+        raise ValueError(f'tolerance must be >= 0, got {tolerance}')
+
+    points = np.asarray(points, dtype=float)
+    if len(points) < 2:
+        return points.copy()
+
+    keys = np.rint(points[:, :2] / tolerance) if tolerance else points[:, :2]
+    # сортировка устойчивая: внутри ячейки точки идут по порядку в файле
+    order = np.lexsort((keys[:, 1], keys[:, 0]))
+    keys = keys[order]
+    start = np.empty(len(order), dtype=bool)
+    start[0] = True
+    np.any(keys[1:] != keys[:-1], axis=1, out=start[1:])
+    starts = np.flatnonzero(start)
+
+    result = points[order[starts]]
+    if policy != DEDUP_FIRST and len(starts) < len(order):
+        values = points[order, 2]
+        if policy == DEDUP_MEAN:
+            # среднее отклонений от первого значения: для одинаковых
+            # значений (повторы узлов) результат точно равен значению
+            counts = np.diff(np.append(starts, len(order)))
+            deviation = values - np.repeat(values[starts], counts)
+            result[:, 2] += np.add.reduceat(deviation, starts) / counts
+        else:
+            result[:, 2] = np.maximum.reduceat(values, starts)
+    if tolerance:
+        # порядок по координатам точек, а не ключам ячеек (как np.unique)
+        result = result[np.lexsort((result[:, 1], result[:, 0]))]
+    return result
+
+
 def preprocessing_data(filepath: str,
-                       cols: Dict[str, tuple]
+                       cols: Dict[str, tuple],
+                       cache_dir: str = None,
+                       tolerance: float = 0.,
+                       policy: str = DEDUP_MEAN
                        ) -> Dict[str, np.ndarray]:
     """
     Функция для предобработки данных из excel файла. Извлекает название листов
-    и данные из заданных столбцов. Удаляет дубликаты.
+    и данные из заданных столбцов. Удаляет дубликаты (см. dedup_points).
+    Файлы xlsx читаются потоково только по заданным столбцам (см.
+    read_columns), остальные форматы - pandas.
+    Если задана папка кэша, результат сохраняется в ней в бинарном виде и
+    при повторном вызове для неизменного файла загружается без чтения
+    excel файла.
 
     :param filepath: название файла, (например, "100x60x30.xls")
     :param cols: словарь с номера столбцов, вида {название_листа: номера_стлб}
     (например, {'x': (3, 5, 7), 'y': (4, 5, 6)})
+    :param cache_dir: путь до папки кэша, (например, "data/.cache"),
+    None - без кэша
+    :param tolerance: размер ячейки объединения близких точек, 0 - только
+    совпадающие точки
+    :param policy: правило выбора перемещения объединяемых точек 'mean',
+    'first', 'max'
     :return: словарь вида {название_листа: массив_данных}
     """
-
-    load_file = pd.read_excel(filepath, sheet_name=None)  # загрузка файла
-    # создаем словарь из непустых листов. Ключ-название листа, значение-массив
-    # данных
-    data = {key.lower(): value for key, value in load_file.items()
-            if len(load_file[key])}
-
-    for key, value in data.items():
-        # создаем массив данных из заданных столбцов
-        points = value.iloc[:, [*cols[key]]]
-        points.columns = ['X', 'Z', 'uY']
-        points = points.to_numpy()
-
-        data[key] = np.unique(points, axis=0)  # сортируем и удаляем дубликаты
+    if cache_dir is not None:
+        cache_path = cache_dirpath(filepath, cols, cache_dir,
+                                   (tolerance, policy))
+        data = load_cache(cache_path)
+        if data is not None:
+            return data
+
+    if os.path.splitext(filepath)[1].lower() in STREAM_EXTENSIONS:
+        data = read_columns(filepath, cols)
+    else:
+        import pandas as pd
+
+        load_file = pd.read_excel(filepath, sheet_name=None)  # загрузка файла
+        # создаем словарь из непустых листов. Ключ-название листа,
+        # значение-массив данных
+        data = {key.lower(): value for key, value in load_file.items()
+                if len(load_file[key])}
+
+        for key, value in data.items():
+            # создаем массив данных из заданных столбцов
+            points = value.iloc[:, [*cols[key]]]
+            points.columns = ['X', 'Z', 'uY']
+            data[key] = points.to_numpy()
+
+    for key, points in data.items():
+        # сортируем и удаляем дубликаты
+        data[key] = dedup_points(points, tolerance, policy)
+
+    if cache_dir is not None:
+        save_cache(cache_path, data)
     return data
 
 
@@ -158,16 +573,26 @@ def parse_filename(filename: str) -> tuple:
     return tuple(map(lambda x: int(x), re.findall("\d+", filename)))
 
 
-def output_filepath(filename: str, postfix: str) -> str:
+def output_filepath(filename: str,
+                    postfix: str,
+                    extension: str = None,
+                    out_dir: str = None) -> str:
     """
     Создает название для выходного файла.
 
     :param filename: название файла, (например, "100x60x30.xls")
     :param postfix: постфикс, (например, "_CALC_")
+    :param extension: расширение выходного файла (None - как у входного),
+    (например, "npz")
+    :param out_dir: папка для выходного файла (None - папка входного файла)
     :return: "100x60x30_CALC_.xls"
     """
     path_split = filename.rsplit('.', maxsplit=1)
-    return path_split[0] + postfix + '.' + path_split[1]
+    extension = path_split[1] if extension is None else extension
+    out_file = path_split[0] + postfix + '.' + extension
+    if out_dir is not None:
+        out_file = os.path.join(out_dir, os.path.basename(out_file))
+    return out_file
 
 
 def filepath_txt(path: str) -> str:
@@ -196,3 +621,26 @@ def log_to_string(filepath: str, sheet_name: str, fields: dict) -> str:
     string_3 = "".join([f'{field}: {val}\t' for field, val in fields.items()])
     string_4 = '\n\n'
     return "\n".join([string_1, string_2, string_3, string_4])
+
+
+def write_run_log(filepath: str,
+                  records: Iterable[dict],
+                  settings: dict = None) -> NoReturn:
+    """
+    Дописывает записи в лог JSON Lines (по строке JSON на запись) одним
+    вызовом write - записи одного файла не перемешиваются с другими.
+
+    :param filepath: путь до файла лога, (например, "data/log.jsonl")
+    :param records: записи лога (словари)
+    :param settings: параметры расчета, добавляются в каждую запись
+    :return: NoReturn
+    """
+    lines = []
+    for record in records:
+        if settings is not None:
+            record = {**record, 'settings': settings}
+        lines.append(json.dumps(record, ensure_ascii=False, default=str) +
+                     '\n')
+    if lines:
+        with open(filepath, 'a', encoding='utf-8') as file:
+            file.write(''.join(lines))
@@ -0,0 +1,331 @@
+#!/usr/bin/env python
+from typing import Callable, Dict, List, Sequence
+
+import argparse
+import functools
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+from openpyxl import Workbook
+
+from PlaxisRectangleGrid import (classes, delaunay, processing, profiling,
+                                 synthetic, utils)
+from PlaxisRectangleGrid.settings import (COLUMNS_COORD, DEDUP_POLICY,
+                                          DEDUP_TOLERANCE, STEP_Z)
+
+"""
+Замеры производительности расчета на моделях из папки data, на
+увеличенных копиях моделей и на синтетических сетках (см.
+PlaxisRectangleGrid.synthetic):
+
+    python benchmark.py -o bench.json
+    python benchmark.py --models 20x20x20 --scales 1 4 16 --repeat 5
+    python benchmark.py --models --synthetic 100000 1000000 --repeat 1
+
+Для каждой модели и масштаба выводится время этапов (preprocessing_data,
+создание сетки, поиск ближайших точек, интерполяция, запись листов excel,
+запись листов журнала, сохранение файла), пиковая память и количество узлов
+в секунду, а также время запуска интерпретатора с импортом пакета без и с
+библиотеками чтения и записи excel (см. IMPORTS) и время удаления
+дубликатов синтетических листов (utils.dedup_points и np.unique).
+Результат - JSON, удобный для сравнения между версиями.
+"""
+
+MODELS = ('20x20x20', '20x60x5', '60x100x5', '60x100x10', '60x100x15',
+          '60x100x20')
+SCALES = (1, 4)
+SYNTHETIC = (100000,)  # количество строк листов синтетических сеток
+REPEAT = 3
+
+# замеры времени импорта: {название: код}, каждый - в новом интерпретаторе
+IMPORTS = {
+    'python': 'pass',
+    'numpy': 'import numpy',
+    'package': 'import PlaxisRectangleGrid.processing',
+    'package_excel': 'import PlaxisRectangleGrid.processing, '
+                     'PlaxisRectangleGrid.styles, pandas, openpyxl',
+}
+
+# этапы расчета в порядке выполнения (для синтетических сеток
+# preprocessing_data - только удаление дубликатов)
+STAGES = ('preprocessing_data', 'create_grid', 'nearby_search',
+          'interpolation', 'write_sheets', 'write_info_sheets', 'save')
+
+
+def scale_points(points: np.ndarray, scale: int) -> np.ndarray:
+    """
+    Увеличивает модель в scale раз по X: копии точек листа ставятся рядом
+    друг с другом, глубина модели (ключ STEP_Z) не меняется.
+
+    :param points: массив точек вида [[X, Z, u_Y], ... ...]
+    :param scale: количество копий
+    :return: отсортированный массив точек без дубликатов
+    """
+    if scale <= 1:
+        return points
+    width = points[:, 0].max() - points[:, 0].min()
+    copies = []
+    for i in range(scale):
+        copy = points.copy()
+        copy[:, 0] += (i - (scale - 1) / 2) * width
+        copies.append(copy)
+    return np.unique(np.concatenate(copies), axis=0)
+
+
+def dedup_sheets(sheets: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Предобработка синтетических листов: сортировка и удаление дубликатов,
+    как в utils.preprocessing_data.
+    """
+    return {key: utils.dedup_points(points, DEDUP_TOLERANCE, DEDUP_POLICY)
+            for key, points in sheets.items()}
+
+
+def dedup_times(sheets: Dict[str, np.ndarray],
+                repeat: int) -> Dict[str, float]:
+    """
+    Время удаления дубликатов листов: utils.dedup_points с параметрами
+    settings и np.unique(points, axis=0) (наименьшее из repeat прогонов).
+
+    :param sheets: словарь вида {название_листа: массив_точек}
+    :param repeat: количество прогонов
+    :return: словарь {'dedup_points': время, 'np_unique': время}
+    """
+    funcs = {'dedup_points': dedup_sheets,
+             'np_unique': lambda data: {key: np.unique(points, axis=0)
+                                        for key, points in data.items()}}
+    times = {}
+    for name, func in funcs.items():
+        runs = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func(sheets)
+            runs.append(time.perf_counter() - start)
+        times[name] = min(runs)
+    return times
+
+
+def run_pipeline(load: Callable[[], Dict[str, np.ndarray]],
+                 scale: int,
+                 out_file: str,
+                 timer: profiling.StageTimer,
+                 engine: str = classes.ENGINE_QUADRANT) -> Dict[str, int]:
+    """
+    Расчет одного файла по этапам, как в processing.process_files при
+    последовательном расчете с листами журнала.
+
+    :param load: функция предобработки, возвращающая словарь вида
+    {название_листа: массив_данных}
+    :param scale: масштаб модели (см. scale_points)
+    :param out_file: путь до выходного файла
+    :param timer: таймер этапов
+    :param engine: метод расчета весов (см. classes.ENGINES)
+    :return: словарь с количеством листов, точек и узлов сетки
+    """
+    with timer('preprocessing_data'):
+        data = load()
+    data = {key: scale_points(points, scale) for key, points in data.items()}
+
+    grids = {}
+    for key, points in data.items():
+        with timer('create_grid'):
+            grid = processing.create_grid(points, STEP_Z)
+        eps_x, eps_z = grid.step_x, -grid.step_z
+
+        # поиск ближайших точек (для метода delaunay - триангуляция и поиск
+        # треугольников узлов) выполняется и внутри расчета весов, его время
+        # вычитается из времени интерполяции
+        if engine == classes.ENGINE_QUADRANT:
+            with timer('nearby_search') as search:
+                grid.nearby_idx(points, eps_x, eps_z)
+            with timer('interpolation', subtract=search):
+                weights = grid.interpolation_weights(points, eps_x, eps_z)
+                grid.apply_weights(weights, points, classes.LOG_FULL)
+        else:
+            with timer('nearby_search') as search:
+                xz = np.unique(points[:, :2], axis=0)
+                triangles, _ = delaunay.triangulate(xz)
+                delaunay.locate(xz, triangles, grid.nodes)
+            with timer('interpolation', subtract=search):
+                weights = grid.delaunay_weights(points)
+                grid.apply_weights(weights, points, classes.LOG_FULL)
+        grids[key] = grid
+
+    xls = Workbook()
+    for key, grid in grids.items():
+        with timer('write_sheets'):
+            processing.write_sheet(xls, key, grid, info_sheets=False)
+        with timer('write_info_sheets'):
+            processing.write_info_sheet(xls, key, grid)
+    with timer('save'):
+        xls.remove(xls['Sheet'])
+        xls.save(out_file)
+
+    return {'sheets': len(data),
+            'points': int(sum(len(points) for points in data.values())),
+            'nodes': int(sum(len(grid.coords) for grid in grids.values()))}
+
+
+def bench_model(model: str,
+                load: Callable[[], Dict[str, np.ndarray]],
+                scale: int,
+                repeat: int,
+                out_dir: str,
+                engine: str = classes.ENGINE_QUADRANT) -> dict:
+    """
+    Замер одной модели: repeat прогонов для времени этапов (берется
+    наименьшее время каждого этапа) и отдельный прогон под tracemalloc для
+    пиковой памяти (tracemalloc замедляет расчет).
+
+    :param model: название модели, (например, "20x20x20")
+    :param load: функция предобработки (см. run_pipeline)
+    :param scale: масштаб модели (см. scale_points)
+    :param repeat: количество прогонов
+    :param out_dir: папка для выходных файлов
+    :param engine: метод расчета весов (см. classes.ENGINES)
+    :return: словарь с результатами замера
+    """
+    out_file = os.path.join(out_dir, f'{model}_BENCH_{scale}_.xlsx')
+    runs = []
+    for _ in range(repeat):
+        timer = profiling.StageTimer(timings=dict.fromkeys(STAGES, 0.))
+        sizes = run_pipeline(load, scale, out_file, timer, engine)
+        runs.append(timer.timings)
+    timings = {stage: min(run[stage] for run in runs) for stage in STAGES}
+    total = min(sum(run.values()) for run in runs)
+
+    tracemalloc.start()
+    run_pipeline(load, scale, out_file, profiling.StageTimer(False), engine)
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    calc = (timings['create_grid'] + timings['nearby_search']
+            + timings['interpolation'])
+    return {
+        'model': model,
+        'engine': engine,
+        'scale': scale,
+        **sizes,
+        'timings': timings,
+        'total': total,
+        'peak_memory': peak_memory,
+        'nodes_per_s': sizes['nodes'] / calc if calc else None,
+        'nodes_per_s_total': sizes['nodes'] / total if total else None,
+    }
+
+
+def import_times(repeat: int) -> Dict[str, float]:
+    """
+    Время запуска интерпретатора с импортами IMPORTS (наименьшее из repeat
+    запусков). Разница 'package' и 'package_excel' - время, которое
+    экономит расчет без чтения и записи excel файлов.
+
+    :param repeat: количество запусков
+    :return: словарь {название: время в секундах}
+    """
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    times = {}
+    for name, code in IMPORTS.items():
+        runs = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, '-c', code], cwd=cwd, check=True)
+            runs.append(time.perf_counter() - start)
+        times[name] = min(runs)
+    return times
+
+
+def parse_args(argv: Sequence[str] = None) -> argparse.Namespace:
+    """
+    Разбирает параметры командной строки.
+    """
+    parser = argparse.ArgumentParser(
+        description='Замеры производительности расчета PlaxisRectangleGrid.')
+    parser.add_argument('--data', default='./data',
+                        help='папка с моделями (по умолчанию %(default)s)')
+    parser.add_argument('--models', nargs='*', default=MODELS,
+                        help='названия моделей без расширения')
+    parser.add_argument('--scales', nargs='+', type=int, default=SCALES,
+                        help='масштабы моделей по X (1 - исходная модель)')
+    parser.add_argument('--synthetic', nargs='*', type=int,
+                        default=SYNTHETIC, metavar='POINTS',
+                        help='количество строк листов синтетических сеток')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='начальное значение генератора синтетических '
+                             'сеток (по умолчанию %(default)s)')
+    parser.add_argument('--engines', nargs='+', choices=classes.ENGINES,
+                        default=(classes.ENGINE_QUADRANT,),
+                        help='методы расчета весов (по умолчанию '
+                             '%(default)s)')
+    parser.add_argument('--repeat', type=int, default=REPEAT,
+                        help='количество прогонов (по умолчанию '
+                             '%(default)s)')
+    parser.add_argument('-o', '--output', default=None,
+                        help='файл JSON с результатами (по умолчанию - '
+                             'stdout)')
+    args = parser.parse_args(argv)
+    if args.repeat < 1 or min(args.scales) < 1:
+        parser.error('--repeat and --scales must be >= 1')
+    return args
+
+
+def main(argv: Sequence[str] = None) -> int:
+    args = parse_args(argv)
+
+    # модели: {название: (функция предобработки, масштабы)}
+    models = {}
+    for model in args.models:
+        filepath = os.path.join(args.data, model + '.xlsx')
+        models[model] = (functools.partial(utils.preprocessing_data,
+                                           filepath, COLUMNS_COORD,
+                                           tolerance=DEDUP_TOLERANCE,
+                                           policy=DEDUP_POLICY),
+                         args.scales)
+    dedup = {}  # время удаления дубликатов синтетических листов
+    for n_points in args.synthetic:
+        sheets = synthetic.mesh_sheets(n_points, seed=args.seed)
+        models[f'synthetic_{n_points}'] = (
+            functools.partial(dedup_sheets, sheets), (1,))
+        dedup[f'synthetic_{n_points}'] = dedup_times(sheets, args.repeat)
+
+    results: List[dict] = []
+    with tempfile.TemporaryDirectory() as out_dir:
+        for model, (load, scales) in models.items():
+            for scale, engine in itertools.product(scales, args.engines):
+                result = bench_model(model, load, scale, args.repeat,
+                                     out_dir, engine)
+                results.append(result)
+                print(f"{model} x{scale} {engine}: {result['points']} points, "
+                      f"{result['nodes']} nodes, {result['total']:.3f} s",
+                      file=sys.stderr)
+
+    report = {
+        'date': datetime.today().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'imports': import_times(args.repeat),
+        'dedup': dedup,
+        'results': results,
+    }
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
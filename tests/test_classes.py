@@ -0,0 +1,133 @@
+"""
+Проверки расчета листа RectangleGrid: журнала операций узлов, уровней
+журнала, повторного расчета узлов и интерполяции в произвольных точках.
+"""
+import os
+
+import numpy as np
+import pytest
+
+from PlaxisRectangleGrid import classes, processing, utils
+from PlaxisRectangleGrid.settings import COLUMNS_COORD, STEP_Z
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
+POINTS = utils.preprocessing_data(os.path.join(DATA, '60x100x5.xlsx'),
+                                  COLUMNS_COORD)['x']
+
+
+def test_journal_arrays(tmp_path):
+    """
+    Журнал операций, записанный в файл npz (journal_arrays, см.
+    processing.write_journal) и восстановленный journal_from_arrays,
+    совпадает с журналом узлов сетки.
+    """
+    grid = processing.calc_sheet(POINTS, STEP_Z)
+    journal_file = processing.write_journal('model.xlsx', {'x': grid},
+                                            '_CALC_', 'npz', str(tmp_path))
+    with np.load(journal_file) as data:
+        arrays = {name.split('/', 1)[1]: data[name] for name in data.files
+                  if name.startswith('x/')}
+        assert list(data['commands']) == list(classes.JOURNAL_COMMANDS)
+    main_info, nodes = classes.journal_from_arrays(arrays)
+
+    assert main_info == grid.main_info
+    assert len(nodes) == len(grid.coords)
+    assert sum(len(node.logs) for node in nodes) == len(arrays['op_node']) > 0
+    for i, node in enumerate(nodes):
+        np.testing.assert_array_equal(node.coords[:2], grid.coords[i, :2])
+        logs = grid.node_logs(i)
+        assert [command for command, _ in node.logs] == [
+            command for command, _ in logs]
+        for (_, pts), (_, expected) in zip(node.logs, logs):
+            np.testing.assert_array_equal(pts,
+                                          np.reshape(expected, (-1, 3)))
+
+
+def test_log_levels():
+    """
+    Уровень журнала не меняет перемещения: LOG_OFF - без журнала и
+    счетчиков, LOG_COUNTS - только количество операций каждой команды,
+    LOG_FULL - журнал массивами с тем же количеством операций.
+    """
+    grids = {level: processing.calc_sheet(POINTS, STEP_Z, log_level=level)
+             for level in classes.LOG_LEVELS}
+    off = grids[classes.LOG_OFF]
+    counts = grids[classes.LOG_COUNTS]
+    full = grids[classes.LOG_FULL]
+    for grid in (counts, full):
+        np.testing.assert_array_equal(grid.coords, off.coords)
+        np.testing.assert_array_equal(grid.status, off.status)
+
+    assert off.journal is None and not off.log_counts
+    assert counts.journal is None
+    assert counts.log_counts == full.log_counts
+    commands = np.bincount(full.journal['op_command'],
+                           minlength=len(classes.JOURNAL_COMMANDS))
+    assert full.log_counts == dict(zip(classes.JOURNAL_COMMANDS,
+                                       commands.tolist()))
+    assert sum(full.log_counts.values()) > 0
+
+
+def test_degenerate_warning(capsys):
+    """
+    Узлы с вырожденными треугольниками - одна строка 'Warning' на лист с
+    их количеством, количество - и в branch_counts['warnings'].
+    """
+    grid = processing.create_grid(POINTS, STEP_Z)
+    weights = grid.interpolation_weights(POINTS, grid.step_x, -grid.step_z)
+    weights.journal['degenerate'] = np.zeros(len(grid.coords), dtype=bool)
+    weights.journal['degenerate'][:3] = True
+    capsys.readouterr()
+
+    grid.apply_weights(weights, POINTS, classes.LOG_OFF)
+    lines = capsys.readouterr().out.splitlines()
+    assert lines == ['Warning: 3 nodes in degenerate triangles']
+    assert grid.branch_counts['warnings'] == 3
+
+
+def test_fallback():
+    """
+    Повторный расчет с увеличенной окрестностью находит перемещения в
+    узлах, не найденных с малой окрестностью, не меняя найденные узлы;
+    множитель записывается в журнал, перед операциями повторного расчета -
+    операция 'fallback'.
+    """
+    grid = processing.create_grid(POINTS, STEP_Z)
+    eps_x, eps_z = grid.step_x / 4, -grid.step_z / 4
+    first = processing.calc_sheet(POINTS, STEP_Z, eps_x=eps_x, eps_z=eps_z)
+    second = processing.calc_sheet(POINTS, STEP_Z, eps_x=eps_x,
+                                   eps_z=eps_z, eps_fallback=16)
+
+    found = first.status == classes.NODE_SUCCESS
+    retried = ~found & (second.status == classes.NODE_SUCCESS)
+    assert first.main_info['Errors'] > second.main_info['Errors']
+    np.testing.assert_array_equal(second.coords[found], first.coords[found])
+
+    fallback = second.weights.journal['fallback']
+    assert (fallback[found] == 0).all()
+    assert (fallback[retried] > 1).all()
+    assert (fallback <= 16).all()
+    assert second.branch_counts['fallback'] == retried.sum()
+    for i in np.flatnonzero(retried):
+        commands = [command for command, _ in second.node_logs(i)]
+        assert 'fallback' in commands
+
+
+def test_points_interpolator():
+    """
+    Интерполяция в узлах сетки совпадает с расчетом листа, точки далеко от
+    модели - np.nan, веса подходят для любых значений в точках.
+    """
+    grid = processing.calc_sheet(POINTS, STEP_Z)
+    interpolator = classes.PointsInterpolator(POINTS, grid.step_x,
+                                              -grid.step_z)
+    np.testing.assert_allclose(interpolator(grid.nodes), grid.coords[:, 2],
+                               rtol=0, atol=1e-12, equal_nan=True)
+
+    xz = np.array([[1e6, 1e6], [grid.nodes[0, 0], grid.nodes[0, 1]]])
+    u_y = interpolator(xz)
+    assert np.isnan(u_y[0]) and not np.isnan(u_y[1])
+    np.testing.assert_allclose(interpolator(xz, 2 * POINTS[:, 2]), 2 * u_y,
+                               equal_nan=True)
+    with pytest.raises(ValueError):
+        interpolator(POINTS)
@@ -0,0 +1,83 @@
+"""
+Проверки триангуляции Делоне (delaunay.triangulate) и поиска
+треугольников узлов (delaunay.locate) на синтетическом облаке точек.
+"""
+import numpy as np
+import pytest
+
+from PlaxisRectangleGrid import delaunay, processing, synthetic
+from PlaxisRectangleGrid.settings import STEP_Z
+
+LENGTH, DEPTH = 60., -15.  # граничные точки mesh_points - на прямоугольнике
+
+
+@pytest.fixture(scope='module', params=[1, 2])
+def mesh(request):
+    """
+    Уникальные точки X, Z облака и их триангуляция.
+    """
+    points = synthetic.mesh_points(1500, LENGTH, DEPTH, duplicates=0.,
+                                   seed=request.param)
+    xz = np.unique(points[:, :2], axis=0)
+    triangles, neighbors = delaunay.triangulate(xz)
+    return points, xz, triangles, neighbors
+
+
+def _double_area(corners: np.ndarray) -> np.ndarray:
+    a, b, c = corners[:, 0], corners[:, 1], corners[:, 2]
+    return ((b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) -
+            (b[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0]))
+
+
+def test_orientation(mesh):
+    """
+    Все треугольники - против часовой стрелки и не вырождены.
+    """
+    _, xz, triangles, _ = mesh
+    assert (_double_area(xz[triangles]) > 1e-9 * LENGTH * -DEPTH).all()
+
+
+def test_empty_circumcircle(mesh):
+    """
+    Ни одна точка не лежит строго внутри описанной окружности треугольника.
+    """
+    _, xz, triangles, _ = mesh
+    corners = xz[triangles]
+    a, b, c = corners[:, 0], corners[:, 1], corners[:, 2]
+    d = 2 * _double_area(corners)
+    sa, sb, sc = (np.sum(v ** 2, axis=1) for v in (a, b, c))
+    center = np.column_stack([
+        (sa * (b[:, 1] - c[:, 1]) + sb * (c[:, 1] - a[:, 1]) +
+         sc * (a[:, 1] - b[:, 1])) / d,
+        (sa * (c[:, 0] - b[:, 0]) + sb * (a[:, 0] - c[:, 0]) +
+         sc * (b[:, 0] - a[:, 0])) / d])
+    radius = np.linalg.norm(a - center, axis=1)
+    dist = np.linalg.norm(xz[:, np.newaxis] - center, axis=2)  # (N, M)
+    assert (dist >= radius * (1 - 1e-9)).all()
+
+
+def test_hull_area(mesh):
+    """
+    Треугольники покрывают выпуклую оболочку точек (прямоугольник модели)
+    без наложений: сумма площадей равна площади оболочки.
+    """
+    _, xz, triangles, _ = mesh
+    area = _double_area(xz[triangles]).sum() / 2
+    assert area == pytest.approx(LENGTH * -DEPTH, rel=1e-12)
+
+
+def test_locate(mesh):
+    """
+    Каждому узлу сетки внутри оболочки находится треугольник, и узел лежит
+    внутри него или на его стороне.
+    """
+    points, xz, triangles, _ = mesh
+    nodes = processing.create_grid(points, STEP_Z).nodes
+    found = delaunay.locate(xz, triangles, nodes)
+    assert (found >= 0).all()
+
+    corners = xz[triangles[found]]
+    for i in range(3):
+        edge = np.stack([corners[:, i], corners[:, (i + 1) % 3],
+                         nodes], axis=1)
+        assert (_double_area(edge) >= -1e-9 * LENGTH * -DEPTH).all()
@@ -0,0 +1,63 @@
+"""
+Проверки запуска из командной строки (python -m PlaxisRectangleGrid):
+кодов возврата и раскрытия шаблонов входных файлов.
+"""
+import os
+import shutil
+
+import pytest
+
+from PlaxisRectangleGrid import __main__ as cli
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
+
+
+@pytest.fixture
+def model(tmp_path):
+    """
+    Копия входного файла из папки data во временной папке.
+    """
+    filepath = str(tmp_path / 'model.xlsx')
+    shutil.copy(os.path.join(DATA, '20x20x20.xlsx'), filepath)
+    return filepath
+
+
+@pytest.mark.parametrize('args', [['--tiles', '2', '2', '--phases', 'p.npz'],
+                                  ['--workers', '0'],
+                                  ['--engine', 'nearest']])
+def test_usage_error(model, args):
+    """
+    Ошибка параметров - код EXIT_USAGE.
+    """
+    with pytest.raises(SystemExit) as error:
+        cli.main([model, *args])
+    assert error.value.code == cli.EXIT_USAGE
+
+
+def test_no_inputs(tmp_path):
+    """
+    По шаблону не найдено ни одного файла - код EXIT_USAGE.
+    """
+    assert cli.main([str(tmp_path / '*.xlsx')]) == cli.EXIT_USAGE
+
+
+def test_exit_codes(tmp_path, model):
+    """
+    Все файлы рассчитаны - EXIT_OK; ошибка в одном из файлов - EXIT_FAILED,
+    остальные файлы рассчитываются. Результаты прошлых расчетов, найденные
+    по шаблону, пропускаются.
+    """
+    out_dir = tmp_path / 'out'
+    args = ['-o', str(out_dir), '--log-dir', str(tmp_path / 'logs'),
+            '--no-info-sheets']
+    assert cli.main([model, *args]) == cli.EXIT_OK
+    assert os.listdir(out_dir) == ['model_CALC_.xlsx']
+
+    shutil.copy(out_dir / 'model_CALC_.xlsx', tmp_path)
+    assert cli.expand_inputs([str(tmp_path / '*.xlsx')], '_CALC_') == [model]
+
+    broken = tmp_path / 'broken.xlsx'
+    broken.write_text('not an excel file')
+    os.remove(out_dir / 'model_CALC_.xlsx')
+    assert cli.main([str(broken), model, *args]) == cli.EXIT_FAILED
+    assert os.listdir(out_dir) == ['model_CALC_.xlsx']
@@ -0,0 +1,172 @@
+"""
+Проверки расчета входных файлов из папки data: пакетного расчета фаз,
+обработки файлов в пуле процессов и записи выходных файлов.
+"""
+import os
+
+import numpy as np
+import pytest
+
+from PlaxisRectangleGrid import processing, utils
+from PlaxisRectangleGrid.settings import COLUMNS_COORD, STEP_Z
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
+MODEL = os.path.join(DATA, '60x100x5.xlsx')
+
+
+def test_process_phases(tmp_path):
+    """
+    Фазы с одной геометрией: для каждого листа куб (фаза, z, x) по сетке
+    этого листа (у листов x и y сетки разные), значения - как при расчете
+    листа отдельно.
+    """
+    out_file = processing.process_phases([MODEL, MODEL],
+                                         str(tmp_path / 'log.txt'),
+                                         COLUMNS_COORD, STEP_Z,
+                                         str(tmp_path / 'phases.npz'))
+    data = utils.preprocessing_data(MODEL, COLUMNS_COORD)
+    with np.load(out_file) as phases:
+        assert list(phases['sheets']) == list(data)
+        assert list(phases['phases']) == [MODEL, MODEL]
+        for key, points in data.items():
+            grid = processing.calc_sheet(points, STEP_Z)
+            np.testing.assert_array_equal(phases[f'{key}/grid_x'],
+                                          grid.grid_x)
+            np.testing.assert_array_equal(phases[f'{key}/grid_z'],
+                                          grid.grid_z)
+            cube = phases[key]
+            assert cube.shape == (2, len(grid.grid_z), len(grid.grid_x))
+            expected = grid.coords[:, 2].reshape(len(grid.grid_x),
+                                                 len(grid.grid_z)).T
+            for values in cube:
+                np.testing.assert_array_equal(values, expected)
+        assert phases['x'].shape != phases['y'].shape
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_process_files_empty(tmp_path, workers):
+    """
+    Файл без листов с данными - ошибка файла (последовательно и в пуле
+    процессов), выходной файл для него не создается, остальные файлы
+    рассчитываются.
+    """
+    from openpyxl import Workbook
+
+    empty = str(tmp_path / 'empty.xlsx')
+    xls = Workbook()
+    xls.active.title = 'other'
+    xls.save(empty)
+
+    failed = processing.process_files([empty, MODEL],
+                                      str(tmp_path / 'log.txt'),
+                                      COLUMNS_COORD, STEP_Z, '_CALC_',
+                                      info_sheets=False, workers=workers,
+                                      out_dir=str(tmp_path))
+    assert list(failed) == [empty]
+    assert isinstance(failed[empty], ValueError)
+    assert not (tmp_path / 'empty_CALC_.xlsx').exists()
+    assert (tmp_path / '60x100x5_CALC_.xlsx').exists()
+
+
+def test_calc_sheet_weights_cache(tmp_path, monkeypatch):
+    """
+    Кэш весов на диске читается, только если подходящих весов в памяти
+    нет; веса из памяти и с диска дают те же перемещения.
+    """
+    points = utils.preprocessing_data(MODEL, COLUMNS_COORD)['x']
+    cache_dir = str(tmp_path)
+    grid = processing.calc_sheet(points, STEP_Z, cache_dir=cache_dir)
+    assert os.listdir(os.path.join(cache_dir, 'weights'))
+
+    loads = []
+    load_weights = utils.load_weights
+    monkeypatch.setattr(utils, 'load_weights',
+                        lambda *args: loads.append(args) or
+                        load_weights(*args))
+
+    cached = processing.calc_sheet(points, STEP_Z, weights=[grid.weights],
+                                   cache_dir=cache_dir)
+    assert cached.weights is grid.weights
+    assert not loads
+
+    loaded = processing.calc_sheet(points, STEP_Z, cache_dir=cache_dir)
+    assert len(loads) == 1 and loaded.weights is not None
+    np.testing.assert_array_equal(loaded.coords, grid.coords)
+
+
+def _read_workbook(filepath: str) -> dict:
+    """
+    Значения и заливки ячеек всех листов excel файла.
+    """
+    from openpyxl import load_workbook
+
+    xls = load_workbook(filepath)
+    return {sheet.title: [[(cell.value, cell.fill.fgColor.rgb)
+                           for cell in row] for row in sheet.iter_rows()]
+            for sheet in xls.worksheets}
+
+
+def test_write_only_workbook(tmp_path):
+    """
+    Потоковая запись (write_only) дает те же листы, значения и заливки
+    ячеек, что и обычная запись, включая листы журнала операций.
+    """
+    filepath = os.path.join(DATA, '20x20x20.xlsx')
+    data = utils.preprocessing_data(filepath, COLUMNS_COORD)
+    grids = processing.calc_sheets(data, STEP_Z)
+    files = {}
+    for write_only in (False, True):
+        out_dir = tmp_path / str(write_only)
+        out_dir.mkdir()
+        processing.write_workbook(filepath, grids, '_CALC_',
+                                  info_sheets=True,
+                                  write_only=write_only,
+                                  out_dir=str(out_dir))
+        files[write_only] = _read_workbook(
+            str(out_dir / '20x20x20_CALC_.xlsx'))
+    assert list(files[True]) == ['x', 'info_x', 'y', 'info_y']
+    assert len({fill for row in files[True]['x'] for _, fill in row}) > 1
+    assert files[True] == files[False]
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_run_log(tmp_path, workers):
+    """
+    Лог JSON Lines: запись на каждый лист, записи одного файла идут
+    подряд, со счетчиками main_info, размерами сетки, временем этапов и
+    параметрами расчета. При замерах (profile) в лог txt добавляется
+    строка 'Total' на файл.
+    """
+    import json
+
+    small = os.path.join(DATA, '20x20x20.xlsx')
+    run_log = str(tmp_path / 'run.jsonl')
+    file_txt = str(tmp_path / 'log.txt')
+    failed = processing.process_files([small, MODEL], file_txt,
+                                      COLUMNS_COORD, STEP_Z, '_CALC_',
+                                      info_sheets=False, workers=workers,
+                                      out_dir=str(tmp_path), profile=True,
+                                      run_log=run_log)
+    assert not failed
+
+    with open(run_log, encoding='utf-8') as file:
+        records = [json.loads(line) for line in file]
+    files = [record['file'] for record in records]
+    assert sorted(files) == sorted([small, small, MODEL, MODEL])
+    assert files[0] == files[1] and files[2] == files[3]
+
+    for record in records:
+        points = utils.preprocessing_data(record['file'],
+                                          COLUMNS_COORD)[record['sheet']]
+        grid = processing.create_grid(points, STEP_Z)
+        assert record['main_info']['Points'] == len(grid.coords)
+        assert record['points'] == len(points)
+        assert record['grid']['cols'] == len(grid.grid_x)
+        assert record['grid']['rows'] == len(grid.grid_z)
+        assert {'create_grid', 'write_sheet'} <= set(record['timings'])
+        assert {'preprocessing_data', 'save'} <= set(record['file_timings'])
+        assert record['settings']['workers'] == workers
+
+    with open(file_txt) as logs:
+        text = logs.read()
+    assert text.count('Total') == 2
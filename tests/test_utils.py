@@ -0,0 +1,106 @@
+"""
+Проверки вспомогательных функций utils: удаления дубликатов точек, кэша
+предобработанных данных, потокового чтения excel файлов.
+"""
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from PlaxisRectangleGrid import synthetic, utils
+from PlaxisRectangleGrid.settings import COLUMNS_COORD
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
+
+# облако точек листа с повторами (см. synthetic.mesh_points)
+POINTS = synthetic.mesh_points(3000, seed=1)
+
+
+@pytest.mark.parametrize('policy, value', [(utils.DEDUP_MEAN, 2.),
+                                           (utils.DEDUP_FIRST, 1.),
+                                           (utils.DEDUP_MAX, 3.)])
+def test_dedup_points(policy, value):
+    """
+    Совпадающие точки объединяются в одну с перемещением по правилу
+    policy, точки ближе tolerance - с координатами первой по порядку точки;
+    результат отсортирован по X, Z.
+    """
+    points = np.array([[1., -1., 5.], [0., 0., 1.], [0., 0., 3.],
+                       [0., 0., 2.], [1., -1. + 1e-12, 5.]])
+    np.testing.assert_array_equal(
+        utils.dedup_points(points, 0., policy),
+        [[0., 0., value], [1., -1., 5.], [1., -1. + 1e-12, 5.]])
+    np.testing.assert_array_equal(
+        utils.dedup_points(points, 1e-9, policy),
+        [[0., 0., value], [1., -1., 5.]])
+
+
+def test_dedup_points_errors():
+    """
+    Неизвестное правило и отрицательный размер ячейки - ValueError.
+    """
+    with pytest.raises(ValueError):
+        utils.dedup_points(POINTS, 0., 'median')
+    with pytest.raises(ValueError):
+        utils.dedup_points(POINTS, -1.)
+
+
+def test_dedup_points_unique():
+    """
+    При tolerance = 0 координаты - np.unique по X, Z, перемещение при
+    совпадающих значениях повторов не меняется.
+    """
+    result = utils.dedup_points(POINTS)
+    xz, index = np.unique(POINTS[:, :2], axis=0, return_index=True)
+    np.testing.assert_array_equal(result[:, :2], xz)
+    np.testing.assert_array_equal(result[:, 2], POINTS[index, 2])
+
+
+@pytest.mark.parametrize('damage', ['missing', 'truncated'])
+def test_load_cache_damaged(tmp_path, damage):
+    """
+    Поврежденный кэш (нет или обрезан файл .npy) - промах кэша: данные
+    предобрабатываются заново, кэш записывается повторно.
+    """
+    filepath = str(tmp_path / 'model.xlsx')
+    shutil.copy(os.path.join(DATA, '20x20x20.xlsx'), filepath)
+    cache_dir = str(tmp_path / 'cache')
+    data = utils.preprocessing_data(filepath, COLUMNS_COORD, cache_dir)
+
+    cache_path, = (os.path.join(cache_dir, name)
+                   for name in os.listdir(cache_dir))
+    npy = os.path.join(cache_path, '0.npy')
+    if damage == 'missing':
+        os.remove(npy)
+    else:
+        with open(npy, 'r+b') as file:
+            file.truncate(100)
+    assert utils.load_cache(cache_path) is None
+
+    cached = utils.preprocessing_data(filepath, COLUMNS_COORD, cache_dir)
+    for key, points in data.items():
+        np.testing.assert_array_equal(cached[key], points)
+    assert utils.load_cache(cache_path) is not None
+
+
+@pytest.mark.parametrize('chunk', [utils.READ_CHUNK, 7])
+@pytest.mark.parametrize('name', ['20x20x20.xlsx', '60x100x5.xlsx'])
+def test_read_columns(monkeypatch, name, chunk):
+    """
+    Потоковое чтение столбцов совпадает с pd.read_excel, в том числе при
+    чтении малыми блоками (рост буфера).
+    """
+    pd = pytest.importorskip('pandas')
+    monkeypatch.setattr(utils, 'READ_CHUNK', chunk)
+    filepath = os.path.join(DATA, name)
+
+    data = utils.read_columns(filepath, COLUMNS_COORD)
+    expected = {key.lower(): value.iloc[:, [*COLUMNS_COORD[key.lower()]]]
+                for key, value in pd.read_excel(filepath,
+                                                sheet_name=None).items()
+                if len(value)}
+    assert list(data) == list(expected)
+    for key, points in data.items():
+        np.testing.assert_array_equal(points,
+                                      expected[key].to_numpy(dtype=float))
@@ -0,0 +1,94 @@
+"""
+Проверки векторизованных и параллельных вариантов расчета: результаты
+должны совпадать с поэлементными вариантами с точностью до погрешности
+вычислений с плавающей точкой.
+"""
+import numpy as np
+import pytest
+
+from PlaxisRectangleGrid import calc_func, classes, processing, synthetic
+from PlaxisRectangleGrid import utils
+from PlaxisRectangleGrid.settings import STEP_Z
+
+# облако точек листа без повторов (см. synthetic.mesh_points)
+POINTS = utils.dedup_points(synthetic.mesh_points(3000, seed=1))
+
+# точки, по которым не находится перемещение ни в одном узле 'quadrant'
+UNRESOLVED = np.array([[-10.3, -10., 1.], [9.7, -0.2, 2.], [0.2, -5.2, 3.]])
+
+
+@pytest.mark.parametrize('engine', classes.ENGINES)
+def test_unresolved_sheet(engine):
+    """
+    Лист, в узлах которого перемещения (почти) не найдены, рассчитывается
+    без ошибки, ненайденные перемещения - np.nan.
+    """
+    grid = processing.calc_sheet(UNRESOLVED, STEP_Z, engine=engine)
+    values = grid.coords[:, 2]
+    assert values.dtype == float
+    assert np.isnan(values).sum() == grid.main_info['Errors'] > 0
+    if engine == classes.ENGINE_QUADRANT:
+        assert grid.main_info['Success'] == 0
+
+
+def test_unresolved_weights_apply():
+    """
+    Пустые веса (ни один узел не рассчитан) дают массив np.nan, а не
+    ошибку приведения np.nan к целому.
+    """
+    grid = processing.create_grid(UNRESOLVED, STEP_Z)
+    weights = grid.interpolation_weights(UNRESOLVED, grid.step_x,
+                                         -grid.step_z)
+    assert not len(weights.rows)
+    assert np.isnan(weights.apply(UNRESOLVED[:, 2])).all()
+
+
+def test_nearby_all():
+    """
+    nearby_all для всех узлов совпадает с nearby_points каждого узла.
+    """
+    grid = processing.create_grid(POINTS, STEP_Z)
+    eps_x, eps_z = grid.step_x, -grid.step_z
+    nearby, dist, mask = grid.nearby_all(POINTS, eps_x, eps_z)
+    for i, node in enumerate(grid.nodes):
+        point = classes.Point(np.array([node[0], node[1], 0.]))
+        expected, expected_dist = point.nearby_points(POINTS, eps_x, eps_z)
+        np.testing.assert_array_equal(nearby[i][mask[i]],
+                                      expected.reshape(-1, 3))
+        np.testing.assert_allclose(dist[i][mask[i]], expected_dist)
+
+
+# скалярная версия вызывает np.cross для 2-мерных векторов
+@pytest.mark.filterwarnings('ignore::DeprecationWarning')
+def test_point4triangle2d_many():
+    """
+    point4triangle2d_many совпадает с GridPoint.point4triangle2d для
+    каждой пары (узел, треугольник), в том числе для узлов на сторонах и
+    их продолжениях (целые координаты).
+    """
+    rng = np.random.default_rng(2)
+    nodes = np.column_stack([rng.integers(-3, 4, (2000, 2)),
+                             np.zeros(2000)]).astype(float)
+    triangles = rng.integers(-3, 4, (2000, 3, 3)).astype(float)
+    codes, edges = calc_func.point4triangle2d_many(nodes, triangles)
+    assert {calc_func.LINE, calc_func.INSIDE,
+            calc_func.OUTSIDE} <= set(codes.tolist())
+    for node, triangle, code, edge in zip(nodes, triangles, codes, edges):
+        if code == calc_func.DEGENERATE:
+            continue
+        command, points = classes.GridPoint(node).point4triangle2d(triangle)
+        assert command == calc_func.COMMANDS[code]
+        if code == calc_func.LINE:
+            np.testing.assert_array_equal(points, triangle[edge])
+
+
+def test_tiles():
+    """
+    Расчет листа блоками в пуле процессов совпадает с расчетом целиком.
+    """
+    grid = processing.calc_sheet(POINTS, STEP_Z)
+    tiled = processing.calc_sheet(POINTS, STEP_Z, tiles=(2, 3), workers=2)
+    np.testing.assert_array_equal(tiled.status, grid.status)
+    np.testing.assert_allclose(tiled.coords, grid.coords, rtol=0,
+                               atol=1e-12, equal_nan=True)
+    assert tiled.main_info == grid.main_info